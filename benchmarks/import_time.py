@@ -0,0 +1,79 @@
+"""Import time of the lab modules, guarding against heavy dependencies creeping back.
+
+Each module is imported in a fresh interpreter with ``-X importtime``. The run
+fails if a module loads one of ``HEAVY_MODULES`` it should only load on
+demand, or if its import takes longer than its budget::
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --repeat 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("matplotlib", "pandas", "plotly", "pyvisa", "numpy")
+
+# Module, budget in ms, heavy modules it may load at import
+MODULES = [
+    ("lab.instruments.scpi_instrument", 75, ()),
+    ("lab.instruments.async_scpi_instrument", 150, ()),
+    ("lab.instruments.tracing", 75, ()),
+    ("lab.instruments.rigol_dl_3021_a", 75, ()),
+    ("lab.instruments.siglent_spd_1305_x", 75, ()),
+    ("lab.instruments.siglent_sds_1104_x", 75, ()),
+    ("lab.instruments.rohde_und_schwarz_hmc8012", 75, ()),
+    ("lab.instruments.rigol_dm_858_e", 75, ()),
+    ("lab.instruments.session", 75, ()),
+    ("lab.measurements.settling", 150, ()),
+    ("lab.measurements.checkpoint", 75, ()),
+    ("lab.measurements.catalog", 300, ("numpy",)),
+    ("lab.measurements.load_regulation", 300, ("numpy",)),
+    ("lab.measurements.temp_and_noise", 400, ("numpy",)),
+]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(elapsed * 1000, ",".join(heavy))
+"""
+
+
+def measure(module: str) -> tuple[float, list[str]]:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return float(output[0]), output[1].split(",") if len(output) > 1 else []
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per module, the median counts")
+    parser.add_argument("--profile", metavar="MODULE", help="print the -X importtime breakdown of one module")
+    arguments = parser.parse_args()
+
+    if arguments.profile:
+        subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {arguments.profile}"], check=True)
+        return
+
+    failures = 0
+    for module, budget_ms, allowed in MODULES:
+        runs = [measure(module) for _ in range(arguments.repeat)]
+        elapsed_ms = statistics.median(elapsed for elapsed, _ in runs)
+        unexpected = sorted(set(runs[0][1]) - set(allowed))
+        status = "ok"
+        if unexpected:
+            status = "loads " + ", ".join(unexpected)
+        elif elapsed_ms > budget_ms:
+            status = f"over budget of {budget_ms} ms"
+        failures += status != "ok"
+        print(f"{module:<45}{elapsed_ms:>8.1f} ms  {status}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
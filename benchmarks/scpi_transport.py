@@ -0,0 +1,100 @@
+"""Microbenchmark of SCPI query overhead against a loopback echo server.
+
+Compares the old 64 byte ``recv`` loop with the buffered ``SocketTransport``
+for short replies and for long replies (e.g. waveform blocks).
+
+    python -m benchmarks.scpi_transport
+"""
+import socket
+import socketserver
+import threading
+import time
+
+from lab.instruments.transport import SocketTransport
+
+SHORT_REPLY = b"12.345678\n"
+LONG_REPLY = b"#6100000" + bytes(100000) + b"\n"
+QUERIES = 2000
+
+
+class EchoHandler(socketserver.StreamRequestHandler):
+    """Answers ``SHORT?`` and ``LONG?`` with canned replies."""
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            reply = LONG_REPLY if line.startswith(b"LONG?") else SHORT_REPLY
+            self.wfile.write(reply)
+
+
+class CountingSocket(socket.socket):
+    """Socket that counts the receive calls made on it."""
+
+    receive_calls = 0
+
+    def recv(self, *args, **kwargs):
+        self.receive_calls += 1
+        return super().recv(*args, **kwargs)
+
+    def recv_into(self, *args, **kwargs):
+        self.receive_calls += 1
+        return super().recv_into(*args, **kwargs)
+
+
+def connect(address) -> CountingSocket:
+    connection = CountingSocket(socket.AF_INET, socket.SOCK_STREAM)
+    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    connection.connect(address)
+    return connection
+
+
+def legacy_query(connection: socket.socket, message: bytes) -> bytes:
+    """The previous ``SCPIInstrument`` socket path, with the chunks appended."""
+    connection.sendall(message)
+    response = b""
+    while response[-1:] != b"\n":
+        response += connection.recv(64)
+    return response
+
+
+def transport_query(transport: SocketTransport, message: bytes) -> bytes:
+    transport.write(message.decode().strip())
+    if message.startswith(b"LONG?"):
+        return transport.read_block()
+    return transport.read_line()
+
+
+def measure(address, query, make_handle, message: bytes, count: int) -> tuple[float, float]:
+    connection = connect(address)
+    handle = make_handle(connection)
+    start = time.perf_counter()
+    for _ in range(count):
+        query(handle, message)
+    elapsed = time.perf_counter() - start
+    calls = connection.receive_calls / count
+    connection.close()
+    return elapsed / count * 1e6, calls
+
+
+def main() -> None:
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), EchoHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    address = server.server_address
+
+    cases = [("short reply", b"SHORT?\r\n", QUERIES), ("100 kB block", b"LONG?\r\n", QUERIES // 10)]
+    implementations = [
+        ("legacy recv(64)", legacy_query, lambda connection: connection),
+        ("SocketTransport", transport_query, SocketTransport),
+    ]
+    print(f"{'case':<14}{'implementation':<18}{'us/query':>10}{'recv/query':>12}")
+    for case, message, count in cases:
+        for name, query, make_handle in implementations:
+            per_query_us, calls = measure(address, query, make_handle, message, count)
+            print(f"{case:<14}{name:<18}{per_query_us:>10.1f}{calls:>12.1f}")
+
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Run the measurement scripts end to end against the simulated bench.
+
+Reports the wall time of each run for a given network latency, so throughput
+changes can be measured without the instruments.
+
+    python -m benchmarks.simulated_sweeps --latency-ms 2 --jitter-ms 0.5
+
+With ``--trace DIR`` each run also writes a Chrome trace of its SCPI
+exchanges and prints the slowest commands.
+"""
+import argparse
+import functools
+import tempfile
+import time
+import pathlib
+
+from lab.instruments.simulation import SimulatedBench
+from lab.instruments.tracing import SCPITracer
+from lab.measurements import load_regulation, temp_and_noise
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace", type=pathlib.Path, default=None, help="directory for Chrome trace files")
+    arguments = parser.parse_args()
+
+    runs = [
+        ("load_regulation", load_regulation.run),
+        ("load_regulation list", functools.partial(load_regulation.run, list_sweep=True)),
+        ("temp_and_noise", temp_and_noise.run),
+    ]
+    with tempfile.TemporaryDirectory() as results_path:
+        for name, run in runs:
+            with SimulatedBench(arguments.latency_ms / 1000, arguments.jitter_ms / 1000, arguments.seed) as bench:
+                tracer = SCPITracer() if arguments.trace else None
+                start = time.perf_counter()
+                run(results_path=pathlib.Path(results_path), addresses=bench.addresses, tracer=tracer)
+                elapsed = time.perf_counter() - start
+            print(f"{name:<22}{elapsed:>8.2f} s")
+            if tracer is not None:
+                arguments.trace.mkdir(parents=True, exist_ok=True)
+                tracer.write_chrome_trace(arguments.trace / f"{name}.trace.json")
+                slowest = sorted(tracer.summary().items(), key=lambda item: item[1]["total_s"], reverse=True)
+                for command, statistics in slowest[:5]:
+                    print(f"    {command:<40}{statistics['count']:>6}{statistics['total_s']:>8.2f} s"
+                          f"{statistics['p95_s'] * 1000:>8.2f} ms p95")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Regulation, efficiency and thermal metrics of DC/DC converter runs.
+
+Every function works on NumPy arrays and reduces along the last axis, so a
+single call handles one run (1-D) or many stacked runs (``(runs, points)``,
+see ``runs.stack``). Missing points are NaN and are ignored.
+"""
+import numpy
+import pandas
+
+from lab.analysis.runs import interpolate, stack
+
+
+def efficiency(input_power: numpy.ndarray, output_power: numpy.ndarray) -> numpy.ndarray:
+    """Efficiency in percent, NaN where no input power was drawn."""
+    input_power = numpy.asarray(input_power, dtype=float)
+    output_power = numpy.asarray(output_power, dtype=float)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        return numpy.where(input_power > 0, 100.0 * output_power / input_power, numpy.nan)
+
+
+def dissipated_power(input_power: numpy.ndarray, output_power: numpy.ndarray) -> numpy.ndarray:
+    return numpy.asarray(input_power, dtype=float) - numpy.asarray(output_power, dtype=float)
+
+
+def load_regulation(load_current: numpy.ndarray, output_voltage: numpy.ndarray) -> numpy.ndarray:
+    """(V at the lowest load - V at the highest load) / V at the highest load, in percent."""
+    no_load, full_load = _at_extremes(load_current, output_voltage)
+    return 100.0 * (no_load - full_load) / full_load
+
+
+def line_regulation(input_voltage: numpy.ndarray, output_voltage: numpy.ndarray) -> numpy.ndarray:
+    """Change of the output voltage over the input voltage range, in percent of the mean output voltage."""
+    low_line, high_line = _at_extremes(input_voltage, output_voltage)
+    return 100.0 * (high_line - low_line) / numpy.nanmean(output_voltage, axis=-1)
+
+
+def thermal_resistance(dissipated: numpy.ndarray, temperature: numpy.ndarray) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Least squares fit of temperature over dissipated power.
+
+    Returns the slope in K/W, an estimate of the thermal resistance to
+    ambient, and the intercept, the temperature extrapolated to no losses.
+    Only meaningful when the temperature had time to follow the losses.
+    """
+    dissipated = numpy.asarray(dissipated, dtype=float)
+    temperature = numpy.asarray(temperature, dtype=float)
+    valid = numpy.isfinite(dissipated) & numpy.isfinite(temperature)
+    count = valid.sum(axis=-1)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        mean_power = numpy.where(valid, dissipated, 0.0).sum(axis=-1) / count
+        mean_temperature = numpy.where(valid, temperature, 0.0).sum(axis=-1) / count
+        power_deviation = numpy.where(valid, dissipated - mean_power[..., None], 0.0)
+        temperature_deviation = numpy.where(valid, temperature - mean_temperature[..., None], 0.0)
+        slope = (power_deviation * temperature_deviation).sum(axis=-1) / (power_deviation**2).sum(axis=-1)
+    return slope, mean_temperature - slope * mean_power
+
+
+def load_sweep_summary(long: pandas.DataFrame, grid: numpy.ndarray | None = None) -> pandas.DataFrame:
+    """One row of metrics per run of a long-format load sweep DataFrame.
+
+    With a current ``grid`` the efficiency interpolated at each grid current
+    is added as ``efficiency_at_<current>A`` columns.
+    """
+    columns = ["load_measured_currents", "load_measured_voltages", "psu_measured_powers", "load_measured_powers"]
+    has_temperature = "temperatures" in long.columns
+    names, arrays = stack(long, columns + ["temperatures"] if has_temperature else columns)
+    current = arrays["load_measured_currents"]
+    run_efficiency = efficiency(arrays["psu_measured_powers"], arrays["load_measured_powers"])
+    dissipated = dissipated_power(arrays["psu_measured_powers"], arrays["load_measured_powers"])
+
+    summary = pandas.DataFrame(index=pandas.Index(names, name="run"))
+    summary["load_regulation_percent"] = load_regulation(current, arrays["load_measured_voltages"])
+    summary["peak_efficiency_percent"] = _nanmax(run_efficiency)
+    summary["current_at_peak_efficiency"] = numpy.take_along_axis(
+        current, numpy.nanargmax(numpy.nan_to_num(run_efficiency, nan=-numpy.inf), axis=-1)[:, None], axis=-1
+    )[:, 0]
+    summary["max_dissipated_power"] = _nanmax(dissipated)
+    if has_temperature:
+        summary["thermal_resistance_k_per_w"], summary["ambient_temperature"] = thermal_resistance(
+            dissipated, arrays["temperatures"]
+        )
+    if grid is not None:
+        on_grid = interpolate(current, run_efficiency, grid)
+        for index, grid_current in enumerate(numpy.asarray(grid, dtype=float)):
+            summary[f"efficiency_at_{grid_current:g}A"] = on_grid[:, index]
+    return summary
+
+
+def _at_extremes(x: numpy.ndarray, y: numpy.ndarray) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """y at the smallest and at the largest x of each run."""
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+    valid = numpy.isfinite(x) & numpy.isfinite(y)
+    lowest = numpy.argmin(numpy.where(valid, x, numpy.inf), axis=-1)[..., None]
+    highest = numpy.argmax(numpy.where(valid, x, -numpy.inf), axis=-1)[..., None]
+    return numpy.take_along_axis(y, lowest, axis=-1)[..., 0], numpy.take_along_axis(y, highest, axis=-1)[..., 0]
+
+
+def _nanmax(values: numpy.ndarray) -> numpy.ndarray:
+    maximum = numpy.max(numpy.nan_to_num(values, nan=-numpy.inf), axis=-1)
+    return numpy.where(numpy.isneginf(maximum), numpy.nan, maximum)
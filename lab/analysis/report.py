@@ -0,0 +1,232 @@
+"""Static HTML reports straight from result files.
+
+Renders the load, line, efficiency, dissipation and temperature plots of each
+run found by the catalog, plus an overview comparing all runs, into an output
+directory::
+
+    python -m lab.analysis.report lab/measurements reports/
+    python -m lab.analysis.report lab/measurements reports/ "Input voltage=23" "DUT~tdk680"
+
+All pages load one shared ``plotly-<version>.min.js`` next to them instead of
+embedding the bundle. Figures are written as plotly JSON directly from the
+arrays; series longer than ``MAX_POINTS_PER_TRACE`` are reduced to the
+minimum and maximum of each bucket so peaks such as ripple survive. Rendered
+figures are cached under a hash of the run's file contents, so rebuilding the
+reports of an unchanged archive does not even parse the results again.
+"""
+import argparse
+import hashlib
+import html
+import json
+import pathlib
+from typing import NamedTuple
+
+import numpy
+import pandas
+
+from lab.analysis.metrics import dissipated_power, efficiency, load_sweep_summary
+from lab.analysis.runs import long_format
+from lab.measurements.catalog import ARCHIVE_PATH, Catalog, CatalogRun, parse_conditions
+
+REPORT_VERSION = 2  # Part of every cache key, bump when the figures change
+MAX_POINTS_PER_TRACE = 2000
+CACHE_DIRECTORY_NAME = ".figure_cache"
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{plotly_js}"></script>
+<style>body {{ font-family: sans-serif; margin: 2em; }} table {{ border-collapse: collapse; }} td, th {{ border: 1px solid #ccc; padding: 2px 8px; text-align: left; }}</style>
+</head>
+<body>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+
+class Plot(NamedTuple):
+    name: str
+    title: str
+    x_label: str
+    y_label: str
+    columns: tuple[str, ...]
+
+
+LOAD_CURRENT = "Load current (A)"
+PLOTS = [
+    Plot("load", "Output voltage vs. load current", LOAD_CURRENT, "Output voltage (V)", ("load_measured_currents", "load_measured_voltages")),
+    Plot("line", "Output voltage vs. input voltage", "Input voltage (V)", "Output voltage (V)", ("psu_measured_line_voltages", "load_measured_line_voltages")),
+    Plot("efficiency", "Efficiency vs. load current", LOAD_CURRENT, "Efficiency (%)", ("load_measured_currents", "psu_measured_powers", "load_measured_powers")),
+    Plot("dissipation", "Dissipated power vs. load current", LOAD_CURRENT, "Dissipated power (W)", ("load_measured_currents", "psu_measured_powers", "load_measured_powers")),
+    Plot("temperature", "Temperature vs. load current", LOAD_CURRENT, "Temperature (°C)", ("load_measured_currents", "temperatures")),
+    Plot("ripple", "Output ripple vs. load current", LOAD_CURRENT, "Ripple peak-to-peak (V)", ("load_measured_currents", "ripple_peak_to_peak_voltages")),
+]
+
+
+def build_reports(
+    root: str | pathlib.Path = ARCHIVE_PATH,
+    output: str | pathlib.Path = "reports",
+    equals: dict | None = None,
+    contains: dict | None = None,
+) -> list[pathlib.Path]:
+    """Write one page per run plus ``index.html`` and return the written pages."""
+    output = pathlib.Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    (output / CACHE_DIRECTORY_NAME).mkdir(exist_ok=True)
+    plotly_js = _write_plotly_js(output)
+
+    with Catalog(root) as catalog:
+        catalog.refresh()
+        runs = catalog.query(equals, contains)
+
+    pages, digests, frames = [], [], {}
+    for run in runs:
+        digest = _digest(run)
+        digests.append(digest)
+        page = output / (str(run.path.relative_to(root)).replace("/", "__").rsplit(".", 1)[0] + ".html")
+        data = _Lazy(run)
+        divs = [
+            _cached(output, f"{digest}-{plot.name}", lambda plot=plot: _figure(plot, {run.path.stem: data.frame}))
+            for plot in PLOTS
+            if set(plot.columns) <= set(run.columns)
+        ]
+        body = _metadata_table(run.metadata) + "\n".join(divs)
+        page.write_text(PAGE_TEMPLATE.format(title=html.escape(str(run.path.relative_to(root))), plotly_js=plotly_js, body=body))
+        pages.append(page)
+        if {"load_measured_currents", "psu_measured_powers", "load_measured_powers"} <= set(run.columns):
+            frames[run.path.stem] = data
+
+    overview_digest = hashlib.sha256("".join(digests).encode()).hexdigest()
+    divs = [
+        _cached(output, f"{overview_digest}-overview-{plot.name}", lambda plot=plot: _figure(plot, {
+            name: data.frame for name, data in frames.items() if set(plot.columns) <= set(data.frame.columns)
+        }))
+        for plot in PLOTS
+        if plot.name != "line"
+    ]
+    summary = _cached(output, f"{overview_digest}-summary", lambda: _summary_table({name: data.frame for name, data in frames.items()}))
+    links = "".join(f'<li><a href="{html.escape(page.name)}">{html.escape(page.stem)}</a></li>' for page in pages)
+    index = output / "index.html"
+    index.write_text(
+        PAGE_TEMPLATE.format(title="Measurement archive", plotly_js=plotly_js, body=f"<ul>{links}</ul>{summary}" + "\n".join(divs))
+    )
+    return pages + [index]
+
+
+def decimate(x: numpy.ndarray, y: numpy.ndarray, max_points: int = MAX_POINTS_PER_TRACE) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Keep the minimum and maximum of ``y`` in each of at most ``max_points // 2`` buckets.
+
+    The buckets are of equal size except the last one, which takes the remaining points.
+    """
+    if len(x) <= max_points:
+        return x, y
+    size = -(-len(y) // (max_points // 2))
+    buckets = len(y) // size
+    filled = numpy.nan_to_num(y, nan=numpy.nanmean(y))
+    shaped = filled[: buckets * size].reshape(buckets, size)
+    offsets = numpy.arange(buckets)[:, None] * size
+    extremes = numpy.stack([shaped.argmin(axis=1), shaped.argmax(axis=1)], axis=1) + offsets
+    if buckets * size < len(y):
+        rest = filled[buckets * size :]
+        extremes = numpy.vstack([extremes, numpy.array([rest.argmin(), rest.argmax()]) + buckets * size])
+    extremes = numpy.sort(extremes, axis=1).ravel()
+    return x[extremes], y[extremes]
+
+
+class _Lazy:
+    """Loads the DataFrame of a run only when a figure is not cached."""
+
+    def __init__(self, run: CatalogRun) -> None:
+        self._run = run
+        self._frame: pandas.DataFrame | None = None
+
+    @property
+    def frame(self) -> pandas.DataFrame:
+        if self._frame is None:
+            self._frame = self._run.load()
+        return self._frame
+
+
+def _figure(plot: Plot, frames: dict[str, pandas.DataFrame]) -> str:
+    traces = []
+    for name, frame in frames.items():
+        x, y = _series(plot, frame)
+        order = numpy.argsort(x, kind="stable")
+        x, y = decimate(x[order], y[order])
+        traces.append({"type": "scattergl" if len(x) > 1000 else "scatter", "mode": "lines", "name": name, "x": x.tolist(), "y": y.tolist()})
+    layout = {
+        "title": {"text": plot.title},
+        "xaxis": {"title": {"text": plot.x_label}},
+        "yaxis": {"title": {"text": plot.y_label}},
+        "showlegend": len(traces) > 1,
+    }
+    div_id = "figure-" + hashlib.sha256(json.dumps(layout).encode() + str(len(traces)).encode()).hexdigest()[:12]
+    figure = json.dumps(traces).replace("</", "<\\/")
+    return (
+        f'<div id="{div_id}" style="height:450px"></div>\n'
+        f"<script>Plotly.newPlot({json.dumps(div_id)}, {figure}, {json.dumps(layout)}, {{responsive: true}});</script>"
+    )
+
+
+def _series(plot: Plot, frame: pandas.DataFrame) -> tuple[numpy.ndarray, numpy.ndarray]:
+    columns = [frame[column].to_numpy(dtype=float) for column in plot.columns]
+    if plot.name == "efficiency":
+        return columns[0], efficiency(columns[1], columns[2])
+    if plot.name == "dissipation":
+        return columns[0], dissipated_power(columns[1], columns[2])
+    return columns[0], columns[1]
+
+
+def _summary_table(frames: dict[str, pandas.DataFrame]) -> str:
+    if not frames:
+        return ""
+    return load_sweep_summary(long_format(frames), grid=numpy.array([0.5, 1.0, 1.5])).to_html(float_format="%.3f")
+
+
+def _metadata_table(metadata: dict) -> str:
+    rows = "".join(f"<tr><th>{html.escape(str(key))}</th><td>{html.escape(str(value))}</td></tr>" for key, value in metadata.items())
+    return f"<table>{rows}</table>"
+
+
+def _cached(output: pathlib.Path, key: str, render) -> str:
+    path = output / CACHE_DIRECTORY_NAME / f"{key}.html"
+    if path.exists():
+        return path.read_text()
+    content = render()
+    path.write_text(content)
+    return content
+
+
+def _digest(run: CatalogRun) -> str:
+    digest = hashlib.sha256(f"{REPORT_VERSION}:{MAX_POINTS_PER_TRACE}".encode())
+    digest.update(run.path.read_bytes())
+    digest.update(json.dumps(run.metadata, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _write_plotly_js(output: pathlib.Path) -> str:
+    import plotly
+    from plotly.offline import get_plotlyjs
+
+    name = f"plotly-{plotly.__version__}.min.js"
+    if not (output / name).exists():
+        (output / name).write_text(get_plotlyjs(), encoding="utf-8")
+    return name
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render static HTML reports of the measurement archive.")
+    parser.add_argument("root", type=pathlib.Path, nargs="?", default=ARCHIVE_PATH)
+    parser.add_argument("output", type=pathlib.Path, nargs="?", default=pathlib.Path("reports"))
+    parser.add_argument("conditions", nargs="*", help='"key=value" for equality, "key~text" for a substring')
+    arguments = parser.parse_args()
+    equals, contains = parse_conditions(arguments.conditions)
+    pages = build_reports(arguments.root, arguments.output, equals, contains)
+    print(f"Wrote {len(pages)} pages to {arguments.output}")
+
+
+if __name__ == "__main__":
+    main()
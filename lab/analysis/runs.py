@@ -0,0 +1,90 @@
+"""Bring many runs into one array so metrics are computed for all of them at once.
+
+Runs are combined into a long-format DataFrame (one row per measured point,
+with a ``run`` column) and then stacked into ``(runs, points)`` arrays, padded
+with NaN where runs have fewer points::
+
+    long = long_format({run.path.name: run.load() for run in catalog.query(...)})
+    names, arrays = stack(long, ["load_measured_currents", "load_measured_voltages"])
+    voltages = interpolate(arrays["load_measured_currents"], arrays["load_measured_voltages"], numpy.linspace(0, 2, 201))
+"""
+from typing import Iterable, Mapping
+
+import numpy
+import pandas
+
+RUN_COLUMN = "run"
+
+
+def long_format(runs: Mapping[str, pandas.DataFrame]) -> pandas.DataFrame:
+    """Concatenate the result DataFrames of several runs, tagged by their name."""
+    return pandas.concat(
+        [frame.reset_index(drop=True).assign(**{RUN_COLUMN: name}) for name, frame in runs.items()], ignore_index=True
+    )
+
+
+def stack(
+    long: pandas.DataFrame, columns: Iterable[str], run: str = RUN_COLUMN
+) -> tuple[numpy.ndarray, dict[str, numpy.ndarray]]:
+    """Run names and a ``(runs, points)`` array per column, NaN padded."""
+    codes, names = pandas.factorize(long[run], sort=False)
+    positions = long.groupby(codes).cumcount().to_numpy()
+    points = int(positions.max()) + 1 if len(positions) else 0
+    arrays = {}
+    for column in columns:
+        array = numpy.full((len(names), points), numpy.nan)
+        array[codes, positions] = long[column].to_numpy(dtype=float)
+        arrays[column] = array
+    return numpy.asarray(names), arrays
+
+
+def interpolate(x: numpy.ndarray, y: numpy.ndarray, grid: numpy.ndarray) -> numpy.ndarray:
+    """Linear interpolation of every run onto a common ``grid``.
+
+    ``x`` and ``y`` are ``(runs, points)`` arrays; points need not be sorted
+    and may be NaN. Grid points outside the measured range of a run are NaN,
+    nothing is extrapolated, so a run with a single point only has a value
+    at exactly that x. All runs are interpolated with a single
+    ``searchsorted`` by offsetting each run into its own range of x.
+    """
+    x = numpy.atleast_2d(numpy.asarray(x, dtype=float))
+    y = numpy.atleast_2d(numpy.asarray(y, dtype=float))
+    grid = numpy.asarray(grid, dtype=float)
+    runs, points = x.shape
+    result = numpy.full((runs, grid.size), numpy.nan)
+    if runs == 0 or points == 0 or grid.size == 0:
+        return result
+
+    if points == 1:
+        # A NaN column gives every run a second point to interpolate towards.
+        x = numpy.hstack([x, numpy.full((runs, 1), numpy.nan)])
+        y = numpy.hstack([y, numpy.full((runs, 1), numpy.nan)])
+        points = 2
+    x = numpy.where(numpy.isnan(y), numpy.nan, x)
+    order = numpy.argsort(x, axis=1)  # NaN sorts last
+    x = numpy.take_along_axis(x, order, axis=1)
+    y = numpy.take_along_axis(y, order, axis=1)
+    valid_counts = numpy.isfinite(x).sum(axis=1)
+    rows = numpy.arange(runs)
+    last = numpy.maximum(valid_counts - 1, 0)
+    # Pad every run with its last point so each row stays sorted.
+    padding = numpy.arange(points) >= valid_counts[:, None]
+    x = numpy.where(padding, x[rows, last][:, None], x)
+    y = numpy.where(padding, y[rows, last][:, None], y)
+
+    finite = numpy.concatenate([x[numpy.isfinite(x)], grid])
+    span = finite.max() - finite.min() + 1.0
+    offsets = rows[:, None] * span
+    flat_x = numpy.nan_to_num(x - finite.min()) + offsets
+    queries = (grid - finite.min())[None, :] + offsets
+    upper = numpy.searchsorted(flat_x.ravel(), queries.ravel(), side="right").reshape(runs, grid.size)
+    upper = numpy.clip(upper - rows[:, None] * points, 1, numpy.maximum(last, 1)[:, None])
+    lower = upper - 1
+
+    x0, x1 = x[rows[:, None], lower], x[rows[:, None], upper]
+    y0, y1 = y[rows[:, None], lower], y[rows[:, None], upper]
+    width = x1 - x0
+    fraction = numpy.divide(grid - x0, width, out=numpy.zeros_like(width), where=width != 0)
+    inside = (valid_counts[:, None] >= 1) & (grid >= x[:, :1]) & (grid <= x[rows, last][:, None])
+    result[inside] = (y0 + fraction * (y1 - y0))[inside]
+    return result
@@ -0,0 +1,252 @@
+"""asyncio counterpart of the SCPI instrument drivers.
+
+``AsyncSCPIInstrument`` wraps a driver class (``RigolDL3021A``,
+``Siglent1305X``, ...) and a non-blocking stream connection. Every driver
+method becomes a coroutine: the method is run on a command recorder (see
+``scpi_batch``) and the recorded message is then exchanged over the stream.
+That keeps a single implementation of each instrument's command set.
+Methods that need a reply while they run (marked ``sync_only``, e.g.
+``Siglent1104X.get_waveform``) cannot be recorded and are refused.
+
+Calls on one instrument are serialized by a lock, so their order is kept,
+while calls on different instruments can be awaited together::
+
+    load = await AsyncSCPIInstrument.open(RigolDL3021A_247)
+    psu = await AsyncSCPIInstrument.open(Siglent1305X_249)
+    load_voltage, psu_voltage = await asyncio.gather(load.measure_voltage(), psu.measure_voltage())
+
+The reply of a query that timed out or was cancelled is skipped when it
+arrives. A block reply cannot be skipped, after an interrupted
+``query_block`` the instrument has to be reopened.
+"""
+import asyncio
+import inspect
+import socket
+import time
+
+from lab.instruments.scpi_batch import (
+    COMPOUND_SEPARATOR,
+    SCPICommandRecorder,
+    SCPIFuture,
+    join_compound_message,
+    resolve_compound_reply,
+)
+from lab.instruments.scpi_instrument import SCPICommand, SCPIInstrument
+
+
+class AsyncSCPIInstrument:
+    TIMEOUT = 10.0
+    STREAM_LIMIT = 1 << 20
+    tracer = None  # SCPITracer from lab.instruments.tracing, None disables tracing
+
+    def __init__(
+        self,
+        driver: type[SCPIInstrument],
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        timeout: float = TIMEOUT,
+    ) -> None:
+        self.driver = driver
+        self.timeout = timeout
+        self._reader = reader
+        self._writer = writer
+        self._lock = asyncio.Lock()
+        self._discarded_replies = 0  # Replies of timed out or cancelled queries still to arrive
+        self._lost_block = False  # A block reply was interrupted, where the next reply starts is unknown
+
+    @classmethod
+    async def open(
+        cls,
+        driver: type[SCPIInstrument],
+        host: str | None = None,
+        port: int | None = None,
+        timeout: float = TIMEOUT,
+    ) -> "AsyncSCPIInstrument":
+        """Connect to ``host:port``, defaulting to the address of the driver class."""
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host or driver.IP_ADDRESS, port or driver.PORT, limit=cls.STREAM_LIMIT),
+            timeout,
+        )
+        writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return cls(driver, reader, writer, timeout)
+
+    def __getattr__(self, name: str):
+        function = inspect.getattr_static(self.driver, name, None)
+        if not inspect.isfunction(function):
+            return getattr(self.driver, name)
+        if getattr(function, "sync_only", False):
+            raise AttributeError(
+                f"{self.driver.__name__}.{name} uses replies while it runs and has no asyncio variant, "
+                "call it on a synchronous driver"
+            )
+
+        async def call(*args, **kwargs):
+            recorder = SCPICommandRecorder(self.driver)
+            result = function(recorder, *args, **kwargs)
+            await self._execute(recorder.pending)
+            return result.result() if isinstance(result, SCPIFuture) else result
+
+        call.__name__ = name
+        return call
+
+    def batch(self) -> "AsyncSCPIBatch":
+        return AsyncSCPIBatch(self)
+
+    async def wait_until_operation_is_completed(self, timeout_s: float | None = None) -> None:
+        """Coroutine variant of ``SCPIInstrument.wait_until_operation_is_completed``.
+
+        Awaits a single ``*OPC?``, or polls the event status register with
+        exponential backoff if the driver does not support a blocking ``*OPC?``.
+        """
+        driver = self.driver
+        timeout_s = driver.OPERATION_TIMEOUT_S if timeout_s is None else timeout_s
+        try:
+            if driver.SUPPORTS_BLOCKING_OPC:
+                recorder = SCPICommandRecorder(driver)
+                driver.is_operation_complete(recorder)
+                await self._execute(recorder.pending, timeout_s)
+                return
+
+            async with self.batch() as batch:
+                batch.clear_status()
+                batch.signal_operation_complete()
+            deadline = time.monotonic() + timeout_s
+            sleep_time = driver.FIRST_POLLING_SLEEP_TIME
+            while not await self.get_event_status_register() & driver.OPERATION_COMPLETE_BIT:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError
+                await asyncio.sleep(min(sleep_time, remaining))
+                sleep_time = min(2 * sleep_time, driver.POLLING_SLEEP_TIME)
+        except TimeoutError as error:
+            raise TimeoutError(f"{driver.__name__} did not complete its operations within {timeout_s} s") from error
+
+    async def query_block(self, command: SCPICommand, params: str = "", timeout: float | None = None) -> bytes:
+        """Send a query answered with an IEEE 488.2 block (waveforms) and return the block's payload.
+
+        Block replies are raw reads, which driver methods cannot record, so the
+        caller decodes the payload, e.g. with ``Siglent1104X.decode_waveform``.
+        """
+        message = SCPICommandRecorder(self.driver)._format_command(command, params, query=True)
+        async with self._lock:
+            self._check_usable()
+            start = time.perf_counter_ns()
+            try:
+                data = await asyncio.wait_for(self._exchange_block(message), self.timeout if timeout is None else timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                # A partly read block cannot be skipped line by line.
+                self._lost_block = True
+                raise
+            if self.tracer is not None:
+                bytes_sent = len(message) + len(self.driver.COMMAND_SUFFIX)
+                self.tracer.record(self.driver.__name__, message, "query", start, time.perf_counter_ns(), bytes_sent, len(data))
+        return data
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    async def _execute(self, pending: list[tuple[str, SCPIFuture | None]], timeout: float | None = None) -> None:
+        if not pending:
+            return
+        async with self._lock:
+            self._check_usable()
+            start = time.perf_counter_ns()
+            try:
+                bytes_received = await asyncio.wait_for(self._exchange(pending), self.timeout if timeout is None else timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                # Skip the replies that still arrive, so they are not taken for those of later queries.
+                self._discarded_replies += self._unanswered_replies(pending)
+                raise
+            if self.tracer is not None:
+                suffix = self.driver.COMMAND_SUFFIX
+                if self.driver.SUPPORTS_COMPOUND_COMMANDS:
+                    message = join_compound_message(message for message, _ in pending)
+                    bytes_sent = len(message) + len(suffix)
+                else:
+                    message = COMPOUND_SEPARATOR.join(message for message, _ in pending)
+                    bytes_sent = sum(len(message) + len(suffix) for message, _ in pending)
+                kind = "batch" if len(pending) > 1 else "write" if pending[0][1] is None else "query"
+                self.tracer.record(self.driver.__name__, message, kind, start, time.perf_counter_ns(), bytes_sent, bytes_received)
+
+    def _check_usable(self) -> None:
+        if self._lost_block:
+            raise ConnectionError(f"{self.driver.__name__} lost track of its replies after an interrupted block, reopen it")
+
+    async def _exchange(self, pending: list[tuple[str, SCPIFuture | None]]) -> int:
+        """Send the pending commands, resolve their futures and return the number of bytes received."""
+        suffix = self.driver.COMMAND_SUFFIX
+        if not self.driver.SUPPORTS_COMPOUND_COMMANDS:
+            bytes_received = 0
+            for message, future in pending:
+                self._writer.write((message + suffix).encode())
+                await self._writer.drain()
+                if future is not None:
+                    reply = await self._readline()
+                    bytes_received += len(reply)
+                    future.set_reply(reply.decode("ascii"))
+            return bytes_received
+
+        futures = [future for _, future in pending if future is not None]
+        self._writer.write((join_compound_message(message for message, _ in pending) + suffix).encode())
+        await self._writer.drain()
+        if not futures:
+            return 0
+        reply = await self._readline()
+        resolve_compound_reply(futures, reply.decode("ascii"))
+        return len(reply)
+
+    async def _exchange_block(self, message: str) -> bytes:
+        self._writer.write((message + self.driver.COMMAND_SUFFIX).encode())
+        await self._writer.drain()
+        while self._discarded_replies:
+            await self._readline_raw()
+            self._discarded_replies -= 1
+        # Any response header in front of the "#" (e.g. "C2:WF DAT2,") is skipped.
+        await self._reader.readuntil(b"#")
+        digits = int(await self._reader.readexactly(1))
+        if digits == 0:
+            # Indefinite length block, terminated by the end of the message.
+            return (await self._readline_raw()).rstrip(b"\r\n")
+        length = int(await self._reader.readexactly(digits))
+        data = await self._reader.readexactly(length)
+        terminator = await self._reader.readexactly(len(self.driver.BLOCK_TERMINATOR))
+        if terminator != self.driver.BLOCK_TERMINATOR:
+            raise ValueError(f"Expected {self.driver.BLOCK_TERMINATOR!r} after a block but got {terminator!r}")
+        return data
+
+    async def _readline_raw(self) -> bytes:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by instrument")
+        return line
+
+    @staticmethod
+    def _unanswered_replies(pending: list[tuple[str, SCPIFuture | None]]) -> int:
+        """At most one reply is outstanding, later queries of a message sent one by one were never sent."""
+        return int(any(future is not None and not future.done() for _, future in pending))
+
+    async def _readline(self) -> bytes:
+        while self._discarded_replies:
+            await self._readline_raw()
+            self._discarded_replies -= 1
+        return await self._readline_raw()
+
+
+class AsyncSCPIBatch(SCPICommandRecorder):
+    """``async with instrument.batch() as batch:`` variant of ``SCPIBatch``."""
+
+    def __init__(self, instrument: AsyncSCPIInstrument) -> None:
+        super(AsyncSCPIBatch, self).__init__(instrument.driver)
+        self._async_instrument = instrument
+
+    async def __aenter__(self) -> "AsyncSCPIBatch":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            await self.execute()
+
+    async def execute(self) -> None:
+        pending, self.pending = self.pending, []
+        await self._async_instrument._execute(pending)
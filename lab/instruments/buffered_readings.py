@@ -0,0 +1,81 @@
+"""Readings a DMM took on its own timer and returned in one transfer.
+
+The multimeter drivers configure a number of samples at a fixed rate, start
+the acquisition and later fetch the whole reading memory with one query, so
+sampling at a high rate costs no round trip per sample::
+
+    dmm.configure_buffered_acquisition(samples=500, rate_hz=50)
+    dmm.start_buffered_acquisition()
+    ...  # step the sweep meanwhile
+    readings = dmm.fetch_buffered_readings()
+    readings.timestamps, readings.values  # numpy arrays of equal length
+
+The instruments do not time stamp their readings, so ``timestamps`` are the
+host's ``time.time()`` at the start of the acquisition plus the sample interval
+for every reading.
+"""
+import time
+from typing import TYPE_CHECKING, Callable, NamedTuple
+
+if TYPE_CHECKING:
+    import numpy
+
+OVERLOAD = 9.9e37  # Reading of an overloaded range
+POLLING_SLEEP_TIME = 0.05
+
+
+class BufferedReadings(NamedTuple):
+    timestamps: "numpy.ndarray"
+    values: "numpy.ndarray"
+
+
+class BufferedAcquisition:
+    """Host side bookkeeping of one acquisition: its start, interval and size."""
+
+    def __init__(self, samples: int, rate_hz: float) -> None:
+        if samples < 1 or rate_hz <= 0:
+            raise ValueError(f"Need at least one sample at a positive rate, got {samples} at {rate_hz} Hz")
+        self.samples = samples
+        self.interval_s = 1.0 / rate_hz
+        self.started: float | None = None
+
+    @property
+    def duration_s(self) -> float:
+        return (self.samples - 1) * self.interval_s
+
+    def start(self) -> None:
+        self.started = time.time()
+
+    def remaining_s(self) -> float:
+        """Time until the last sample is due, 0 if not started."""
+        if self.started is None:
+            return 0.0
+        return max(0.0, self.started + self.duration_s - time.time())
+
+    def readings(self, reply: str) -> BufferedReadings:
+        """Time stamp the comma separated readings of ``reply``; overloads become NaN."""
+        import numpy
+
+        reply = reply.strip()
+        values = numpy.array(reply.split(",") if reply else [], dtype=float)
+        values[numpy.abs(values) >= OVERLOAD] = numpy.nan
+        started = time.time() if self.started is None else self.started
+        return BufferedReadings(started + numpy.arange(len(values)) * self.interval_s, values)
+
+    def wait(self, count_points: Callable[[], int], timeout_s: float) -> None:
+        """Sleep until the last sample is due, then poll ``count_points`` until all are taken."""
+        deadline = time.monotonic() + self.remaining_s() + timeout_s
+        time.sleep(self.remaining_s())
+        while count_points() < self.samples:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Acquisition of {self.samples} samples did not finish in time")
+            time.sleep(min(POLLING_SLEEP_TIME, self.interval_s))
+
+
+def require_acquisition(acquisition: BufferedAcquisition | None, started: bool = False) -> BufferedAcquisition:
+    """The acquisition a driver configured, ``RuntimeError`` if there is none or it was not started."""
+    if acquisition is None:
+        raise RuntimeError("No buffered acquisition, call configure_buffered_acquisition first")
+    if started and acquisition.started is None:
+        raise RuntimeError("The buffered acquisition was not started, call start_buffered_acquisition first")
+    return acquisition
@@ -1,9 +1,14 @@
-from lab.instruments.scpi_instrument import SCPICommand, SCPIInstrument
+import time
+from typing import Callable
+
+from lab.instruments.scpi_instrument import SCPICommand, SCPIInstrument, sync_only
 
 
 class RigolDL3021A(SCPIInstrument):
     """Actually a former Hameg model, that I bought on eBay"""
 
+    MODEL = "DL3021A"
+
     def __init__(self, connection) -> None:
         super(RigolDL3021A, self).__init__(connection)
 
@@ -15,29 +20,156 @@ class RigolDL3021A(SCPIInstrument):
     class SourceCommands(SCPICommand):
         INPUT = "INP:STAT"
         CURRENT = "CURR:LEV:IMM"
+        FUNCTION_MODE = "SOUR:FUNC:MODE"  # FIX, LIST, WAV, BATT, OCP, OPP
+
+    class ListCommands(SCPICommand):
+        MODE = "SOUR:LIST:MODE"  # CC, CV, CR, CP
+        RANGE = "SOUR:LIST:RANG"  # 4 or 40 (A) in CC mode
+        COUNT = "SOUR:LIST:COUN"  # number of runs, 0 = repeat forever
+        STEPS = "SOUR:LIST:STEP"
+        LEVEL = "SOUR:LIST:LEV"  # <step>,<value>
+        WIDTH = "SOUR:LIST:WID"  # <step>,<seconds>
+        END = "SOUR:LIST:END"  # OFF, LAST
+
+    class TriggerCommands(SCPICommand):
+        SOURCE = "TRIG:SOUR"  # BUS, EXT, MAN
+        TRIGGER = "TRIG"
+
+    RESTORED_SETTINGS = (
+        "INP:STAT",
+        "CURR:LEV:IMM",
+        "SOUR:FUNC:MODE",
+        "SOUR:LIST:MODE",
+        "SOUR:LIST:RANG",
+        "SOUR:LIST:COUN",
+        "SOUR:LIST:STEP",
+        "SOUR:LIST:LEV",
+        "SOUR:LIST:WID",
+        "SOUR:LIST:END",
+        "TRIG:SOUR",
+    )
+    INDEXED_SETTINGS = ("SOUR:LIST:LEV", "SOUR:LIST:WID")
+    LIST_MAX_STEPS = 512
+    LIST_UPLOAD_CHUNK = 16  # steps per message while uploading a list
 
     def measure_voltage(self) -> float:
-        return float(self._transmit(self.MeasureCommands.VOLTAGE))
+        return self._query(self.MeasureCommands.VOLTAGE, parser=float)
 
     def measure_current(self) -> float:
-        return float(self._transmit(self.MeasureCommands.CURRENT))
+        return self._query(self.MeasureCommands.CURRENT, parser=float)
 
     def measure_power(self) -> float:
-        return float(self._transmit(self.MeasureCommands.POWER))
+        return self._query(self.MeasureCommands.POWER, parser=float)
 
-    def set_enable_input(self, enable: bool):
-        self._write(self.SourceCommands.INPUT, params="ON" if enable else "OFF")
+    def set_enable_input(self, enable: bool, force: bool = False):
+        """``force`` sends the command even if the shadow state says the input already is in that state."""
+        self._write_setting("input", enable, self.SourceCommands.INPUT, params="ON" if enable else "OFF", force=force)
 
     def get_enable_input(self) -> bool:
-        response = self._transmit(self.SourceCommands.INPUT)
-        return "1" in response
+        return self._query_setting("input", self.SourceCommands.INPUT, parser=lambda response: "1" in response)
 
     def set_current(self, amps: int):
-        self._write(self.SourceCommands.CURRENT, params=str(amps))
+        self._write_setting("current", float(amps), self.SourceCommands.CURRENT, params=str(amps))
 
     def get_current(self) -> float:
-        response = self._transmit(self.SourceCommands.CURRENT)
-        return float(response)
+        return self._query_setting("current", self.SourceCommands.CURRENT, parser=float)
+
+    def set_function_mode(self, mode: str):
+        """Modes: FIX, LIST, WAV, BATT, OCP, OPP"""
+        self._write_setting("function_mode", mode.upper(), self.SourceCommands.FUNCTION_MODE, params=mode)
+
+    def get_function_mode(self) -> str:
+        return self._query_setting("function_mode", self.SourceCommands.FUNCTION_MODE, parser=str.upper)
+
+    def set_list_level(self, step: int, amps: float):
+        self._write(self.ListCommands.LEVEL, params=f"{step},{amps}")
+
+    def set_list_width(self, step: int, seconds: float):
+        self._write(self.ListCommands.WIDTH, params=f"{step},{seconds}")
+
+    def trigger(self):
+        self._write(self.TriggerCommands.TRIGGER)
+
+    @sync_only
+    def upload_current_list(self, currents: list[float], step_width_s: float, current_range: int = 4):
+        """Store a constant current profile in the list memory, it runs once and then holds the last step."""
+        if not 2 <= len(currents) <= self.LIST_MAX_STEPS:
+            raise ValueError(f"A list has 2 to {self.LIST_MAX_STEPS} steps, not {len(currents)}")
+        with self.batch() as batch:
+            batch._write(self.ListCommands.MODE, "CC")
+            batch._write(self.ListCommands.RANGE, str(current_range))
+            batch._write(self.ListCommands.COUNT, "1")
+            batch._write(self.ListCommands.STEPS, str(len(currents)))
+            batch._write(self.ListCommands.END, "LAST")
+        for first_step in range(0, len(currents), self.LIST_UPLOAD_CHUNK):
+            with self.batch() as batch:
+                for step, amps in enumerate(currents[first_step : first_step + self.LIST_UPLOAD_CHUNK], first_step):
+                    batch.set_list_level(step, amps)
+                    batch.set_list_width(step, step_width_s)
+
+    @sync_only
+    def sweep_current(
+        self,
+        currents: list[float],
+        step_width_s: float,
+        on_step: Callable[[int, tuple[float, float, float]], None] | None = None,
+        read_at_s: float | None = None,
+    ) -> list[tuple[float, float, float]]:
+        """Run ``currents`` as list sequences and return (voltage, current, power) per step.
+
+        The load steps through the profile on its own clock, so setting the
+        current costs no round trip per step. The DL3021A has no measurement
+        memory, therefore every step is read in a single batched query
+        ``read_at_s`` after the step started, by default in its middle; the
+        settling time of the DUT leaves the step as short as possible.
+        ``on_step(step, reading)`` is called right after, still within the
+        step, e.g. to read other instruments at the same load. Profiles longer
+        than the list memory are split into several sequences.
+
+        Raises ``TimeoutError`` if the reading of a step, including ``on_step``,
+        only finishes after the load has moved on to the next step.
+        """
+        read_at_s = step_width_s / 2 if read_at_s is None else read_at_s
+        if self.shadow is not None:
+            self.shadow.forget("input", "function_mode")  # Set inside batches and by the list itself
+        readings = []
+        segment_count = -(-len(currents) // self.LIST_MAX_STEPS)
+        segment_size = -(-len(currents) // segment_count)
+        self._write(self.TriggerCommands.SOURCE, "BUS")
+        try:
+            for first_step in range(0, len(currents), segment_size):
+                segment = currents[first_step : first_step + segment_size]
+                self.upload_current_list(segment, step_width_s)
+                self.set_function_mode("LIST")
+                self.set_enable_input(True)
+                self.trigger()
+                started = time.perf_counter()
+                for step in range(len(segment)):
+                    time.sleep(max(0.0, started + step * step_width_s + read_at_s - time.perf_counter()))
+                    with self.batch() as batch:
+                        voltage = batch.measure_voltage()
+                        current = batch.measure_current()
+                        power = batch.measure_power()
+                    reading = voltage.result(), current.result(), power.result()
+                    if on_step is not None:
+                        on_step(first_step + step, reading)
+                    overrun = time.perf_counter() - (started + (step + 1) * step_width_s)
+                    if overrun > 0:
+                        raise TimeoutError(
+                            f"Reading step {first_step + step} ended {overrun * 1000:.1f} ms after the step, "
+                            f"{step_width_s} s steps are too short"
+                        )
+                    readings.append(reading)
+        finally:
+            self.set_function_mode("FIX")
+        return readings
+
+    def _shadowed_settings(self):
+        return [
+            ("input", self.SourceCommands.INPUT, lambda response: "1" in response),
+            ("current", self.SourceCommands.CURRENT, float),
+            ("function_mode", self.SourceCommands.FUNCTION_MODE, str.upper),
+        ]
 
 class RigolDL3021A_247(RigolDL3021A):
     IP_ADDRESS = "192.168.1.247"
@@ -1,21 +1,96 @@
-from lab.instruments.scpi_instrument import SCPICommand, SCPIInstrument
+from lab.instruments.buffered_readings import BufferedAcquisition, BufferedReadings, require_acquisition
+from lab.instruments.scpi_instrument import SCPICommand, SCPIInstrument, sync_only
 
 
 class RigolDM858E(SCPIInstrument):
     """New Multimeter :)"""
 
+    MODEL = "DM858E"
+
     def __init__(self, connection) -> None:
         super(RigolDM858E, self).__init__(connection)
+        self._acquisition: BufferedAcquisition | None = None
 
     class SystemCommands(SCPICommand):
         FETCH = "FETC"
         READ = "READ"
+        INITIATE = "INIT"
+
+    class TriggerCommands(SCPICommand):
+        SOURCE = "TRIG:SOUR"
+        COUNT = "TRIG:COUN"
+
+    class SampleCommands(SCPICommand):
+        COUNT = "SAMP:COUN"
+        SOURCE = "SAMP:SOUR"
+        TIMER = "SAMP:TIM"
+        POINTS = "DATA:POIN"
+
+    ACQUISITION_TIMEOUT_S = 5.0  # On top of the duration of the acquisition
+    RESTORED_SETTINGS = ("TRIG:SOUR", "TRIG:COUN", "SAMP:COUN", "SAMP:SOUR", "SAMP:TIM")  # Not INIT
+    USE_SERVICE_REQUESTS = True  # Over VISA (TCPIP::...::INSTR), a raw socket falls back to *OPC?
 
     def fetch(self) -> float:
-        return self.read() # TODO
+        """Latest reading of the measurement in progress, without triggering a new one like ``read``."""
+        return self._query(self.SystemCommands.FETCH, parser=lambda response: float(response.rsplit(",", 1)[-1]))
 
     def read(self) -> float:
-        return float(self._transmit(self.SystemCommands.READ))
+        return self._query(self.SystemCommands.READ, parser=float)
+
+    def set_trigger_source(self, source: str) -> None:
+        """
+        Sources: IMM, BUS, EXT
+        """
+        self._write(self.TriggerCommands.SOURCE, source)
+
+    def set_trigger_count(self, count: int) -> None:
+        self._write(self.TriggerCommands.COUNT, str(count))
+
+    def set_sample_count(self, count: int) -> None:
+        self._write(self.SampleCommands.COUNT, str(count))
+
+    def set_sample_source(self, source: str) -> None:
+        """
+        Sources: IMM (back to back), TIM (paced by the sample timer)
+        """
+        self._write(self.SampleCommands.SOURCE, source)
+
+    def set_sample_timer(self, interval_s: float) -> None:
+        self._write(self.SampleCommands.TIMER, f"{interval_s:g}")
+
+    def get_reading_memory_points(self) -> int:
+        return self._query(self.SampleCommands.POINTS, parser=int)
+
+    @sync_only
+    def configure_buffered_acquisition(self, samples: int, rate_hz: float) -> None:
+        """Take ``samples`` readings of the current function at ``rate_hz`` on a single immediate trigger."""
+        acquisition = BufferedAcquisition(samples, rate_hz)
+        with self.batch() as batch:
+            batch.set_trigger_source("IMM")
+            batch.set_trigger_count(1)
+            batch.set_sample_source("TIM")
+            batch.set_sample_timer(acquisition.interval_s)
+            batch.set_sample_count(samples)
+        self._acquisition = acquisition
+
+    @sync_only
+    def start_buffered_acquisition(self) -> None:
+        acquisition = require_acquisition(self._acquisition)
+        self._write(self.SystemCommands.INITIATE)
+        acquisition.start()
+
+    @sync_only
+    def fetch_buffered_readings(self, timeout_s: float = ACQUISITION_TIMEOUT_S) -> BufferedReadings:
+        """Wait for the acquisition to finish and read all readings in one transfer."""
+        acquisition = require_acquisition(self._acquisition, started=True)
+        acquisition.wait(self.get_reading_memory_points, timeout_s)
+        return self._query(self.SystemCommands.FETCH, parser=acquisition.readings)
+
+    @sync_only
+    def acquire_buffered(self, samples: int, rate_hz: float) -> BufferedReadings:
+        self.configure_buffered_acquisition(samples, rate_hz)
+        self.start_buffered_acquisition()
+        return self.fetch_buffered_readings()
 
 
 class RigolDM858E_237(RigolDM858E):
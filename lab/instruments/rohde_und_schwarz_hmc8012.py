@@ -1,9 +1,12 @@
-from lab.instruments.scpi_instrument import SCPICommand, SCPIInstrument
+from lab.instruments.buffered_readings import BufferedAcquisition, BufferedReadings, require_acquisition
+from lab.instruments.scpi_instrument import SCPICommand, SCPIInstrument, sync_only
 
 
 class RohdeUndSchwarzHMC8012(SCPIInstrument):
     """Actually a former Hameg model, that I bought on eBay"""
 
+    MODEL = "HMC8012"
+
     class SystemCommands(SCPICommand):
         FETCH = "FETC"
         READ = "READ"
@@ -15,23 +18,35 @@ class RohdeUndSchwarzHMC8012(SCPIInstrument):
         MEAUSRUE_VOLTAGE_DC = "MEAS:VOLT:DC"
         MEASURE_TEMP = "MEAS:TEMP"
 
+    class DataLogCommands(SCPICommand):
+        MODE = "DATA:LOG:MODE"
+        COUNT = "DATA:LOG:COUN"
+        INTERVAL = "DATA:LOG:INT"
+        STATE = "DATA:LOG:STAT"
+        POINTS = "DATA:POIN"
+        DATA = "DATA:DATA"
+
+    ACQUISITION_TIMEOUT_S = 5.0  # On top of the duration of the acquisition
+    RESTORED_SETTINGS = ("TRIG:MODE", "DATA:LOG:MODE", "DATA:LOG:COUN", "DATA:LOG:INT")  # Not DATA:LOG:STAT
+
     def __init__(self, connection) -> None:
         super(RohdeUndSchwarzHMC8012, self).__init__(connection)
+        self._acquisition: BufferedAcquisition | None = None
 
     def fetch(self) -> float:
-        return float(self._transmit(self.SystemCommands.FETCH))
+        return self._query(self.SystemCommands.FETCH, parser=float)
 
     def read(self) -> float:
-        return float(self._transmit(self.SystemCommands.READ))
+        return self._query(self.SystemCommands.READ, parser=float)
 
     def get_trigger_mode(self) -> str:
-        return self._transmit(self.TriggerCommands.MODE)
+        return self._query_setting("trigger_mode", self.TriggerCommands.MODE, parser=str.upper)
 
     def set_trigger_mode(self, mode: str) -> None:
         """
         Modes: SING, AUTO, MAN
         """
-        self._write(self.TriggerCommands.MODE, mode)
+        self._write_setting("trigger_mode", mode.upper(), self.TriggerCommands.MODE, mode)
 
     def measure_voltage_dc(self, voltage_range: str) -> float:
         """
@@ -39,8 +54,8 @@ class RohdeUndSchwarzHMC8012(SCPIInstrument):
 
         If the input signal is greater than can be measured on the selected range (manual ranging), the instrument returns 9.90000000E+37.
         """
-        return float(
-            self._transmit(self.MeasurementCommands.MEAUSRUE_VOLTAGE_DC, voltage_range)
+        return self._query(
+            self.MeasurementCommands.MEAUSRUE_VOLTAGE_DC, voltage_range, parser=float
         )
 
     def measure_temperature(self, enable_4w: bool = False, probe_type: str ="") -> float:
@@ -49,10 +64,62 @@ class RohdeUndSchwarzHMC8012(SCPIInstrument):
 
         If the input signal is greater than can be measured on the selected range (manual ranging), the instrument returns 9.90000000E+37.
         """
-        return float(
-            self._transmit(self.MeasurementCommands.MEASURE_TEMP, params=f"{'FRTD' if enable_4w else 'RTD'} {probe_type}")
+        return self._query(
+            self.MeasurementCommands.MEASURE_TEMP, params=f"{'FRTD' if enable_4w else 'RTD'} {probe_type}", parser=float
         )
 
+    def set_data_log_mode(self, mode: str) -> None:
+        """
+        Modes: UNL (until stopped), COUN (number of readings), TIME (duration)
+        """
+        self._write_setting("data_log_mode", mode.upper(), self.DataLogCommands.MODE, mode)
+
+    def set_data_log_count(self, count: int) -> None:
+        self._write_setting("data_log_count", count, self.DataLogCommands.COUNT, str(count))
+
+    def set_data_log_interval(self, interval_s: float) -> None:
+        self._write_setting("data_log_interval", interval_s, self.DataLogCommands.INTERVAL, f"{interval_s:g}")
+
+    def set_data_log_state(self, enabled: bool) -> None:
+        """Not shadowed, switching it on starts a new log every time."""
+        self._write(self.DataLogCommands.STATE, "ON" if enabled else "OFF")
+
+    def get_data_log_points(self) -> int:
+        return self._query(self.DataLogCommands.POINTS, parser=int)
+
+    @sync_only
+    def configure_buffered_acquisition(self, samples: int, rate_hz: float) -> None:
+        """Log ``samples`` readings of the current function at ``rate_hz`` into the reading memory."""
+        acquisition = BufferedAcquisition(samples, rate_hz)
+        with self.batch() as batch:
+            batch.set_data_log_state(False)
+            batch.set_data_log_mode("COUN")
+            batch.set_data_log_count(samples)
+            batch.set_data_log_interval(acquisition.interval_s)
+        self._acquisition = acquisition
+
+    @sync_only
+    def start_buffered_acquisition(self) -> None:
+        acquisition = require_acquisition(self._acquisition)
+        self.set_data_log_state(True)
+        acquisition.start()
+
+    @sync_only
+    def fetch_buffered_readings(self, timeout_s: float = ACQUISITION_TIMEOUT_S) -> BufferedReadings:
+        """Wait for the acquisition to finish and read all readings in one transfer."""
+        acquisition = require_acquisition(self._acquisition, started=True)
+        acquisition.wait(self.get_data_log_points, timeout_s)
+        return self._query(self.DataLogCommands.DATA, parser=acquisition.readings)
+
+    @sync_only
+    def acquire_buffered(self, samples: int, rate_hz: float) -> BufferedReadings:
+        self.configure_buffered_acquisition(samples, rate_hz)
+        self.start_buffered_acquisition()
+        return self.fetch_buffered_readings()
+
+    def _shadowed_settings(self):
+        return [("trigger_mode", self.TriggerCommands.MODE, str.upper)]
+
 
 class RohdeUndSchwarzHMC8012_146(RohdeUndSchwarzHMC8012):
     IP_ADDRESS = "192.168.1.146"
@@ -0,0 +1,134 @@
+"""Batching of several SCPI commands into one compound message.
+
+Inside ``with instrument.batch() as batch:`` the driver methods are called on
+the batch instead of the instrument. Queries are not sent right away, they
+return an ``SCPIFuture``. When the block ends all commands are joined with
+``;`` into one message, sent in a single write and the one reply is split and
+parsed into the futures::
+
+    with load.batch() as batch:
+        voltage = batch.measure_voltage()
+        current = batch.measure_current()
+    print(voltage.result(), current.result())
+"""
+import inspect
+from typing import Callable, Generic, Iterable, TypeVar
+
+T = TypeVar("T")
+
+COMPOUND_SEPARATOR = ";"
+REPLY_SEPARATOR = ";"
+
+
+class SCPIBatchError(Exception):
+    pass
+
+
+class SCPIFuture(Generic[T]):
+    """Result of a query that is sent later as part of a batch."""
+
+    def __init__(self, parser: Callable[[str], T] = str) -> None:
+        self._parser = parser
+        self._done = False
+        self._result: T | None = None
+
+    def done(self) -> bool:
+        return self._done
+
+    def result(self) -> T:
+        if not self._done:
+            raise SCPIBatchError("Batch has not been executed yet")
+        return self._result
+
+    def set_reply(self, reply: str) -> None:
+        self._result = self._parser(reply.strip())
+        self._done = True
+
+
+class SCPICommandRecorder:
+    """Stands in for an instrument and records the commands its methods send.
+
+    ``instrument`` is a driver instance or a driver class. Attribute lookups are
+    forwarded to it and its methods are rebound to the recorder, so every
+    ``_write`` and ``_query`` they make ends up in ``pending``.
+    """
+
+    shadow = None  # Recorded commands are always sent, see _write_setting
+
+    def __init__(self, instrument) -> None:
+        self._instrument = instrument
+        self.pending: list[tuple[str, SCPIFuture | None]] = []
+
+    def __getattr__(self, name: str):
+        owner = self._instrument if isinstance(self._instrument, type) else type(self._instrument)
+        function = inspect.getattr_static(owner, name, None)
+        if inspect.isfunction(function):
+            return function.__get__(self)
+        return getattr(self._instrument, name)
+
+    def _write(self, command, params: str = "", query: bool = False) -> None:
+        if query:
+            raise SCPIBatchError(f"{command.value} reads a raw reply and cannot be batched")
+        self.pending.append((self._format_command(command, params), None))
+
+    def _query(self, command, params: str = "", parser: Callable[[str], T] = str) -> SCPIFuture[T]:
+        future = SCPIFuture(parser)
+        self.pending.append((self._format_command(command, params, query=True), future))
+        return future
+
+    def _transmit(self, command, params: str = "", query: bool = True) -> SCPIFuture[str]:
+        return self._query(command, params)
+
+    def _write_setting(
+        self, key: str, value, command, params: str = "", invalidates: tuple[str, ...] = (), force: bool = False
+    ) -> None:
+        shadow = getattr(self._instrument, "shadow", None)
+        if shadow is not None:
+            shadow.forget(key, *invalidates)
+        self._write(command, params)
+
+    def _read(self) -> bytes:
+        raise SCPIBatchError("Raw reads cannot be batched")
+
+    def _read_block(self) -> bytes:
+        raise SCPIBatchError("Raw reads cannot be batched")
+
+
+class SCPIBatch(SCPICommandRecorder):
+    """Context manager that sends the recorded commands when it is left."""
+
+    def __enter__(self) -> "SCPIBatch":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.execute()
+
+    def execute(self) -> None:
+        if self.pending:
+            self._instrument._execute(self.pending)
+            self.pending = []
+
+
+def join_compound_message(messages: Iterable[str]) -> str:
+    """Join commands into one message.
+
+    Every command after the first gets a leading ``:`` so that its header is
+    resolved from the root and not relative to the previous command. Common
+    commands (``*IDN?``) do not need it.
+    """
+    joined = []
+    for message in messages:
+        if joined and not message.startswith(("*", ":")):
+            message = ":" + message
+        joined.append(message)
+    return COMPOUND_SEPARATOR.join(joined)
+
+
+def resolve_compound_reply(futures: list[SCPIFuture], reply: str) -> None:
+    """Split the reply to a compound message onto the futures of its queries."""
+    replies = reply.strip().split(REPLY_SEPARATOR)
+    if len(replies) != len(futures):
+        raise SCPIBatchError(f"Expected {len(futures)} replies but got {len(replies)}: {reply!r}")
+    for future, single_reply in zip(futures, replies):
+        future.set_reply(single_reply)
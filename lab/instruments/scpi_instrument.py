@@ -1,5 +1,29 @@
 import time
 from enum import Enum
+from typing import Any, Callable, TypeVar
+
+from lab.instruments.scpi_batch import (
+    SCPIBatch,
+    SCPIFuture,
+    join_compound_message,
+    resolve_compound_reply,
+)
+from lab.instruments.shadow_state import ShadowState
+from lab.instruments.transport import Transport, create_transport
+
+
+T = TypeVar("T")
+F = TypeVar("F", bound=Callable)
+
+
+def sync_only(method: F) -> F:
+    """Mark a driver method that uses replies or raw reads while it runs.
+
+    Such a method cannot be recorded, so ``AsyncSCPIInstrument`` refuses it
+    when it is looked up instead of failing in the middle of the call.
+    """
+    method.sync_only = True
+    return method
 
 
 class SCPICommand(Enum):
@@ -11,14 +35,35 @@ class SCPIInstrument:
         ID = "*IDN"
         RESET = "*RST"
         OPERATION_COMPLETE = "*OPC"
+        CLEAR_STATUS = "*CLS"
+        EVENT_STATUS_ENABLE = "*ESE"
+        EVENT_STATUS_REGISTER = "*ESR"
+        SERVICE_REQUEST_ENABLE = "*SRE"
 
     QUERY_SUFFIX = "?"
     COMMAND_SUFFIX = "\r\n"
+    BLOCK_TERMINATOR = b"\n"  # What follows the payload of a definite length block reply
     PORT = 5025
-    POLLING_SLEEP_TIME = 0.1
+    MODEL = ""  # Model field of the *IDN? reply, to find the instrument on the network
+    SERIAL_NUMBER = ""  # Serial number field of the *IDN? reply, to tell instruments of the same model apart
+    TIMEOUT_S = 5.0  # Read timeout of connections opened by the session manager
+    POLLING_SLEEP_TIME = 0.1  # Longest pause between two polls of the event status register
+    FIRST_POLLING_SLEEP_TIME = 0.001
+    OPERATION_TIMEOUT_S = 10.0
+    OPERATION_COMPLETE_BIT = 1  # Event status register
+    EVENT_STATUS_BIT = 32  # Status byte, summary of the enabled event status bits
+    SUPPORTS_COMPOUND_COMMANDS = True  # Accepts several commands joined with ";"
+    SUPPORTS_BLOCKING_OPC = True  # Answers *OPC? only once all pending operations are complete
+    USE_SERVICE_REQUESTS = False  # Wait for an SRQ instead of *OPC? where the transport supports it
+    RESTORED_SETTINGS: tuple[str, ...] = ()  # Headers of the state a session replays after a reconnect, no actions
+    INDEXED_SETTINGS: tuple[str, ...] = ()  # Restored headers whose first parameter selects an entry, e.g. a list step
+    tracer = None  # SCPITracer from lab.instruments.tracing, None disables tracing
+    shadow: ShadowState | None = None  # Cache of the settings, None sends every command
+    _pending_trace: tuple[str, int, int] | None = None
 
     def __init__(self, connection):
         self._connection = connection
+        self._transport: Transport = create_transport(connection, self.COMMAND_SUFFIX)
 
     def get_id_string(self) -> str:
         return self._transmit(self.CommonCommands.ID)
@@ -27,38 +72,197 @@ class SCPIInstrument:
         self._write(self.CommonCommands.RESET)
 
     def is_operation_complete(self) -> bool:
-        return "1" in self._transmit(self.CommonCommands.OPERATION_COMPLETE)
-
-    def wait_until_operation_is_completed(self) -> None:
-        while not self.is_operation_complete():
-            time.sleep(self.POLLING_SLEEP_TIME)
-
-    def _read(self, size=64) -> bytes:
-        response = b""
-        while response[-1:] != b"\n":
-            if type(self._connection).__name__ == "Telnet":
-                response = self._connection.read_very_eager()
-                break
-            if type(self._connection).__name__ == "socket":
-                response = self._connection.recv(size)
-            if type(self._connection).__name__ in ["USBInstrument", "TCPIPInstrument"]:
-                response = self._connection.read_raw(size)
-        return response
+        return self._query(self.CommonCommands.OPERATION_COMPLETE, parser=lambda response: "1" in response)
 
-    def _write(self, command: SCPICommand, params: str = "", query: bool = False):
+    def signal_operation_complete(self) -> None:
+        """Set the operation complete bit of the event status register once pending operations are done."""
+        self._write(self.CommonCommands.OPERATION_COMPLETE)
+
+    def clear_status(self) -> None:
+        self._write(self.CommonCommands.CLEAR_STATUS)
+
+    def get_event_status_register(self) -> int:
+        """Read and thereby clear the event status register."""
+        return self._query(self.CommonCommands.EVENT_STATUS_REGISTER, parser=lambda response: int(float(response)))
+
+    def set_event_status_enable(self, mask: int) -> None:
+        self._write(self.CommonCommands.EVENT_STATUS_ENABLE, str(mask))
+
+    def set_service_request_enable(self, mask: int) -> None:
+        self._write(self.CommonCommands.SERVICE_REQUEST_ENABLE, str(mask))
+
+    def wait_until_operation_is_completed(self, timeout_s: float | None = None) -> None:
+        """Return as soon as all pending operations are complete.
+
+        Waits for a service request if ``USE_SERVICE_REQUESTS`` and the transport
+        supports them, otherwise for the reply to a single ``*OPC?``. Instruments
+        that answer ``*OPC?`` right away (``SUPPORTS_BLOCKING_OPC = False``) get
+        their event status register polled with exponential backoff. Raises
+        ``TimeoutError`` after ``timeout_s``, default ``OPERATION_TIMEOUT_S``.
+        """
+        timeout_s = self.OPERATION_TIMEOUT_S if timeout_s is None else timeout_s
+        try:
+            if self.USE_SERVICE_REQUESTS and self._transport.SUPPORTS_SERVICE_REQUESTS:
+                self._wait_for_service_request(timeout_s)
+            elif self.SUPPORTS_BLOCKING_OPC:
+                self._wait_for_operation_complete_reply(timeout_s)
+            else:
+                self._poll_operation_complete(timeout_s)
+        except TimeoutError as error:
+            raise TimeoutError(f"{type(self).__name__} did not complete its operations within {timeout_s} s") from error
+
+    def batch(self) -> SCPIBatch:
+        """Collect commands and queries and send them as one message, see ``scpi_batch``."""
+        return SCPIBatch(self)
+
+    @sync_only
+    def sync(self) -> None:
+        """Forget the shadow state and read the settings back in one message."""
+        if self.shadow is None:
+            return
+        self.shadow.clear()
+        settings = self._shadowed_settings()
+        if not settings:
+            return
+        with self.batch() as batch:
+            futures = [(key, batch._query(command, parser=parser)) for key, command, parser in settings]
+        for key, future in futures:
+            self.shadow.remember(key, future.result())
+
+    def _shadowed_settings(self) -> list[tuple[str, SCPICommand, Callable[[str], Any]]]:
+        """Key, query and parser of every setting ``sync`` reads back."""
+        return []
+
+    def _write_setting(
+        self,
+        key: str,
+        value: Any,
+        command: SCPICommand,
+        params: str = "",
+        invalidates: tuple[str, ...] = (),
+        force: bool = False,
+    ) -> None:
+        """Write a setting unless the shadow state knows the instrument already has ``value``.
+
+        ``invalidates`` are keys of cached state the setting changes as well, e.g. a status register.
+        With ``force`` the setting is always sent, e.g. to switch an output off for sure.
+        """
+        if self.shadow is None:
+            self._write(command, params)
+            return
+        known, current = self.shadow.lookup(key)
+        if known and current == value and not force:
+            return
+        self._write(command, params)
+        self.shadow.remember(key, value)
+        self.shadow.forget(*invalidates)
+
+    def _query_setting(self, key: str, command: SCPICommand, parser: Callable[[str], T] = str) -> T:
+        if self.shadow is None:
+            return self._query(command, parser=parser)
+        known, value = self.shadow.lookup(key)
+        if not known:
+            value = self._query(command, parser=parser)
+            self.shadow.remember(key, value)
+        return value
+
+    def _wait_for_operation_complete_reply(self, timeout_s: float) -> None:
+        with self._transport.timeout(timeout_s):
+            try:
+                self.is_operation_complete()
+            except TimeoutError:
+                # The reply still arrives once the operation completes.
+                self._transport.discard_reply()
+                self._pending_trace = None
+                raise
+
+    def _wait_for_service_request(self, timeout_s: float) -> None:
+        with self._transport.service_requests() as wait_for_service_request:
+            with self.batch() as batch:
+                batch.clear_status()
+                batch.set_event_status_enable(self.OPERATION_COMPLETE_BIT)
+                batch.set_service_request_enable(self.EVENT_STATUS_BIT)
+                batch.signal_operation_complete()
+            wait_for_service_request(timeout_s)
+        self.get_event_status_register()
+
+    def _poll_operation_complete(self, timeout_s: float) -> None:
+        with self.batch() as batch:
+            batch.clear_status()
+            batch.signal_operation_complete()
+        deadline = time.monotonic() + timeout_s
+        sleep_time = self.FIRST_POLLING_SLEEP_TIME
+        while not self.get_event_status_register() & self.OPERATION_COMPLETE_BIT:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError
+            time.sleep(min(sleep_time, remaining))
+            sleep_time = min(2 * sleep_time, self.POLLING_SLEEP_TIME)
+
+    def _read(self) -> bytes:
+        if self.tracer is None:
+            return self._transport.read_line()
+        return self._traced_read(self._transport.read_line)
+
+    def _read_block(self) -> bytes:
+        if self.tracer is None:
+            return self._transport.read_block(self.BLOCK_TERMINATOR)
+        return self._traced_read(lambda: self._transport.read_block(self.BLOCK_TERMINATOR))
+
+    def _format_command(self, command: SCPICommand, params: str = "", query: bool = False) -> str:
         cmd = command.value + self.QUERY_SUFFIX if query else command.value
-        if type(self._connection).__name__ == "Telnet":
-            final_cmd = (cmd + " " + params).strip() + self.COMMAND_SUFFIX
-            self._connection.write(final_cmd.encode())
-        if type(self._connection).__name__ == "socket":
-            final_cmd = cmd + " " + params + self.COMMAND_SUFFIX
-            self._connection.sendall(final_cmd.encode())
-        if type(self._connection).__name__ in ["USBInstrument", "TCPIPInstrument"]:
-            final_cmd = str(cmd + " " + params).strip()
-            self._connection.write(final_cmd)
+        return (cmd + " " + params).strip()
+
+    def _write(self, command: SCPICommand, params: str = "", query: bool = False):
+        message = self._format_command(command, params, query)
+        if self.tracer is None:
+            self._transport.write(message)
+            return
+
+        start = time.perf_counter_ns()
+        self._transport.write(message)
+        bytes_sent = len(message) + len(self.COMMAND_SUFFIX)
+        if query:
+            # Completed as a query event, with the round trip time, by the next read.
+            self._pending_trace = (message, start, bytes_sent)
+        else:
+            self.tracer.record(type(self).__name__, message, "write", start, time.perf_counter_ns(), bytes_sent)
 
     def _transmit(
         self, command: SCPICommand, params: str = "", query: bool = True
     ) -> str:
         self._write(command, params, query)
         return self._read().decode("ascii").strip()
+
+    def _query(self, command: SCPICommand, params: str = "", parser: Callable[[str], T] = str) -> T:
+        return parser(self._transmit(command, params))
+
+    def _execute(self, pending: list[tuple[str, SCPIFuture | None]]) -> None:
+        """Send batched commands and resolve the futures of the queries among them."""
+        if not self.SUPPORTS_COMPOUND_COMMANDS:
+            for message, future in pending:
+                self._exchange(message, future is not None, [future] if future is not None else [])
+            return
+
+        futures = [future for _, future in pending if future is not None]
+        self._exchange(join_compound_message(message for message, _ in pending), bool(futures), futures)
+
+    def _exchange(self, message: str, expect_reply: bool, futures: list[SCPIFuture]) -> None:
+        start = time.perf_counter_ns() if self.tracer is not None else 0
+        self._transport.write(message)
+        reply = self._transport.read_line() if expect_reply else b""
+        if futures:
+            resolve_compound_reply(futures, reply.decode("ascii"))
+        if self.tracer is not None:
+            self.tracer.record(
+                type(self).__name__, message, "batch", start, time.perf_counter_ns(), len(message) + len(self.COMMAND_SUFFIX), len(reply)
+            )
+
+    def _traced_read(self, read: Callable[[], bytes]) -> bytes:
+        command, start, bytes_sent = self._pending_trace or ("", time.perf_counter_ns(), 0)
+        self._pending_trace = None
+        response = read()
+        self.tracer.record(
+            type(self).__name__, command, "query" if bytes_sent else "read", start, time.perf_counter_ns(), bytes_sent, len(response)
+        )
+        return response
@@ -0,0 +1,291 @@
+"""Connections to the bench instruments, opened once per process and kept alive.
+
+``SessionManager.open`` returns a connected driver. Drivers are pooled per
+address, so a second script in the same process (or a second run in a
+notebook) gets the warm connection instead of a new TCP handshake::
+
+    session = default_session()
+    load = session.open(RigolDL3021A_247)
+    psu = session.open(Siglent1305X_249, ("192.168.1.50", 5025))
+
+An instrument's address comes from, in this order: the address passed to
+``open``, the session's ``addresses`` (from a config file or a discovery
+scan by ``*IDN?``) and finally the ``IP_ADDRESS`` and ``PORT`` of the
+driver class. A config file maps driver class names to addresses and may
+override the read timeout::
+
+    [instruments]
+    RigolDL3021A_247 = "192.168.1.247:5555"
+    Siglent1104X_107 = { address = "192.168.1.107", timeout = 20 }
+
+    [discovery]
+    hosts = ["192.168.1.100-254"]
+
+Connections use TCP_NODELAY and the driver's ``TIMEOUT_S``. When the
+instrument drops the connection the transport reconnects, replays the
+settings written so far and sends the queries of an interrupted exchange
+again. Only the state the driver lists in ``RESTORED_SETTINGS`` is replayed,
+e.g. ``CURR:LEV:IMM 1.5``, never a command that starts something like a
+trigger or a data log. Settings in ``INDEXED_SETTINGS`` are kept per entry of
+their first parameter, so every step of a list is restored.
+
+``open_async`` connects an ``AsyncSCPIInstrument`` to the same address with
+the same timeout. Those connections are neither pooled nor reconnected: an
+asyncio stream belongs to the event loop of a single run, and a run that
+loses an instrument stops, to be continued from its checkpoint (see
+``temp_and_noise``).
+"""
+import concurrent.futures
+import ipaddress
+import logging
+import pathlib
+import socket
+import threading
+import time
+import tomllib
+from typing import Iterable
+
+from lab.instruments.async_scpi_instrument import AsyncSCPIInstrument
+from lab.instruments.scpi_instrument import SCPIInstrument
+from lab.instruments.transport import SocketTransport
+
+Address = tuple[str, int]
+DISCOVERY_PORTS = (5025, 5555)
+DISCOVERY_TIMEOUT_S = 0.3
+
+
+class ReconnectingSocketTransport(SocketTransport):
+    """Socket transport that reconnects and restores the instrument's settings after a dropped connection."""
+
+    RECONNECT_ATTEMPTS = 3
+    RECONNECT_SLEEP_TIME = 0.2  # Doubled after every failed attempt
+
+    def __init__(
+        self,
+        address: Address,
+        timeout_s: float | None,
+        write_termination: str = "\r\n",
+        restored_settings: Iterable[str] = (),
+        indexed_settings: Iterable[str] = (),
+    ) -> None:
+        self.address = address
+        self.timeout_s = timeout_s
+        self.reconnects = 0
+        self.restored_settings = {header.upper() for header in restored_settings}
+        self.indexed_settings = {header.upper() for header in indexed_settings}
+        self._settings: dict[str, str] = {}  # Key -> last command, in the order they were last written
+        self._last_message = ""
+        super(ReconnectingSocketTransport, self).__init__(self._connect(), write_termination)
+
+    def write(self, message: str) -> None:
+        self._remember_settings(message)
+        try:
+            super(ReconnectingSocketTransport, self).write(message)
+        except ConnectionError:
+            self._reconnect()
+            super(ReconnectingSocketTransport, self).write(message)
+        self._last_message = message
+
+    def read_line(self) -> bytes:
+        try:
+            return super(ReconnectingSocketTransport, self).read_line()
+        except ConnectionError:
+            self._reconnect()
+            self._repeat_queries()
+            return super(ReconnectingSocketTransport, self).read_line()
+
+    def read_block(self, terminator: bytes = SocketTransport.LINE_TERMINATOR) -> bytes:
+        try:
+            return super(ReconnectingSocketTransport, self).read_block(terminator)
+        except ConnectionError:
+            self._reconnect()
+            self._repeat_queries()
+            return super(ReconnectingSocketTransport, self).read_block(terminator)
+
+    def _connect(self) -> socket.socket:
+        connection = socket.create_connection(self.address, timeout=self.timeout_s)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+
+    def _reconnect(self) -> None:
+        logger = logging.getLogger(__name__)
+        sleep_time = self.RECONNECT_SLEEP_TIME
+        for attempt in range(1, self.RECONNECT_ATTEMPTS + 1):
+            try:
+                self._connection.close()
+                self._connection = self._connect()
+                break
+            except OSError as error:
+                logger.warning("Reconnect %d to %s:%d failed: %s", attempt, *self.address, error)
+                if attempt == self.RECONNECT_ATTEMPTS:
+                    raise ConnectionError(f"Lost the connection to {self.address[0]}:{self.address[1]}") from error
+                time.sleep(sleep_time)
+                sleep_time *= 2
+        self.reconnects += 1
+        self.clear()
+        self._discarded_replies = 0
+        logger.info("Reconnected to %s:%d, restoring %d settings", *self.address, len(self._settings))
+        for command in self._settings.values():
+            super(ReconnectingSocketTransport, self).write(command)
+
+    def _repeat_queries(self) -> None:
+        """Send the queries of the interrupted message again, its settings were just restored."""
+        queries = [
+            command.strip() for command in self._last_message.split(";") if command.strip().partition(" ")[0].endswith("?")
+        ]
+        if not queries:
+            raise ConnectionError(f"Lost the connection to {self.address[0]}:{self.address[1]} while waiting for a reply")
+        super(ReconnectingSocketTransport, self).write(";".join(queries))
+
+    def _remember_settings(self, message: str) -> None:
+        for command in message.split(";"):
+            header, _, params = command.strip().lstrip(":").partition(" ")
+            key = header.upper()
+            if not params or key not in self.restored_settings:
+                continue
+            if key in self.indexed_settings:
+                key += " " + params.partition(",")[0].strip().upper()
+            self._settings.pop(key, None)
+            self._settings[key] = ":" + command.strip().lstrip(":")
+
+
+class SessionManager:
+    def __init__(self, addresses: dict[type, Address] | None = None, timeouts: dict[type, float] | None = None) -> None:
+        self.addresses = dict(addresses or {})
+        self.timeouts = dict(timeouts or {})
+        self._pool: dict[tuple[type, Address], SCPIInstrument] = {}
+        self._transports: list[ReconnectingSocketTransport] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "SessionManager":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @classmethod
+    def from_config(cls, path: str | pathlib.Path, drivers: Iterable[type[SCPIInstrument]]) -> "SessionManager":
+        """Session with the addresses of a config file, discovering ``drivers`` it does not list."""
+        with open(path, "rb") as file:
+            config = tomllib.load(file)
+        by_name = {driver.__name__: driver for driver in drivers}
+        session = cls()
+        for name, entry in config.get("instruments", {}).items():
+            if name not in by_name:
+                raise ValueError(f"Unknown instrument {name} in {path}")
+            entry = entry if isinstance(entry, dict) else {"address": entry}
+            session.addresses[by_name[name]] = parse_address(entry["address"], by_name[name].PORT)
+            if "timeout" in entry:
+                session.timeouts[by_name[name]] = float(entry["timeout"])
+        missing = [driver for driver in by_name.values() if driver not in session.addresses]
+        hosts = config.get("discovery", {}).get("hosts", [])
+        if missing and hosts:
+            session.discover(expand_hosts(hosts), missing)
+        return session
+
+    def address(self, driver: type[SCPIInstrument]) -> Address:
+        return self.addresses.get(driver, (getattr(driver, "IP_ADDRESS", ""), driver.PORT))
+
+    def open(self, driver: type[SCPIInstrument], address: Address | None = None) -> SCPIInstrument:
+        """The pooled driver connected to ``address``, connecting on first use."""
+        address = tuple(address or self.address(driver))
+        with self._lock:
+            instrument = self._pool.get((driver, address))
+            if instrument is None:
+                transport = ReconnectingSocketTransport(
+                    address,
+                    self.timeouts.get(driver, driver.TIMEOUT_S),
+                    driver.COMMAND_SUFFIX,
+                    driver.RESTORED_SETTINGS,
+                    driver.INDEXED_SETTINGS,
+                )
+                instrument = self._pool[(driver, address)] = driver(transport)
+                self._transports.append(transport)
+            return instrument
+
+    async def open_async(self, driver: type[SCPIInstrument], address: Address | None = None) -> AsyncSCPIInstrument:
+        """A new asyncio connection to the address ``open`` would use, with the same timeout."""
+        host, port = address or self.address(driver)
+        return await AsyncSCPIInstrument.open(driver, host, port, self.timeouts.get(driver, driver.TIMEOUT_S))
+
+    def discover(
+        self,
+        hosts: Iterable[str],
+        drivers: Iterable[type[SCPIInstrument]],
+        ports: Iterable[int] = DISCOVERY_PORTS,
+        timeout_s: float = DISCOVERY_TIMEOUT_S,
+    ) -> dict[type, Address]:
+        """Probe ``hosts`` with ``*IDN?`` in parallel and remember where each driver's model answered.
+
+        A driver with a ``SERIAL_NUMBER`` only matches that one instrument.
+        """
+        candidates = [(host, port) for host in hosts for port in ports]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(64, len(candidates) or 1)) as executor:
+            identities = dict(zip(candidates, executor.map(lambda address: identify(address, timeout_s), candidates)))
+        found = {}
+        for driver in drivers:
+            for address, identity in identities.items():
+                if identity and matches(driver, identity):
+                    found[driver] = address
+                    break
+        self.addresses.update(found)
+        return found
+
+    def close(self) -> None:
+        with self._lock:
+            for transport in self._transports:
+                transport.close()
+            self._pool.clear()
+            self._transports.clear()
+
+
+def identify(address: Address, timeout_s: float = DISCOVERY_TIMEOUT_S) -> str | None:
+    """The ``*IDN?`` reply of whatever listens on ``address``, None if nothing answers."""
+    try:
+        with socket.create_connection(address, timeout=timeout_s) as connection:
+            connection.sendall(b"*IDN?\n")
+            reply = b""
+            while not reply.endswith(b"\n"):
+                data = connection.recv(4096)
+                if not data:
+                    break
+                reply += data
+            return reply.decode("ascii", "replace").strip() or None
+    except OSError:
+        return None
+
+
+def matches(driver: type[SCPIInstrument], identity: str) -> bool:
+    fields = [field.strip().upper() for field in identity.split(",")]
+    if len(fields) < 2 or not driver.MODEL or not fields[1].startswith(driver.MODEL.upper()):
+        return False
+    return not driver.SERIAL_NUMBER or (len(fields) > 2 and fields[2] == driver.SERIAL_NUMBER.upper())
+
+
+def parse_address(address: str, default_port: int) -> Address:
+    host, _, port = address.partition(":")
+    return host, int(port) if port else default_port
+
+
+def expand_hosts(hosts: Iterable[str]) -> list[str]:
+    """Hosts with "a.b.c.first-last" ranges of the last octet expanded."""
+    expanded = []
+    for host in hosts:
+        if "-" in host.rpartition(".")[2]:
+            prefix, _, octets = host.rpartition(".")
+            first, last = (int(octet) for octet in octets.split("-"))
+            expanded += [str(ipaddress.ip_address(f"{prefix}.{octet}")) for octet in range(first, last + 1)]
+        else:
+            expanded.append(host)
+    return expanded
+
+
+_default_session: SessionManager | None = None
+
+
+def default_session() -> SessionManager:
+    """The session shared by all scripts of this process."""
+    global _default_session
+    if _default_session is None:
+        _default_session = SessionManager()
+    return _default_session
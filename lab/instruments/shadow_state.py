@@ -0,0 +1,46 @@
+"""Last known settings of an instrument, to skip redundant round trips.
+
+With a ``ShadowState`` assigned to a driver's ``shadow`` attribute, setters
+remember what they wrote and are not sent again while the instrument is
+known to have that value, and getters of settings answer from the shadow
+state. Values are trusted for ``staleness_s`` seconds, after that they are
+read again, in case someone turned a knob on the front panel::
+
+    psu.shadow = ShadowState(staleness_s=10)
+    psu.set_voltage(23)
+    psu.set_voltage(23)  # not sent
+    psu.get_output_enabled(), psu.get_4w_mode_enabled()  # one SYST:STAT? for both
+    psu.sync()  # forget everything and read the settings back
+
+Measurements (``measure_*``, ``fetch``) are never cached. Batches and the
+asyncio wrapper always send and only invalidate what they change.
+"""
+import time
+from typing import Any
+
+
+class ShadowState:
+    def __init__(self, staleness_s: float = 5.0) -> None:
+        self.staleness_s = staleness_s
+        self.hits = 0
+        self.misses = 0
+        self._values: dict[str, tuple[Any, float]] = {}
+
+    def lookup(self, key: str) -> tuple[bool, Any]:
+        """(True, value) if ``key`` is known and fresh, else (False, None)."""
+        entry = self._values.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.staleness_s:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, entry[0]
+
+    def remember(self, key: str, value: Any) -> None:
+        self._values[key] = (value, time.monotonic())
+
+    def forget(self, *keys: str) -> None:
+        for key in keys:
+            self._values.pop(key, None)
+
+    def clear(self) -> None:
+        self._values.clear()
@@ -1,12 +1,60 @@
-import matplotlib.pyplot as plt
-from quantiphy import Quantity
+import math
+import re
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator
 
-from lab.instruments.scpi_instrument import SCPICommand, SCPIInstrument
+from lab.instruments.scpi_instrument import SCPICommand, SCPIInstrument, sync_only
+
+if TYPE_CHECKING:
+    import numpy
+
+SI_PREFIXES = {"p": 1e-12, "n": 1e-9, "u": 1e-6, "m": 1e-3, "k": 1e3, "K": 1e3, "M": 1e6, "G": 1e9}
+NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+
+def parse_quantity(response: str, unit: str = "") -> float:
+    """Parse replies like ``C2:VDIV 5.00E-01V``, ``SARA 1.00GSa/s`` or ``SANU 1.40Mpts``."""
+    value = response.strip().split(" ")[-1].split(",")[-1]
+    if unit and value.endswith(unit):
+        value = value[: -len(unit)]
+    scale = 1.0
+    if value[-1:] in SI_PREFIXES:
+        scale = SI_PREFIXES[value[-1]]
+        value = value[:-1]
+    return float(value) * scale
+
+
+def parse_parameter_value(response: str) -> float:
+    """Parse replies like ``C1:PAVA PKPK,1.20E-02V``, NaN if the scope could not measure (``****``)."""
+    match = NUMBER.match(response.strip().split(",")[-1].strip())
+    return float(match.group()) if match else math.nan
+
+
+class ChannelCommand:
+    """A channel command with its channel prefix, e.g. ``C2:VDIV``."""
+
+    def __init__(self, channel: int, command: SCPICommand) -> None:
+        self.value = f"C{channel}:{command.value}"
+
+
+@dataclass(frozen=True)
+class WaveformSettings:
+    """Everything needed to decode the samples of one channel."""
+
+    vdiv: float
+    offset: float
+    tdiv: float
+    sample_rate: float
+    points: int
 
 
 class Siglent1104X(SCPIInstrument):
     """Actually a Siglent 1104X-C that I bought in China."""
 
+    MODEL = "SDS1104X"
+    TIMEOUT_S = 10.0  # Waveform transfers
+
     class CommmonHeaderCommands(SCPICommand):
         HEADER_TYPE = "CHDR"  # SHORT, MEDIUM, LONG
 
@@ -39,12 +87,54 @@ class Siglent1104X(SCPIInstrument):
         UNIT = "UNIT"  # C1:UNIT V  V=Volt A=Amps
         VOLTS_PER_DIVISION = "VDIV"  # C1:VDIV 50mV
         INVERT = "INVS"  # C1:INVS ON
+        WAVEFORM = "WF"  # C1:WF? DAT2 returns the samples as a definite length block
 
     class TimeBaseCommands(SCPICommand):
         TIME_DIVISION = "TDIV"
 
+    class TriggerCommands(SCPICommand):
+        TRIGGER_MODE = "TRMD"  # AUTO, NORM, SINGLE, STOP
+        TRIGGER_SELECT = "TRSE"  # TRSE EDGE,SR,C1,HT,OFF triggers on edges of channel 1
+        TRIGGER_LEVEL = "TRLV"  # C1:TRLV 12V
+        FORCE_TRIGGER = "FRTR"
+
+    class MeasureCommands(SCPICommand):
+        PARAMETER_VALUE = "PAVA"  # C1:PAVA? PKPK, also STDEV, RMS, MEAN, FREQ, PER, ...
+
+    class WaveformCommands(SCPICommand):
+        SETUP = "WFSU"  # WFSU SP,<sparsing>,NP,<points>,FP,<first point>
+
+    HORIZONTAL_DIVISIONS = 14
+    CODES_PER_DIVISION = 25
+    # Commands that do not change anything the waveform settings depend on.
+    SETTINGS_NEUTRAL_HEADERS = ("WFSU", "ARM", "STOP", "CHDR", "TRMD", "TRSE", "TRLV", "FRTR")
+    # Not TRMD, a replayed SINGLE would arm an acquisition.
+    RESTORED_SETTINGS = (
+        "TDIV",
+        "TRSE",
+        "WFSU",
+        "XYDS",
+        "ACQW",
+        "AVGA",
+        "MSIZ",
+        "SXSA",
+        "BWL",
+        *(
+            f"C{channel}:{header}"
+            for channel in range(1, 5)
+            for header in ("ATTN", "CPL", "OFST", "SKEW", "TRA", "UNIT", "VDIV", "INVS", "TRLV")
+        ),
+    )
+    BLOCK_TERMINATOR = b"\n\n"  # Waveform blocks end with two newlines
+    TRIGGER_WAIT_S = 0.05  # Wait of a single acquisition for its trigger before it is forced
+    CAPTURE_TIMEOUT_S = 2.0
+
     def __init__(self, connection) -> None:
         super(Siglent1104X, self).__init__(connection)
+        self.settings_generation = 0
+        self.settings_cache_hits = 0
+        self.settings_cache_misses = 0
+        self._settings_cache: dict[int, tuple[int, WaveformSettings]] = {}
 
     def run(self) -> None:
         self._write(self.AcquisitionCommands.ARM)
@@ -55,6 +145,77 @@ class Siglent1104X(SCPIInstrument):
     def get_sample_status(self) -> str:
         return self._transmit(self.AcquisitionCommands.SAMPLE_STATUS)
 
+    def set_trigger_mode(self, mode: str) -> None:
+        self._write(self.TriggerCommands.TRIGGER_MODE, mode)
+
+    def get_trigger_mode(self) -> str:
+        return self._query(self.TriggerCommands.TRIGGER_MODE, parser=lambda response: response.split(" ")[-1])
+
+    def get_trigger_select(self) -> str:
+        """The raw trigger setup, e.g. ``EDGE,SR,C1,HT,OFF``, to restore it with ``set_trigger_select``."""
+        return self._query(self.TriggerCommands.TRIGGER_SELECT, parser=lambda response: response.split(" ")[-1])
+
+    def set_trigger_select(self, params: str) -> None:
+        self._write(self.TriggerCommands.TRIGGER_SELECT, params)
+
+    def set_trigger_source(self, channel: int) -> None:
+        """Trigger on the edges of ``channel``, without holdoff."""
+        self.set_trigger_select(f"EDGE,SR,C{channel},HT,OFF")
+
+    def get_trigger_level(self, channel: int) -> float:
+        return self._query(ChannelCommand(channel, self.TriggerCommands.TRIGGER_LEVEL), parser=lambda response: parse_quantity(response, "V"))
+
+    def set_trigger_level(self, channel: int, volts: float) -> None:
+        self._write(ChannelCommand(channel, self.TriggerCommands.TRIGGER_LEVEL), f"{volts:.6g}V")
+
+    def force_trigger(self) -> None:
+        self._write(self.TriggerCommands.FORCE_TRIGGER)
+
+    def is_stopped(self) -> bool:
+        return self._query(self.AcquisitionCommands.SAMPLE_STATUS, parser=lambda response: "Stop" in response)
+
+    @sync_only
+    def capture(self, timeout_s: float | None = None) -> None:
+        """Acquire one new trace in single trigger mode and wait until the scope has stopped.
+
+        A trigger is forced if the signal does not cross the trigger level
+        within ``TRIGGER_WAIT_S``, e.g. when there is next to no ripple.
+        """
+        timeout_s = self.CAPTURE_TIMEOUT_S if timeout_s is None else timeout_s
+        with self.batch() as batch:
+            batch.set_trigger_mode("SINGLE")
+            batch.run()
+        if self._wait_until_stopped(self.TRIGGER_WAIT_S):
+            return
+        self.force_trigger()
+        if not self._wait_until_stopped(timeout_s):
+            raise TimeoutError(f"{type(self).__name__} did not acquire a trace within {timeout_s} s")
+
+    def _wait_until_stopped(self, timeout_s: float) -> bool:
+        deadline = time.monotonic() + timeout_s
+        sleep_time = self.FIRST_POLLING_SLEEP_TIME
+        while not self.is_stopped():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(sleep_time, remaining))
+            sleep_time = min(2 * sleep_time, self.POLLING_SLEEP_TIME)
+        return True
+
+    def get_parameter_value(self, channel: int, parameter: str) -> float:
+        """A measurement of the scope on the last trace, e.g. ``PKPK`` or ``FREQ``, NaN if not measurable.
+
+        Batch several parameters to read them in one round trip.
+        """
+        return self._query(
+            ChannelCommand(channel, self.MeasureCommands.PARAMETER_VALUE), parameter, parser=parse_parameter_value
+        )
+
+    def set_waveform_setup(self, points: int = 0, first_point: int = 0) -> None:
+        """Which samples a waveform query returns, 0 points returns all of them."""
+        self._write(self.WaveformCommands.SETUP, f"SP,0,NP,{points},FP,{first_point}")
+
+    @sync_only
     def set_x_y_display(self, enabled: bool) -> None:
         assert (
             "Stop" not in self.get_sample_status()
@@ -62,95 +223,124 @@ class Siglent1104X(SCPIInstrument):
         self._write(self.AcquisitionCommands.X_Y_DISPLAY, "ON" if enabled else "OFF")
 
     def get_x_y_display(self) -> bool:
-        return "ON" in self._transmit(self.AcquisitionCommands.X_Y_DISPLAY)
+        return self._query(self.AcquisitionCommands.X_Y_DISPLAY, parser=lambda response: "ON" in response)
 
     def get_vdiv(self) -> float:
-        response = (
-            str(self._transmit(self.AcquisitionCommands.VDIV))
-            .split(" ")[1]
-            .split("V")[0]
-        )
-        return float(response)
+        return self._query(self.AcquisitionCommands.VDIV, parser=lambda response: parse_quantity(response, "V"))
 
     def get_offset(self) -> float:
-        response = float(
-            str(self._transmit(self.AcquisitionCommands.OFFSET))
-            .split(" ")[1]
-            .split("V")[0]
-        )
-        return response
+        return self._query(self.AcquisitionCommands.OFFSET, parser=lambda response: parse_quantity(response, "V"))
 
     def get_tdiv(self) -> float:
-        response = float(
-            str(self._transmit(self.AcquisitionCommands.TDIV))
-            .split(" ")[1]
-            .split("S")[0]
-        )
-        return response
+        return self._query(self.TimeBaseCommands.TIME_DIVISION, parser=lambda response: parse_quantity(response, "S"))
 
     def get_sample_rate(self) -> float:
-        response = float(
-            str(self._transmit(self.AcquisitionCommands.SAMPLE_RATE))
-            .split(" ")[1]
-            .split("S")[0]
-        )
-        return response
-
-    def get_sample_points(self) -> float:
-        response = float(
-            str(
-                self._transmit(
-                    self.AcquisitionCommands.NUMBER_OF_ACQUIRED_SAMPLES, "C1"
-                )
-            )
-            .split(" ")[1]
-            .split("pts")[0]
+        return self._query(self.AcquisitionCommands.SAMPLE_RATE, parser=lambda response: parse_quantity(response, "Sa/s"))
+
+    def get_sample_points(self) -> int:
+        return self.get_acquired_points(1)
+
+    def get_channel_vdiv(self, channel: int) -> float:
+        return self._query(ChannelCommand(channel, self.ChannelCommands.VOLTS_PER_DIVISION), parser=lambda response: parse_quantity(response, "V"))
+
+    def get_channel_offset(self, channel: int) -> float:
+        return self._query(ChannelCommand(channel, self.ChannelCommands.OFFSET), parser=lambda response: parse_quantity(response, "V"))
+
+    def get_acquired_points(self, channel: int) -> int:
+        return self._query(
+            self.AcquisitionCommands.NUMBER_OF_ACQUIRED_SAMPLES, f"C{channel}", parser=lambda response: int(parse_quantity(response, "pts"))
         )
-        return response
-
-    def get_screen_dump(self) -> bool:
-        times = []
-        volts = []
-        vdiv = self.get_vdiv()
-        offset = self.get_offset()
-        tdiv = self.get_tdiv()
-        sara = self.get_sample_rate()
-        num_samples = self.get_sample_points()
-
-        a = Quantity(vdiv, units="V")
-        b = Quantity(offset, units="V")
-        c = Quantity(tdiv, units="S")
-
-        print(f"vdiv: {a}")
-        print(f"offset: {b}")
-        print(f"tdiv: {c}")
-        print(f"sara: {sara}")
-        print(f"numsamples: {num_samples}")
-
-        self._write(self.AcquisitionCommands.WAVEFORM, params="dat2", query=True)
-        response = self._read(20000)
-        values = list(response)
-        values.pop()
-        values.pop()
-
-        # hdiv = 14
-        # vdiv = 8
-
-        insert = len(values) / num_samples
-        time_interval = 1 / sara / insert
-        start_time = -(tdiv * 14 / 2)
-
-        for value in values:
-            value = value - 256 if value > 127 else value
-            volts.append(value * (vdiv / 25) - offset)
-            start_time += time_interval
-            times.append(start_time)
 
+    @sync_only
+    def get_waveform_settings(self, channel: int) -> WaveformSettings:
+        """Settings of ``channel``, queried in one round trip and cached.
+
+        The cache is dropped whenever the driver sends a command that may change
+        a setting. Call ``invalidate_settings`` after changing the scope by hand.
+        """
+        cached = self._settings_cache.get(channel)
+        if cached is not None and cached[0] == self.settings_generation:
+            self.settings_cache_hits += 1
+            return cached[1]
+
+        self.settings_cache_misses += 1
+        with self.batch() as batch:
+            vdiv = batch.get_channel_vdiv(channel)
+            offset = batch.get_channel_offset(channel)
+            tdiv = batch.get_tdiv()
+            sample_rate = batch.get_sample_rate()
+            points = batch.get_acquired_points(channel)
+        settings = WaveformSettings(vdiv.result(), offset.result(), tdiv.result(), sample_rate.result(), points.result())
+        self._settings_cache[channel] = (self.settings_generation, settings)
+        return settings
+
+    @sync_only
+    def invalidate_settings(self) -> None:
+        self.settings_generation += 1
+
+    @sync_only
+    def get_waveform(self, channel: int, points: int = 0) -> tuple["numpy.ndarray", "numpy.ndarray"]:
+        """Download the first ``points`` (0 for all) acquired points of ``channel`` and return times (s) and voltages (V)."""
+        return self._read_waveform_segment(channel, 0, points, self.get_waveform_settings(channel))
+
+    @sync_only
+    def iter_waveform(self, channel: int, chunk_points: int = 1_000_000) -> Iterator[tuple["numpy.ndarray", "numpy.ndarray"]]:
+        """Download the acquired points of ``channel`` in segments of ``chunk_points``.
+
+        Yields times (s) and voltages (V) per segment, so memory use is bound by
+        the segment size instead of the memory depth. The acquisition should be
+        stopped while streaming, otherwise segments come from different triggers.
+        """
+        settings = self.get_waveform_settings(channel)
+        for first_point in range(0, settings.points, chunk_points):
+            points = min(chunk_points, settings.points - first_point)
+            yield self._read_waveform_segment(channel, first_point, points, settings)
+
+    def _read_waveform_segment(
+        self, channel: int, first_point: int, points: int, settings: WaveformSettings
+    ) -> tuple["numpy.ndarray", "numpy.ndarray"]:
+        """Read ``points`` samples starting at ``first_point``, 0 points reads all of them."""
+        self.set_waveform_setup(points, first_point)
+        self._write(ChannelCommand(channel, self.ChannelCommands.WAVEFORM), "DAT2", query=True)
+        return self.decode_waveform(self._read_block(), settings, first_point)
+
+    @classmethod
+    def decode_waveform(
+        cls, data: bytes, settings: WaveformSettings, first_point: int = 0
+    ) -> tuple["numpy.ndarray", "numpy.ndarray"]:
+        """Times (s) and voltages (V) of the ``DAT2`` block of a waveform query."""
+        import numpy
+
+        codes = numpy.frombuffer(data, dtype=numpy.int8)
+        volts = codes * (settings.vdiv / cls.CODES_PER_DIVISION) - settings.offset
+        times = (numpy.arange(codes.size) + first_point) / settings.sample_rate - settings.tdiv * cls.HORIZONTAL_DIVISIONS / 2
+        return times, volts
+
+    @sync_only
+    def get_screen_dump(self, channel: int = 2) -> tuple["numpy.ndarray", "numpy.ndarray"]:
+        import matplotlib.pyplot as plt
+
+        times, volts = self.get_waveform(channel)
         plt.plot(times, volts)
         plt.grid()
         plt.show()
-        print("blah")
-        return response
+        return times, volts
+
+    def _write(self, command: SCPICommand, params: str = "", query: bool = False):
+        if not query:
+            self._note_setting_change(command.value)
+        super(Siglent1104X, self)._write(command, params, query)
+
+    def _execute(self, pending) -> None:
+        for message, future in pending:
+            if future is None:
+                self._note_setting_change(message)
+        super(Siglent1104X, self)._execute(pending)
+
+    def _note_setting_change(self, message: str) -> None:
+        header = message.lstrip(":").split(" ")[0].split(":")[-1].upper()
+        if header not in self.SETTINGS_NEUTRAL_HEADERS:
+            self.invalidate_settings()
 
 
 class Siglent1104X_107(Siglent1104X):
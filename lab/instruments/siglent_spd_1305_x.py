@@ -4,6 +4,13 @@ from lab.instruments.scpi_instrument import SCPICommand, SCPIInstrument
 class Siglent1305X(SCPIInstrument):
     """Actually a Siglent 1104X-C that I bought in China."""
 
+    MODEL = "SPD1305X"
+    OUTPUT_BIT = 16
+    FOUR_WIRE_BIT = 32
+    WAVE_DISPLAY_BIT = 256
+    RESTORED_SETTINGS = ("CH1:VOLT", "CH1:CURR", "OUTP", "OUTP:WAVE", "MODE:SET")
+    INDEXED_SETTINGS = ("OUTP", "OUTP:WAVE")  # Per channel
+
     class MeasureCommands(SCPICommand):
         VOLTAGE = "MEAS:VOLT"
         CURRENT = "MEAS:CURR"
@@ -26,61 +33,68 @@ class Siglent1305X(SCPIInstrument):
         super(Siglent1305X, self).__init__(connection)
 
     def set_voltage(self, volts : float):
-        self._write(self.SourceCommands.VOLTAGE, str(volts))
+        self._write_setting("voltage", float(volts), self.SourceCommands.VOLTAGE, str(volts))
 
     def get_voltage(self) -> float:
-        return float(self._transmit(self.SourceCommands.VOLTAGE))
+        return self._query_setting("voltage", self.SourceCommands.VOLTAGE, parser=float)
 
     def set_current(self, amps: float):
-        self._write(self.SourceCommands.CURRENT, str(amps))
+        self._write_setting("current", float(amps), self.SourceCommands.CURRENT, str(amps))
 
     def get_current(self) -> float:
-        return float(self._transmit(self.SourceCommands.CURRENT))
+        return self._query_setting("current", self.SourceCommands.CURRENT, parser=float)
 
-    def set_enable_output(self, enable : bool):
-        if enable:
-            self._write(self.SourceCommands.OUTPUT_ON)
-        else:
-            self._write(self.SourceCommands.OUTPUT_OFF)
+    def set_enable_output(self, enable : bool, force: bool = False):
+        """``force`` sends the command even if the shadow state says the output already is in that state."""
+        command = self.SourceCommands.OUTPUT_ON if enable else self.SourceCommands.OUTPUT_OFF
+        self._write_setting("output", enable, command, invalidates=("status",), force=force)
 
     def get_output_enabled(self) -> bool:
-        system_status = self.get_sytem_status()
-        bit_mask = 16
-        return (int(system_status.decode(), 16) & bit_mask) != 0
+        return self._query_status_bit("output", self.OUTPUT_BIT)
 
     def get_wave_display_enabled(self) -> bool:
-        system_status = self.get_sytem_status()
-        bit_mask = 256
-        return (int(system_status.decode(), 16) & bit_mask) != 0
+        return self._query_status_bit("wave_display", self.WAVE_DISPLAY_BIT)
 
     def get_4w_mode_enabled(self) -> bool:
         """0 = 2W ; 1 = 4W"""
-        system_status = self.get_sytem_status()
-        bit_mask = 32
-        return (int(system_status.decode(), 16) & bit_mask) != 0
+        return self._query_status_bit("four_wire", self.FOUR_WIRE_BIT)
 
     def set_enable_wave_display(self, enable: bool):
-        if enable:
-            self._write(self.SourceCommands.WAVE_DISPLAY_ON)
-        else:
-            self._write(self.SourceCommands.WAVE_DISPLAY_OFF)
+        command = self.SourceCommands.WAVE_DISPLAY_ON if enable else self.SourceCommands.WAVE_DISPLAY_OFF
+        self._write_setting("wave_display", enable, command, invalidates=("status",))
 
     def measure_voltage(self) -> float:
-        return float(self._transmit(self.MeasureCommands.VOLTAGE))
+        return self._query(self.MeasureCommands.VOLTAGE, parser=float)
 
     def measure_current(self) -> float:
-        return float(self._transmit(self.MeasureCommands.CURRENT))
+        return self._query(self.MeasureCommands.CURRENT, parser=float)
 
     def measure_power(self) -> float:
-        return float(self._transmit(self.MeasureCommands.POWER))
+        return self._query(self.MeasureCommands.POWER, parser=float)
 
     def set_mode(self, mode: str):
         """modes: 2W | 4W """
-        self._write(self.SystemCommands.MODE, params=mode)
-
-    def get_sytem_status(self):
-        self._write(self.SystemCommands.STATUS, query=True)
-        return self._read()
+        self._write_setting("four_wire", mode.upper() == "4W", self.SystemCommands.MODE, params=mode, invalidates=("status",))
+
+    def get_sytem_status(self) -> bytes:
+        """The raw reply with its newline, e.g. ``b"0x10\\n"``."""
+        return self._query(self.SystemCommands.STATUS, parser=lambda status: status.encode("ascii") + b"\n")
+
+    def _query_status_bit(self, key: str, bit_mask: int) -> bool:
+        """A bit of the status register; with a shadow state all bits come from one snapshot of it."""
+        if self.shadow is None:
+            return self._query(self.SystemCommands.STATUS, parser=lambda status: (int(status, 16) & bit_mask) != 0)
+        known, value = self.shadow.lookup(key)
+        if known:
+            return value
+        return (self._query_setting("status", self.SystemCommands.STATUS, parser=lambda status: int(status, 16)) & bit_mask) != 0
+
+    def _shadowed_settings(self):
+        return [
+            ("voltage", self.SourceCommands.VOLTAGE, float),
+            ("current", self.SourceCommands.CURRENT, float),
+            ("status", self.SystemCommands.STATUS, lambda status: int(status, 16)),
+        ]
 
 class Siglent1305X_249(Siglent1305X):
     IP_ADDRESS = "192.168.1.249"
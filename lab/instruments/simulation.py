@@ -0,0 +1,708 @@
+"""Simulated instruments to run the drivers and measurement scripts without the bench.
+
+A simulated instrument answers the SCPI messages of its driver from a simple
+internal state. ``connect`` returns a connected socket, so it can be handed
+to the real driver class::
+
+    load = RigolDL3021A(SimulatedRigolDL3021A().connect())
+
+A raw socket has no way to signal a service request. Where a driver waits for
+them, a ``SimulatedServiceRequestTransport`` delivers the instrument's SRQ
+alongside the socket, as VISA does for the real instrument::
+
+    dmm = RigolDM858E(SimulatedServiceRequestTransport(SimulatedRigolDM858E(), RigolDM858E.COMMAND_SUFFIX))
+
+``SimulatedBench`` wires a buck converter model (the DUT) between a simulated
+PSU, load, DMMs and scope and serves every instrument over TCP on localhost,
+with configurable response latency and jitter::
+
+    with SimulatedBench(latency_s=0.002) as bench:
+        load_regulation.run(addresses=bench.addresses)
+"""
+import contextlib
+import math
+import random
+import socket
+import socketserver
+import threading
+import time
+from typing import Callable, Iterator
+
+import numpy
+
+from lab.instruments.rigol_dl_3021_a import RigolDL3021A_247
+from lab.instruments.rigol_dm_858_e import RigolDM858E_237
+from lab.instruments.rohde_und_schwarz_hmc8012 import RohdeUndSchwarzHMC8012_146
+from lab.instruments.scpi_instrument import SCPIInstrument
+from lab.instruments.siglent_sds_1104_x import Siglent1104X_107
+from lab.instruments.siglent_spd_1305_x import Siglent1305X_249
+from lab.instruments.transport import SocketTransport
+
+
+class SimulatedInstrument:
+    """Dispatches SCPI messages to handlers.
+
+    Handlers are registered in ``commands`` under the header the drivers send,
+    queries with a trailing ``?``. A handler gets the parameter string and
+    returns the reply, or ``None`` for commands without a reply. Compound
+    messages are split on ``;`` and their replies joined again.
+
+    Every reply is delayed by ``latency_s`` plus a uniformly distributed
+    ``jitter_s`` to mimic the network and the instrument's processing time.
+    ``*RST`` keeps the instrument busy for ``operation_s``: ``*OPC?`` is only
+    answered, and the operation complete bit of ``*ESR?`` only set, afterwards.
+    Once that bit is enabled by ``*ESE`` and the event status summary by
+    ``*SRE``, the completion also sets ``service_request``.
+    """
+
+    IDENTITY = "Simulated,SCPI instrument,0,0"
+
+    def __init__(self, latency_s: float = 0.0, jitter_s: float = 0.0, seed: int = 0, operation_s: float = 0.0) -> None:
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.operation_s = operation_s
+        self.errors: list[str] = []
+        self._busy_until = 0.0
+        self._operation_complete_requested = False
+        self._event_status_enable = 0
+        self._service_request_enable = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.service_request = threading.Event()  # The SRQ line, cleared by whoever waits for it
+        self.commands: dict[str, Callable[[str], str | bytes | None]] = {
+            "*IDN?": lambda params: self.IDENTITY,
+            "*RST": lambda params: self._start_operation(self.reset),
+            "*OPC?": lambda params: self._operation_complete(),
+            "*OPC": lambda params: self._request_operation_complete(),
+            "*CLS": lambda params: setattr(self, "_operation_complete_requested", False),
+            "*ESR?": lambda params: self._event_status_register(),
+            "*ESE": lambda params: setattr(self, "_event_status_enable", int(params)),
+            "*ESE?": lambda params: self._event_status_enable,
+            "*SRE": lambda params: setattr(self, "_service_request_enable", int(params)),
+            "*SRE?": lambda params: self._service_request_enable,
+        }
+
+    def reset(self) -> None:
+        pass
+
+    def handle_message(self, message: str) -> bytes | None:
+        replies = []
+        with self._lock:
+            for command in message.strip().split(";"):
+                header, _, params = command.strip().lstrip(":").partition(" ")
+                handler = self.commands.get(header.upper())
+                if handler is None:
+                    self.errors.append(command)
+                    continue
+                reply = handler(params.strip())
+                if reply is not None:
+                    replies.append(reply if isinstance(reply, bytes) else str(reply).encode())
+        if not replies:
+            return None
+        return b";".join(replies) + b"\n"
+
+    def serve(self, connection: socket.socket) -> None:
+        """Answer messages arriving on ``connection`` until it is closed."""
+        try:
+            with connection, connection.makefile("rb") as lines:
+                for line in lines:
+                    reply = self.handle_message(line.decode())
+                    if reply is not None:
+                        self._delay()
+                        connection.sendall(reply)
+        except OSError:
+            pass
+
+    def connect(self) -> socket.socket:
+        """Return a socket connected to this instrument, served by a background thread."""
+        host_side, instrument_side = socket.socketpair()
+        threading.Thread(target=self.serve, args=(instrument_side,), daemon=True).start()
+        return host_side
+
+    def _start_operation(self, operation: Callable[[], None]) -> None:
+        operation()
+        self._busy_until = time.monotonic() + self.operation_s
+
+    def _operation_complete(self) -> str:
+        remaining = self._busy_until - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        return "1"
+
+    def _request_operation_complete(self) -> None:
+        self._operation_complete_requested = True
+        remaining = self._busy_until - time.monotonic()
+        if remaining <= 0:
+            self._assert_service_request()
+            return
+        timer = threading.Timer(remaining, self._assert_service_request)
+        timer.daemon = True
+        timer.start()
+
+    def _assert_service_request(self) -> None:
+        if (
+            self._operation_complete_requested
+            and self._event_status_enable & SCPIInstrument.OPERATION_COMPLETE_BIT
+            and self._service_request_enable & SCPIInstrument.EVENT_STATUS_BIT
+        ):
+            self.service_request.set()
+
+    def _event_status_register(self) -> int:
+        complete = self._operation_complete_requested and time.monotonic() >= self._busy_until
+        if complete:
+            self._operation_complete_requested = False
+        return int(complete)
+
+    def _delay(self) -> None:
+        delay = self.latency_s + self._random.uniform(0.0, self.jitter_s)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def parse_switch(params: str) -> bool:
+    return params.upper() in ("ON", "1")
+
+
+class BuckConverterModel:
+    """Steady state and step response of a buck converter like the LM2596 boards.
+
+    The output follows setpoint changes of the input voltage or the load with
+    a first order response and carries gaussian noise, so settling detection
+    has something to do.
+    """
+
+    def __init__(
+        self,
+        input_voltage: Callable[[], float],
+        output_voltage_setpoint: float = 12.0,
+        output_resistance: float = 0.02,
+        dropout_voltage: float = 1.2,
+        dropout_resistance: float = 0.15,
+        quiescent_power: float = 0.05,
+        conduction_resistance: float = 0.25,
+        diode_drop: float = 0.45,
+        switching_frequency: float = 150e3,
+        inductance: float = 330e-6,
+        output_capacitor_esr: float = 0.1,
+        thermal_resistance: float = 30.0,
+        ambient_temperature: float = 25.0,
+        time_constant_s: float = 0.005,
+        noise_v: float = 0.0003,
+        seed: int = 0,
+    ) -> None:
+        self.input_voltage = input_voltage
+        self.output_voltage_setpoint = output_voltage_setpoint
+        self.output_resistance = output_resistance
+        self.dropout_voltage = dropout_voltage
+        self.dropout_resistance = dropout_resistance
+        self.quiescent_power = quiescent_power
+        self.conduction_resistance = conduction_resistance
+        self.diode_drop = diode_drop
+        self.switching_frequency = switching_frequency
+        self.inductance = inductance
+        self.output_capacitor_esr = output_capacitor_esr
+        self.thermal_resistance = thermal_resistance
+        self.ambient_temperature = ambient_temperature
+        self.time_constant_s = time_constant_s
+        self.noise_v = noise_v
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._target = 0.0
+        self._start = 0.0
+        self._changed_at = time.perf_counter()
+
+    def steady_state_output_voltage(self, load_current: float) -> float:
+        input_voltage = self.input_voltage()
+        if input_voltage <= 0:
+            return 0.0
+        regulated = self.output_voltage_setpoint - self.output_resistance * load_current
+        dropout_limited = input_voltage - self.dropout_voltage - self.dropout_resistance * load_current
+        return max(0.0, min(regulated, dropout_limited))
+
+    def output_voltage(self, load_current: float) -> float:
+        target = self.steady_state_output_voltage(load_current)
+        now = time.perf_counter()
+        with self._lock:
+            if abs(target - self._target) > 1e-9:
+                self._start = self._voltage_at(now)
+                self._target = target
+                self._changed_at = now
+            voltage = self._voltage_at(now)
+            noise = self._random.gauss(0.0, self.noise_v)
+        return max(0.0, voltage + noise) if voltage > 0 else 0.0
+
+    def losses(self, load_current: float) -> float:
+        input_voltage = self.input_voltage()
+        if input_voltage <= 0:
+            return 0.0
+        duty_cycle = min(1.0, self.steady_state_output_voltage(load_current) / input_voltage)
+        return (
+            self.quiescent_power
+            + self.conduction_resistance * load_current**2
+            + self.diode_drop * load_current * (1.0 - duty_cycle)
+        )
+
+    def input_current(self, load_current: float) -> float:
+        input_voltage = self.input_voltage()
+        if input_voltage <= 0:
+            return 0.0
+        output_power = self.steady_state_output_voltage(load_current) * load_current
+        return (output_power + self.losses(load_current)) / input_voltage
+
+    def ripple_peak_to_peak(self, load_current: float) -> float:
+        """Inductor ripple current times the output capacitor ESR."""
+        input_voltage = self.input_voltage()
+        output_voltage = self.steady_state_output_voltage(load_current)
+        if input_voltage <= 0 or output_voltage <= 0:
+            return 0.0
+        duty_cycle = min(1.0, output_voltage / input_voltage)
+        ripple_current = (input_voltage - output_voltage) * duty_cycle / (self.inductance * self.switching_frequency)
+        if load_current < ripple_current / 2:
+            # Discontinuous conduction, the ripple shrinks with the load.
+            ripple_current = math.sqrt(2 * load_current * ripple_current) if load_current > 0 else 0.0
+        return ripple_current * self.output_capacitor_esr
+
+    def temperature(self, load_current: float) -> float:
+        return self.ambient_temperature + self.thermal_resistance * self.losses(load_current)
+
+    def _voltage_at(self, now: float) -> float:
+        elapsed = now - self._changed_at
+        return self._target + (self._start - self._target) * math.exp(-elapsed / self.time_constant_s)
+
+
+class SimulatedRigolDL3021A(SimulatedInstrument):
+    """Electronic load in constant current mode, including list mode."""
+
+    IDENTITY = "RIGOL TECHNOLOGIES,DL3021A,SIMULATED,00.01.05.00.01"
+
+    def __init__(self, output_voltage: Callable[[float], float] = lambda amps: 12.0 - 0.05 * amps, **kwargs) -> None:
+        super(SimulatedRigolDL3021A, self).__init__(**kwargs)
+        self.output_voltage = output_voltage
+        self.reset()
+        self.commands.update(
+            {
+                "MEAS:VOLT?": lambda params: f"{self.voltage():.6f}",
+                "MEAS:CURR?": lambda params: f"{self.current():.6f}",
+                "MEAS:POW?": lambda params: f"{self.voltage() * self.current():.6f}",
+                "INP:STAT": lambda params: setattr(self, "input_enabled", parse_switch(params)),
+                "INP:STAT?": lambda params: "1" if self.input_enabled else "0",
+                "CURR:LEV:IMM": lambda params: setattr(self, "current_setpoint", float(params)),
+                "CURR:LEV:IMM?": lambda params: f"{self.current_setpoint:.6f}",
+                "SOUR:FUNC:MODE": self._set_function_mode,
+                "SOUR:FUNC:MODE?": lambda params: self.function_mode,
+                "SOUR:LIST:MODE": lambda params: None,
+                "SOUR:LIST:RANG": lambda params: None,
+                "SOUR:LIST:COUN": lambda params: None,
+                "SOUR:LIST:STEP": lambda params: setattr(self, "list_steps", int(params)),
+                "SOUR:LIST:LEV": lambda params: self._set_list_value(self.list_levels, params),
+                "SOUR:LIST:WID": lambda params: self._set_list_value(self.list_widths, params),
+                "SOUR:LIST:END": lambda params: setattr(self, "list_end", params.upper()),
+                "TRIG:SOUR": lambda params: None,
+                "TRIG": lambda params: setattr(self, "list_started_at", time.perf_counter()),
+            }
+        )
+
+    def reset(self) -> None:
+        self.input_enabled = False
+        self.current_setpoint = 0.0
+        self.function_mode = "FIX"
+        self.list_steps = 0
+        self.list_levels: dict[int, float] = {}
+        self.list_widths: dict[int, float] = {}
+        self.list_end = "OFF"
+        self.list_started_at: float | None = None
+
+    def current(self) -> float:
+        if not self.input_enabled:
+            return 0.0
+        if self.function_mode == "LIST":
+            return self._list_current()
+        return self.current_setpoint
+
+    def voltage(self) -> float:
+        return self.output_voltage(self.current())
+
+    def _set_function_mode(self, params: str) -> None:
+        self.function_mode = params.upper()
+        self.list_started_at = None
+
+    @staticmethod
+    def _set_list_value(values: dict[int, float], params: str) -> None:
+        step, value = params.split(",")
+        values[int(step)] = float(value)
+
+    def _list_current(self) -> float:
+        if self.list_started_at is None:
+            return 0.0
+        elapsed = time.perf_counter() - self.list_started_at
+        for step in range(self.list_steps):
+            elapsed -= self.list_widths.get(step, 0.0)
+            if elapsed < 0:
+                return self.list_levels.get(step, 0.0)
+        return self.list_levels.get(self.list_steps - 1, 0.0) if self.list_end == "LAST" else 0.0
+
+
+class SimulatedSiglent1305X(SimulatedInstrument):
+    """Single channel power supply, the status register follows the SPD1305X manual."""
+
+    IDENTITY = "Siglent Technologies,SPD1305X,SIMULATED,2.1.1.9R1,V1.0"
+    OUTPUT_BIT = 16
+    FOUR_WIRE_BIT = 32
+    WAVE_DISPLAY_BIT = 256
+
+    def __init__(self, load_current: Callable[[float], float] = lambda volts: 0.0, **kwargs) -> None:
+        super(SimulatedSiglent1305X, self).__init__(**kwargs)
+        self.load_current = load_current
+        self.reset()
+        self.commands.update(
+            {
+                "CH1:VOLT": lambda params: setattr(self, "voltage_setpoint", float(params)),
+                "CH1:VOLT?": lambda params: f"{self.voltage_setpoint:.3f}",
+                "CH1:CURR": lambda params: setattr(self, "current_limit", float(params)),
+                "CH1:CURR?": lambda params: f"{self.current_limit:.3f}",
+                "OUTP": lambda params: setattr(self, "output_enabled", params.upper().endswith("ON")),
+                "OUTP:WAVE": lambda params: setattr(self, "wave_display_enabled", params.upper().endswith("ON")),
+                "MODE:SET": lambda params: setattr(self, "four_wire", params.upper() == "4W"),
+                "SYST:STAT?": lambda params: f"0x{self.status():X}",
+                "MEAS:VOLT?": lambda params: f"{self.output_voltage():.3f}",
+                "MEAS:CURR?": lambda params: f"{self.output_current():.3f}",
+                "MEAS:POWE?": lambda params: f"{self.output_voltage() * self.output_current():.3f}",
+            }
+        )
+
+    def reset(self) -> None:
+        self.voltage_setpoint = 0.0
+        self.current_limit = 0.0
+        self.output_enabled = False
+        self.wave_display_enabled = False
+        self.four_wire = False
+
+    def output_voltage(self) -> float:
+        return self.voltage_setpoint if self.output_enabled else 0.0
+
+    def output_current(self) -> float:
+        if not self.output_enabled:
+            return 0.0
+        return min(self.current_limit, self.load_current(self.output_voltage()))
+
+    def status(self) -> int:
+        return (
+            (self.OUTPUT_BIT if self.output_enabled else 0)
+            | (self.FOUR_WIRE_BIT if self.four_wire else 0)
+            | (self.WAVE_DISPLAY_BIT if self.wave_display_enabled else 0)
+        )
+
+
+class SimulatedMultimeter(SimulatedInstrument):
+    """DMM that measures DC voltage or temperature, the function follows the last MEAS query.
+
+    Buffered acquisitions are accepted in both dialects, the data logging of
+    the HMC8012 and the sample timer of the DM858E. The readings are taken
+    when they are fetched, but only as many as are due since the start.
+    """
+
+    IDENTITY = "HAMEG,HMC8012,SIMULATED,01.101"
+
+    def __init__(
+        self,
+        voltage: Callable[[], float] = lambda: 0.0,
+        temperature: Callable[[], float] = lambda: 25.0,
+        **kwargs,
+    ) -> None:
+        super(SimulatedMultimeter, self).__init__(**kwargs)
+        self.voltage = voltage
+        self.temperature = temperature
+        self.reset()
+        self.commands.update(
+            {
+                "FETC?": lambda params: self._buffered_readings() if self._acquisition_started else self._reading(),
+                "READ?": lambda params: self._reading(),
+                "MEAS:VOLT:DC?": lambda params: self._measure("VOLT"),
+                "MEAS:TEMP?": lambda params: self._measure("TEMP"),
+                "TRIG:MODE": lambda params: setattr(self, "trigger_mode", params.upper()),
+                "TRIG:MODE?": lambda params: self.trigger_mode,
+                "TRIG:SOUR": lambda params: None,
+                "TRIG:COUN": lambda params: None,
+                "SAMP:SOUR": lambda params: None,
+                "SAMP:COUN": lambda params: setattr(self, "sample_count", int(params)),
+                "SAMP:TIM": lambda params: setattr(self, "sample_interval_s", float(params)),
+                "INIT": lambda params: self._start_acquisition(),
+                "DATA:LOG:MODE": lambda params: None,
+                "DATA:LOG:COUN": lambda params: setattr(self, "sample_count", int(params)),
+                "DATA:LOG:INT": lambda params: setattr(self, "sample_interval_s", float(params)),
+                "DATA:LOG:STAT": lambda params: self._start_acquisition() if parse_switch(params) else None,
+                "DATA:POIN?": lambda params: self._acquired_points(),
+                "DATA:DATA?": lambda params: self._buffered_readings(),
+            }
+        )
+
+    def reset(self) -> None:
+        self.function = "TEMP"
+        self.trigger_mode = "AUTO"
+        self.sample_count = 1
+        self.sample_interval_s = 0.001
+        self._acquisition_started: float | None = None
+
+    def _measure(self, function: str) -> str:
+        self.function = function
+        return self._reading()
+
+    def _reading(self) -> str:
+        value = self.temperature() if self.function == "TEMP" else self.voltage()
+        return f"{value:.6E}"
+
+    def _start_acquisition(self) -> None:
+        self._acquisition_started = time.monotonic()
+
+    def _acquired_points(self) -> int:
+        if self._acquisition_started is None:
+            return 0
+        return min(self.sample_count, int((time.monotonic() - self._acquisition_started) / self.sample_interval_s) + 1)
+
+    def _buffered_readings(self) -> str:
+        return ",".join(self._reading() for _ in range(self._acquired_points()))
+
+
+class SimulatedRigolDM858E(SimulatedMultimeter):
+    IDENTITY = "Rigol Technologies,DM858E,SIMULATED,00.01.00"
+
+
+class SimulatedSiglent1104X(SimulatedInstrument):
+    """Scope that captures the output ripple of the DUT on every channel."""
+
+    IDENTITY = "Siglent Technologies,SDS1104X-E,SIMULATED,8.2.6.1.37R9"
+    CHANNELS = (1, 2, 3, 4)
+    HORIZONTAL_DIVISIONS = 14
+    CODES_PER_DIVISION = 25
+
+    def __init__(
+        self,
+        ripple_peak_to_peak: Callable[[], float] = lambda: 0.01,
+        switching_frequency: float = 150e3,
+        noise_v: float = 0.0005,
+        **kwargs,
+    ) -> None:
+        super(SimulatedSiglent1104X, self).__init__(**kwargs)
+        self.ripple_peak_to_peak = ripple_peak_to_peak
+        self.switching_frequency = switching_frequency
+        self.noise_v = noise_v
+        self._generator = numpy.random.default_rng(kwargs.get("seed", 0))
+        self.reset()
+        self.commands.update(
+            {
+                "TDIV": lambda params: setattr(self, "tdiv", float(params.rstrip("Ss"))),
+                "TDIV?": lambda params: f"TDIV {self.tdiv:.2E}S",
+                "SARA?": lambda params: f"SARA {self.sample_rate:.2E}Sa/s",
+                "SANU?": lambda params: f"SANU {self.points()}pts",
+                "WFSU": self._set_waveform_setup,
+                "MTVD?": lambda params: f"MTVD {self.vdiv[1]:.2E}V",
+                "MTVP?": lambda params: f"MTVP {self.offset[1]:.2E}V",
+                "SAST?": lambda params: "SAST Stop" if self.stopped else "SAST Ready" if self.armed else "SAST Trig'd",
+                "ARM": lambda params: self._trigger(),
+                "STOP": lambda params: setattr(self, "stopped", True),
+                "TRMD": lambda params: setattr(self, "trigger_mode", params.upper()),
+                "TRMD?": lambda params: f"TRMD {self.trigger_mode}",
+                "TRSE": lambda params: setattr(self, "trigger_select", params.upper()),
+                "TRSE?": lambda params: f"TRSE {self.trigger_select}",
+                "FRTR": lambda params: self._acquire() if self.armed else None,
+                "XYDS": lambda params: setattr(self, "x_y_display", parse_switch(params)),
+                "XYDS?": lambda params: f"XYDS {'ON' if self.x_y_display else 'OFF'}",
+                "CHDR": lambda params: None,
+            }
+        )
+        for channel in self.CHANNELS:
+            self.commands.update(
+                {
+                    f"C{channel}:VDIV": lambda params, channel=channel: self.vdiv.__setitem__(channel, float(params.rstrip("Vv"))),
+                    f"C{channel}:VDIV?": lambda params, channel=channel: f"C{channel}:VDIV {self.vdiv[channel]:.2E}V",
+                    f"C{channel}:OFST": lambda params, channel=channel: self.offset.__setitem__(channel, float(params.rstrip("Vv"))),
+                    f"C{channel}:OFST?": lambda params, channel=channel: f"C{channel}:OFST {self.offset[channel]:.2E}V",
+                    f"C{channel}:WF?": lambda params, channel=channel: self._waveform_block(channel),
+                    f"C{channel}:PAVA?": lambda params, channel=channel: self._parameter_value(channel, params),
+                    f"C{channel}:TRLV": lambda params, channel=channel: self.trigger_level.__setitem__(channel, float(params.rstrip("Vv"))),
+                    f"C{channel}:TRLV?": lambda params, channel=channel: f"C{channel}:TRLV {self.trigger_level[channel]:.2E}V",
+                }
+            )
+
+    def reset(self) -> None:
+        self.tdiv = 10e-6
+        self.sample_rate = 500e6
+        self.vdiv = {channel: 0.02 for channel in self.CHANNELS}
+        self.offset = {channel: 0.0 for channel in self.CHANNELS}
+        self.stopped = False
+        self.trigger_mode = "AUTO"
+        self.trigger_select = "EDGE,SR,C1,HT,OFF"
+        self.trigger_level = {channel: 0.0 for channel in self.CHANNELS}
+        self.armed = False
+        self.x_y_display = False
+        self.first_point = 0
+        self.point_count = 0
+        self._captures: dict[int, numpy.ndarray] = {}
+
+    def points(self) -> int:
+        return int(round(self.tdiv * self.HORIZONTAL_DIVISIONS * self.sample_rate))
+
+    def _set_waveform_setup(self, params: str) -> None:
+        values = params.split(",")
+        settings = dict(zip(values[::2], values[1::2]))
+        self.point_count = int(settings.get("NP", 0))
+        self.first_point = int(settings.get("FP", 0))
+
+    def _capture(self, channel: int) -> numpy.ndarray:
+        """ADC codes of the last trace of ``channel``.
+
+        A running scope takes a new trace for every read. A stopped one keeps
+        its last trace, so scope measurements and waveform downloads of one
+        single acquisition see the same samples.
+        """
+        if not self.stopped or channel not in self._captures:
+            index = numpy.arange(self.points())
+            phase = (index / self.sample_rate * self.switching_frequency) % 1.0
+            triangle = 2.0 * numpy.abs(2.0 * phase - 1.0) - 1.0
+            volts = self.ripple_peak_to_peak() / 2 * triangle + self._generator.normal(0.0, self.noise_v, index.size)
+            codes = numpy.round((volts + self.offset[channel]) / (self.vdiv[channel] / self.CODES_PER_DIVISION))
+            self._captures[channel] = numpy.clip(codes, -128, 127).astype(numpy.int8)
+        return self._captures[channel]
+
+    def _trigger(self) -> None:
+        self._captures.clear()
+        if self.trigger_mode != "SINGLE":
+            self.stopped = self.armed = False
+            return
+        # A single acquisition stops the scope right after its trigger, which needs the trace to cross the level.
+        self.stopped, self.armed = False, True
+        channel = int(self.trigger_select.split(",")[2][1:])
+        if abs(self.trigger_level[channel]) < self.ripple_peak_to_peak() / 2 + 3 * self.noise_v:
+            self._acquire()
+
+    def _acquire(self) -> None:
+        self._captures.clear()
+        self.stopped, self.armed = True, False
+
+    def _waveform_block(self, channel: int) -> bytes:
+        last_point = self.points() if self.point_count == 0 else min(self.points(), self.first_point + self.point_count)
+        data = self._capture(channel)[self.first_point : last_point].tobytes()
+        return f"C{channel}:WF DAT2,#9{len(data):09d}".encode() + data + b"\n"
+
+    def _parameter_value(self, channel: int, parameter: str) -> str:
+        volts = self._capture(channel) * (self.vdiv[channel] / self.CODES_PER_DIVISION) - self.offset[channel]
+        values = {
+            "PKPK": (float(numpy.ptp(volts)), "V"),
+            "MAX": (float(volts.max()), "V"),
+            "MIN": (float(volts.min()), "V"),
+            "MEAN": (float(volts.mean()), "V"),
+            "RMS": (float(numpy.sqrt(numpy.mean(volts**2))), "V"),
+            "STDEV": (float(volts.std()), "V"),
+        }
+        # Like the real scope, the frequency is only measured on a signal well above the noise.
+        if numpy.ptp(volts) > 8 * self.noise_v:
+            values["FREQ"] = (self.switching_frequency, "Hz")
+            values["PER"] = (1 / self.switching_frequency, "S")
+        value, unit = values.get(parameter.upper(), (None, ""))
+        return f"C{channel}:PAVA {parameter.upper()},{'****' if value is None else f'{value:.2E}'}{unit}"
+
+
+class SimulatedServiceRequestTransport(SocketTransport):
+    """Socket connection to a simulated instrument that also delivers its service requests."""
+
+    SUPPORTS_SERVICE_REQUESTS = True
+
+    def __init__(self, instrument: SimulatedInstrument, write_termination: str = "\r\n") -> None:
+        super(SimulatedServiceRequestTransport, self).__init__(instrument.connect(), write_termination)
+        self._instrument = instrument
+
+    @contextlib.contextmanager
+    def service_requests(self) -> Iterator[Callable[[float], None]]:
+        def wait(timeout_s: float) -> None:
+            if not self._instrument.service_request.wait(timeout_s):
+                raise TimeoutError(f"No service request within {timeout_s} s")
+
+        self._instrument.service_request.clear()
+        try:
+            yield wait
+        finally:
+            self._instrument.service_request.clear()
+
+
+class SimulatedInstrumentServer:
+    """Serves a simulated instrument over TCP, one thread per connection."""
+
+    def __init__(self, instrument: SimulatedInstrument, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.instrument = instrument
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                instrument.serve(self.request)
+
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def start(self) -> "SimulatedInstrumentServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class SimulatedBench:
+    """The LM2596 bench: a buck converter between PSU and load, watched by two DMMs and the scope.
+
+    ``addresses`` maps the bench driver classes to the localhost address of
+    their simulated instrument, in the form the measurement scripts accept.
+    """
+
+    def __init__(self, latency_s: float = 0.0, jitter_s: float = 0.0, seed: int = 0, **dut_parameters) -> None:
+        timing = {"latency_s": latency_s, "jitter_s": jitter_s, "seed": seed}
+        self.psu = SimulatedSiglent1305X(**timing)
+        self.dut = BuckConverterModel(self.psu.output_voltage, seed=seed, **dut_parameters)
+        self.load = SimulatedRigolDL3021A(self.dut.output_voltage, **timing)
+        self.psu.load_current = lambda volts: self.dut.input_current(self.load.current())
+        self.dmm = SimulatedMultimeter(
+            voltage=lambda: self.dut.output_voltage(self.load.current()),
+            temperature=lambda: self.dut.temperature(self.load.current()),
+            **timing,
+        )
+        self.dm858e = SimulatedRigolDM858E(
+            voltage=lambda: self.dut.output_voltage(self.load.current()),
+            temperature=lambda: self.dut.temperature(self.load.current()),
+            **timing,
+        )
+        self.scope = SimulatedSiglent1104X(
+            lambda: self.dut.ripple_peak_to_peak(self.load.current()), self.dut.switching_frequency, **timing
+        )
+        self.instruments = {
+            RigolDL3021A_247: self.load,
+            Siglent1305X_249: self.psu,
+            RohdeUndSchwarzHMC8012_146: self.dmm,
+            RigolDM858E_237: self.dm858e,
+            Siglent1104X_107: self.scope,
+        }
+        self._servers: dict[type, SimulatedInstrumentServer] = {}
+
+    @property
+    def addresses(self) -> dict[type, tuple[str, int]]:
+        return {driver: server.address for driver, server in self._servers.items()}
+
+    def start(self) -> "SimulatedBench":
+        for driver, instrument in self.instruments.items():
+            self._servers[driver] = SimulatedInstrumentServer(instrument).start()
+        return self
+
+    def stop(self) -> None:
+        for server in self._servers.values():
+            server.stop()
+        self._servers.clear()
+
+    def __enter__(self) -> "SimulatedBench":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
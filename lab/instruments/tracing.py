@@ -0,0 +1,168 @@
+"""Opt-in tracing of SCPI exchanges.
+
+Assign a tracer to an instrument (or to ``SCPIInstrument.tracer`` for all of
+them) and every write, read, query and batch is recorded with its time stamps,
+byte counts and duration in a fixed size ring buffer::
+
+    tracer = SCPITracer()
+    load.tracer = tracer
+    ...
+    print(tracer.summary())
+    tracer.write_chrome_trace("run.trace.json")  # open in chrome://tracing or Perfetto
+
+Without a tracer the drivers only pay for one ``is None`` check per call.
+``span`` adds non-SCPI phases such as settling or saving results to the same
+timeline. Events are keyed on the command headers, e.g. ``CURR:LEV:IMM``, so
+the statistics of a command do not split up by value; the parameters are
+kept with the event and shown in the timeline.
+"""
+import collections
+import contextlib
+import json
+import os
+import pathlib
+import time
+from typing import TYPE_CHECKING, Iterator, NamedTuple
+
+from lab.instruments.scpi_batch import COMPOUND_SEPARATOR
+
+if TYPE_CHECKING:
+    import numpy
+
+
+class TraceEvent(NamedTuple):
+    instrument: str
+    command: str
+    kind: str  # write, read, query, batch or span
+    start_ns: int
+    end_ns: int
+    bytes_sent: int
+    bytes_received: int
+    params: str = ""  # Parameters of each command of the message, separated like the commands
+
+    @property
+    def duration_s(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+class SCPITracer:
+    def __init__(self, capacity: int = 100_000) -> None:
+        self._events: collections.deque[TraceEvent] = collections.deque(maxlen=capacity)
+
+    def record(
+        self,
+        instrument: str,
+        message: str,
+        kind: str,
+        start_ns: int,
+        end_ns: int,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+    ) -> None:
+        """Record an exchange of ``message``, a single or compound command as sent without its suffix."""
+        command, params = split_message(message)
+        self._events.append(TraceEvent(instrument, command, kind, start_ns, end_ns, bytes_sent, bytes_received, params))
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "script") -> Iterator[None]:
+        """Record the time spent in the ``with`` block as a phase of the run."""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(category, name, "span", start, time.perf_counter_ns())
+
+    def events(self) -> list[TraceEvent]:
+        return list(self._events)
+
+    def clear(self) -> None:
+        self._events.clear()
+
+    def histograms(
+        self, group_by: str = "command", bins: "numpy.ndarray | None" = None
+    ) -> dict[str, tuple["numpy.ndarray", "numpy.ndarray"]]:
+        """Histogram of the durations in seconds, grouped by ``instrument`` or ``command``.
+
+        The default bins are logarithmic from 10 us to 10 s.
+        """
+        import numpy
+
+        bins = numpy.logspace(-5, 1, 31) if bins is None else bins
+        return {
+            key: numpy.histogram(durations, bins=bins)
+            for key, durations in self._durations_by(group_by).items()
+        }
+
+    def summary(self, group_by: str = "command") -> dict[str, dict[str, float]]:
+        """Count, total and percentiles of the durations in seconds per group."""
+        import numpy
+
+        summary = {}
+        for key, durations in self._durations_by(group_by).items():
+            summary[key] = {
+                "count": durations.size,
+                "total_s": float(durations.sum()),
+                "mean_s": float(durations.mean()),
+                "p50_s": float(numpy.percentile(durations, 50)),
+                "p95_s": float(numpy.percentile(durations, 95)),
+                "max_s": float(durations.max()),
+            }
+        return summary
+
+    def to_chrome_trace(self) -> dict:
+        """Trace Event Format timeline with one row per instrument."""
+        process_id = os.getpid()
+        thread_ids: dict[str, int] = {}
+        trace_events = []
+        for event in self._events:
+            thread_id = thread_ids.setdefault(event.instrument, len(thread_ids) + 1)
+            trace_events.append(
+                {
+                    "name": event.command,
+                    "cat": event.kind,
+                    "ph": "X",
+                    "ts": event.start_ns / 1000,
+                    "dur": (event.end_ns - event.start_ns) / 1000,
+                    "pid": process_id,
+                    "tid": thread_id,
+                    "args": {"bytes_sent": event.bytes_sent, "bytes_received": event.bytes_received},
+                }
+            )
+            if event.params:
+                trace_events[-1]["args"]["params"] = event.params
+        for name, thread_id in thread_ids.items():
+            trace_events.append(
+                {"name": "thread_name", "ph": "M", "pid": process_id, "tid": thread_id, "args": {"name": name}}
+            )
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str | pathlib.Path) -> None:
+        pathlib.Path(path).write_text(json.dumps(self.to_chrome_trace()))
+
+    def _durations_by(self, group_by: str) -> dict[str, "numpy.ndarray"]:
+        import numpy
+
+        assert group_by in ("instrument", "command"), "Group by instrument or command"
+        groups: dict[str, list[float]] = collections.defaultdict(list)
+        for event in self._events:
+            if event.kind != "span":
+                key = event.instrument if group_by == "instrument" else f"{event.instrument} {event.command}"
+                groups[key].append(event.duration_s)
+        return {key: numpy.array(durations) for key, durations in groups.items()}
+
+
+def split_message(message: str) -> tuple[str, str]:
+    """Headers and parameters of the commands in ``message``, each joined like a compound message."""
+    if " " not in message:
+        return message, ""
+    headers, params = [], []
+    for command in message.split(COMPOUND_SEPARATOR):
+        header, _, param = command.strip().partition(" ")
+        headers.append(header)
+        params.append(param.strip())
+    return COMPOUND_SEPARATOR.join(headers), COMPOUND_SEPARATOR.join(params)
+
+
+def span(tracer: SCPITracer | None, name: str, category: str = "script") -> contextlib.AbstractContextManager:
+    """``tracer.span`` that does nothing if tracing is off."""
+    return contextlib.nullcontext() if tracer is None else tracer.span(name, category)
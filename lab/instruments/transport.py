@@ -0,0 +1,269 @@
+"""Transports move SCPI messages between an instrument driver and its connection.
+
+A transport is chosen once per connection. It owns a receive buffer so that
+replies of any length can be framed by their newline terminator and binary
+IEEE 488.2 definite length blocks (``#<n><length><data>``) can be read without
+guessing their size up front.
+"""
+import abc
+import contextlib
+import socket
+from typing import Callable, Iterator
+
+VI_ERROR_TMO = -1073807339  # pyvisa.constants.StatusCode.error_timeout
+
+
+class Transport(abc.ABC):
+    """Buffered, newline framed access to an instrument connection."""
+
+    LINE_TERMINATOR = b"\n"
+    BLOCK_START = b"#"
+    SUPPORTS_SERVICE_REQUESTS = False
+
+    def __init__(self, connection, write_termination: str = "\r\n") -> None:
+        self._connection = connection
+        self._write_termination = write_termination
+        self._buffer = bytearray()
+        self._discarded_replies = 0
+
+    @property
+    def connection(self):
+        return self._connection
+
+    def write(self, message: str) -> None:
+        self._send((message + self._write_termination).encode())
+
+    def read_line(self) -> bytes:
+        """Read one reply up to and including its newline terminator."""
+        if self._discarded_replies:
+            self._skip_discarded_replies()
+        if not self._buffer:
+            # Fast path: the whole reply usually arrives in a single receive.
+            data = bytes(self._receive(0))
+            if not data:
+                raise ConnectionError("Connection closed by instrument")
+            if data.find(self.LINE_TERMINATOR) == len(data) - 1:
+                return data
+            self._buffer += data
+        index = self._buffer.find(self.LINE_TERMINATOR)
+        while index < 0:
+            start = len(self._buffer)
+            self._fill()
+            index = self._buffer.find(self.LINE_TERMINATOR, start)
+        line = bytes(self._buffer[: index + 1])
+        del self._buffer[: index + 1]
+        return line
+
+    def read_block(self, terminator: bytes = LINE_TERMINATOR) -> bytes:
+        """Read an IEEE 488.2 block and return its payload.
+
+        Any response header in front of the ``#`` (e.g. ``C2:WF DAT2,``) is
+        skipped. The ``terminator`` the instrument sends after the block is
+        consumed as well, however it is split across receives.
+        """
+        if self._discarded_replies:
+            self._skip_discarded_replies()
+        start = self._buffer.find(self.BLOCK_START)
+        while start < 0:
+            searched = len(self._buffer)
+            self._fill()
+            start = self._buffer.find(self.BLOCK_START, searched)
+
+        self._ensure(start + 2)
+        digits = self._buffer[start + 1] - ord("0")
+        if not 0 <= digits <= 9:
+            raise ValueError(f"Malformed block header: {bytes(self._buffer[start:start + 2])!r}")
+
+        if digits == 0:
+            # Indefinite length block, terminated by the end of the message.
+            line = self.read_line()
+            return line[start + 2 :].rstrip(b"\r\n")
+
+        header_end = start + 2 + digits
+        self._ensure(header_end)
+        length = int(self._buffer[start + 2 : header_end])
+        end = header_end + length
+        self._ensure(end + len(terminator))
+        if self._buffer[end : end + len(terminator)] != terminator:
+            raise ValueError(f"Expected {terminator!r} after a block but got {bytes(self._buffer[end : end + len(terminator)])!r}")
+        data = bytes(self._buffer[header_end:end])
+        del self._buffer[: end + len(terminator)]
+        return data
+
+    def clear(self) -> None:
+        """Drop everything that has been received but not read yet."""
+        self._buffer.clear()
+
+    @contextlib.contextmanager
+    def timeout(self, seconds: float | None) -> Iterator[None]:
+        """Use a different read timeout inside the ``with`` block, None waits forever.
+
+        Reads that time out raise ``TimeoutError``.
+        """
+        previous = self._get_timeout()
+        self._set_timeout(seconds)
+        try:
+            yield
+        finally:
+            self._set_timeout(previous)
+
+    def discard_reply(self) -> None:
+        """Skip the next reply when it arrives, e.g. the late answer to a query that timed out."""
+        self._discarded_replies += 1
+
+    @abc.abstractmethod
+    def service_requests(self) -> contextlib.AbstractContextManager[Callable[[float], None]]:
+        """Listen for service requests (SRQ) and yield a function waiting for one with a timeout.
+
+        Only available if ``SUPPORTS_SERVICE_REQUESTS``, otherwise ``NotImplementedError``.
+        """
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _ensure(self, size: int) -> None:
+        while len(self._buffer) < size:
+            self._fill(size - len(self._buffer))
+
+    def _fill(self, size_hint: int = 0) -> None:
+        data = self._receive(size_hint)
+        if not data:
+            raise ConnectionError("Connection closed by instrument")
+        self._buffer += data
+
+    def _skip_discarded_replies(self) -> None:
+        while self._discarded_replies:
+            self._discarded_replies -= 1
+            self.read_line()
+
+    @abc.abstractmethod
+    def _send(self, data: bytes) -> None:
+        pass
+
+    @abc.abstractmethod
+    def _receive(self, size_hint: int):
+        """Return at least one byte, or an empty result if the peer closed."""
+
+    @abc.abstractmethod
+    def _get_timeout(self) -> float | None:
+        pass
+
+    @abc.abstractmethod
+    def _set_timeout(self, seconds: float | None) -> None:
+        pass
+
+
+class SocketTransport(Transport):
+    """Raw socket connection, e.g. port 5025 or 5555 of a LAN instrument."""
+
+    RECEIVE_SIZE = 65536
+
+    def __init__(self, connection: socket.socket, write_termination: str = "\r\n") -> None:
+        super(SocketTransport, self).__init__(connection, write_termination)
+        self._chunk = bytearray(self.RECEIVE_SIZE)
+        self._chunk_view = memoryview(self._chunk)
+
+    def service_requests(self) -> contextlib.AbstractContextManager[Callable[[float], None]]:
+        raise NotImplementedError("A raw socket connection carries no service requests")
+
+    def _send(self, data: bytes) -> None:
+        self._connection.sendall(data)
+
+    def _receive(self, size_hint: int):
+        received = self._connection.recv_into(self._chunk)
+        return self._chunk_view[:received]
+
+    def _get_timeout(self) -> float | None:
+        return self._connection.gettimeout()
+
+    def _set_timeout(self, seconds: float | None) -> None:
+        self._connection.settimeout(seconds)
+
+
+class TelnetTransport(Transport):
+    """``telnetlib.Telnet`` connection."""
+
+    def service_requests(self) -> contextlib.AbstractContextManager[Callable[[float], None]]:
+        raise NotImplementedError("A telnet connection carries no service requests")
+
+    def _send(self, data: bytes) -> None:
+        self._connection.write(data)
+
+    def _receive(self, size_hint: int):
+        return self._connection.read_some()
+
+    def _get_timeout(self) -> float | None:
+        return self._connection.sock.gettimeout()
+
+    def _set_timeout(self, seconds: float | None) -> None:
+        self._connection.sock.settimeout(seconds)
+
+
+class VisaTransport(Transport):
+    """pyvisa message based resource (``TCPIPInstrument``, ``USBInstrument``, ...).
+
+    VISA already frames messages, so one ``read_raw`` returns a complete reply.
+    Writes keep using the termination configured on the resource.
+    """
+
+    SUPPORTS_SERVICE_REQUESTS = True
+
+    def write(self, message: str) -> None:
+        self._connection.write(message)
+
+    @contextlib.contextmanager
+    def service_requests(self) -> Iterator[Callable[[float], None]]:
+        from pyvisa import constants
+
+        event, mechanism = constants.EventType.service_request, constants.EventMechanism.queue
+
+        def wait(timeout_s: float) -> None:
+            try:
+                self._connection.wait_on_event(event, int(timeout_s * 1000))
+            except Exception as error:
+                _raise_timeout(error)
+                raise
+
+        self._connection.enable_event(event, mechanism)
+        try:
+            yield wait
+        finally:
+            self._connection.disable_event(event, mechanism)
+            self._connection.discard_events(event, mechanism)
+
+    def _receive(self, size_hint: int):
+        try:
+            return self._connection.read_raw()
+        except Exception as error:
+            _raise_timeout(error)
+            raise
+
+    def _get_timeout(self) -> float | None:
+        timeout = self._connection.timeout
+        return None if timeout is None or timeout == float("inf") else timeout / 1000
+
+    def _set_timeout(self, seconds: float | None) -> None:
+        self._connection.timeout = None if seconds is None else seconds * 1000
+
+
+def _raise_timeout(error: Exception) -> None:
+    """Turn a VISA timeout into ``TimeoutError`` like the socket transports raise."""
+    if type(error).__name__ == "VisaIOError" and getattr(error, "error_code", None) == VI_ERROR_TMO:
+        raise TimeoutError(str(error)) from error
+
+
+VISA_RESOURCE_TYPES = ("USBInstrument", "TCPIPInstrument", "TCPIPSocket", "SerialInstrument", "GPIBInstrument")
+
+
+def create_transport(connection, write_termination: str = "\r\n") -> Transport:
+    """Pick the transport matching the type of ``connection``."""
+    if isinstance(connection, Transport):
+        return connection
+    if isinstance(connection, socket.socket):
+        return SocketTransport(connection, write_termination)
+    type_name = type(connection).__name__
+    if type_name == "Telnet":
+        return TelnetTransport(connection, write_termination)
+    if type_name in VISA_RESOURCE_TYPES:
+        return VisaTransport(connection, write_termination)
+    raise TypeError(f"Unsupported connection type: {type_name}")
@@ -0,0 +1,89 @@
+"""Setpoint grids for one-dimensional sweeps.
+
+A sweep asks its grid for the next setpoint and reports the metrics measured
+there, so the same loop drives a uniform or an adaptive sweep::
+
+    grid = AdaptiveGrid(0.0, 2.0, resolution=0.01, tolerances=(0.005, 0.5))
+    while (current := grid.next_point()) is not None:
+        load.set_current(current)
+        ...
+        grid.add(current, (output_voltage, efficiency))
+
+``AdaptiveGrid`` measures a coarse grid first and then keeps splitting the
+interval across which a metric changes the most, relative to its tolerance.
+Points concentrate at knees such as the DCM/CCM transition or dropout, while
+flat parts of the curve stay coarse.
+"""
+from typing import Sequence
+
+import numpy
+
+
+class UniformGrid:
+    """The fixed list of setpoints the scripts always used."""
+
+    def __init__(self, points: Sequence[float]) -> None:
+        self.points = list(points)
+        self.measured: dict[float, tuple[float, ...]] = {}
+
+    def next_point(self) -> float | None:
+        return next((point for point in self.points if point not in self.measured), None)
+
+    def add(self, point: float, metrics: Sequence[float]) -> None:
+        self.measured[point] = tuple(metrics)
+
+
+class AdaptiveGrid:
+    """Coarse-to-fine grid between ``start`` and ``stop``.
+
+    ``tolerances`` holds one value per metric passed to ``add``: an interval
+    is split while any metric changes by more than its tolerance across it,
+    until ``max_points`` are measured or intervals reach ``resolution``, the
+    smallest setpoint step of the instrument.
+    """
+
+    def __init__(
+        self,
+        start: float,
+        stop: float,
+        resolution: float,
+        tolerances: Sequence[float],
+        initial_points: int = 11,
+        max_points: int = 60,
+    ) -> None:
+        assert stop > start and resolution > 0, "Sweep from start up to stop in steps of resolution"
+        assert initial_points >= 2 and max_points >= initial_points, "Budget must cover the coarse grid"
+        self.resolution = resolution
+        self.tolerances = numpy.asarray(tolerances, dtype=float)
+        self.max_points = max_points
+        self.measured: dict[float, tuple[float, ...]] = {}
+        self._coarse = [self._snap(point) for point in numpy.linspace(start, stop, initial_points)]
+
+    def next_point(self) -> float | None:
+        coarse = next((point for point in self._coarse if point not in self.measured), None)
+        if coarse is not None or len(self.measured) >= self.max_points:
+            return coarse
+
+        points = numpy.array(sorted(self.measured))
+        metrics = numpy.array([self.measured[point] for point in points], dtype=float)
+        scores = numpy.nan_to_num(numpy.abs(numpy.diff(metrics, axis=0)) / self.tolerances).max(axis=1)
+        midpoints = numpy.round((points[:-1] + points[1:]) / 2 / self.resolution) * self.resolution
+        splittable = (midpoints > points[:-1] + self.resolution / 2) & (midpoints < points[1:] - self.resolution / 2)
+        scores[~splittable] = 0.0
+        interval = int(numpy.argmax(scores))
+        if scores[interval] <= 1.0:
+            return None
+        return self._snap(midpoints[interval])
+
+    def add(self, point: float, metrics: Sequence[float]) -> None:
+        assert len(metrics) == len(self.tolerances), "One metric per tolerance"
+        self.measured[point] = tuple(metrics)
+
+    def _snap(self, point: float) -> float:
+        # Rounded to the decimals of the resolution so setpoints print and compare cleanly.
+        decimals = max(0, int(numpy.ceil(-numpy.log10(self.resolution))))
+        return round(round(float(point) / self.resolution) * self.resolution, decimals)
+
+
+def efficiency_percent(input_power: float, output_power: float) -> float:
+    return 100.0 * output_power / input_power if input_power > 0 else 0.0
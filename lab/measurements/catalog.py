@@ -0,0 +1,246 @@
+"""SQLite index over the measurement archive.
+
+``refresh`` walks the archive for result CSVs (with their ``.meta.csv`` side
+files) and ``.labres`` result files, and stores each run's columns, row count
+and metadata in a database next to the archive. Only files whose modification
+time changed since the last refresh are read again, so refreshing a large
+archive costs little more than a directory walk. A file that cannot be read,
+e.g. a run still being written, is logged and skipped and keeps the entry of
+its last good read::
+
+    catalog = Catalog()
+    catalog.refresh()
+    for run in catalog.query(equals={"Input voltage": 23}, contains={"DUT": "5817"}):
+        print(run.path, run.metadata["DUT"])
+        data = run.load()  # the DataFrame is only read here
+
+    python -m lab.measurements.catalog "Input voltage=23" "DUT~5817"
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import struct
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Iterable, Mapping
+
+from lab.measurements.results import RESULT_SUFFIX, load_results
+
+if TYPE_CHECKING:
+    import pandas
+
+ARCHIVE_PATH = pathlib.Path(__file__).parent
+DATABASE_FILE_NAME = "catalog.sqlite3"
+META_SUFFIX = ".meta.csv"
+READ_ERRORS = (OSError, ValueError, KeyError, TypeError, struct.error, csv.Error)  # Truncated or corrupt run files
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    format TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    meta_path TEXT,
+    meta_mtime_ns INTEGER,
+    rows INTEGER NOT NULL,
+    columns TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT,
+    number REAL
+);
+CREATE INDEX IF NOT EXISTS metadata_key_number ON metadata(key, number);
+CREATE INDEX IF NOT EXISTS metadata_key_value ON metadata(key, value);
+CREATE INDEX IF NOT EXISTS metadata_run ON metadata(run_id);
+"""
+
+
+@dataclass
+class CatalogRun:
+    path: pathlib.Path
+    format: str
+    rows: int
+    columns: list[str]
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+    def load(self) -> "pandas.DataFrame":
+        if self.format == "csv":
+            import pandas
+
+            return pandas.read_csv(self.path, index_col=0)
+        return load_results(self.path).to_dataframe()
+
+
+class Catalog:
+    def __init__(self, root: str | pathlib.Path = ARCHIVE_PATH, database: str | pathlib.Path | None = None) -> None:
+        self.root = pathlib.Path(root)
+        self._connection = sqlite3.connect(database or self.root / DATABASE_FILE_NAME)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def refresh(self) -> tuple[int, int]:
+        """Index new and changed runs and drop deleted ones. Returns (updated, removed)."""
+        known = {
+            path: (mtime_ns, meta_path, meta_mtime_ns)
+            for path, mtime_ns, meta_path, meta_mtime_ns in self._connection.execute(
+                "SELECT path, mtime_ns, meta_path, meta_mtime_ns FROM runs"
+            )
+        }
+        found = set()
+        updated = 0
+        with self._connection:
+            for path in self._run_files():
+                found.add(str(path))
+                try:
+                    meta_path = _meta_path(path)
+                    stamp = (path.stat().st_mtime_ns, str(meta_path) if meta_path else None, _mtime_ns(meta_path))
+                    if known.get(str(path)) == stamp:
+                        continue
+                    run = _read_run(path, meta_path)
+                except READ_ERRORS as error:
+                    logging.getLogger(__name__).warning("Skipping %s, it cannot be read: %s", path, error)
+                    continue
+                self._index(path, stamp, *run)
+                updated += 1
+            removed = [(path,) for path in known.keys() - found]
+            self._connection.executemany("DELETE FROM runs WHERE path = ?", removed)
+        return updated, len(removed)
+
+    def query(
+        self, equals: Mapping[str, Any] | None = None, contains: Mapping[str, str] | None = None
+    ) -> list[CatalogRun]:
+        """Runs whose metadata matches all conditions.
+
+        ``equals`` compares numbers numerically and text exactly, ``contains``
+        matches a case-insensitive substring of the text.
+        """
+        conditions, parameters = [], []
+        for key, value in (equals or {}).items():
+            if isinstance(value, (int, float)):
+                conditions.append("id IN (SELECT run_id FROM metadata WHERE key = ? AND number = ?)")
+            else:
+                conditions.append("id IN (SELECT run_id FROM metadata WHERE key = ? AND value = ?)")
+            parameters += [key, value]
+        for key, value in (contains or {}).items():
+            conditions.append("id IN (SELECT run_id FROM metadata WHERE key = ? AND value LIKE ? ESCAPE '\\')")
+            parameters += [key, "%" + value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"]
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        runs = {
+            run_id: CatalogRun(pathlib.Path(path), run_format, rows, json.loads(columns))
+            for run_id, path, run_format, rows, columns in self._connection.execute(
+                "SELECT id, path, format, rows, columns FROM runs" + where + " ORDER BY path", parameters
+            )
+        }
+        if runs:
+            placeholders = ",".join("?" * len(runs))
+            for run_id, key, value, number in self._connection.execute(
+                f"SELECT run_id, key, value, number FROM metadata WHERE run_id IN ({placeholders})", list(runs)
+            ):
+                runs[run_id].metadata[key] = value if number is None else _number(value, number)
+        return list(runs.values())
+
+    def _run_files(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(RESULT_SUFFIX) or (filename.endswith(".csv") and not filename.endswith(META_SUFFIX)):
+                    yield pathlib.Path(dirpath) / filename
+
+    def _index(
+        self, path: pathlib.Path, stamp: tuple, run_format: str, rows: int, columns: list[str], metadata: dict[str, Any]
+    ) -> None:
+        self._connection.execute("DELETE FROM runs WHERE path = ?", (str(path),))
+        run_id = self._connection.execute(
+            "INSERT INTO runs (path, format, mtime_ns, meta_path, meta_mtime_ns, rows, columns) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (str(path), run_format, *stamp, rows, json.dumps(columns)),
+        ).lastrowid
+        self._connection.executemany(
+            "INSERT INTO metadata (run_id, key, value, number) VALUES (?, ?, ?, ?)",
+            [(run_id, key, str(value), _to_number(value)) for key, value in metadata.items()],
+        )
+
+
+def _read_run(path: pathlib.Path, meta_path: pathlib.Path | None) -> tuple[str, int, list[str], dict[str, Any]]:
+    """Format, row count, columns and metadata of a run file."""
+    if path.suffix == RESULT_SUFFIX:
+        results = load_results(path)
+        return "labres", len(results), list(results.columns), results.metadata
+    with open(path, newline="") as file:
+        reader = csv.reader(file)
+        columns = next(reader, [""])[1:]
+        rows = sum(1 for _ in reader)
+    return "csv", rows, columns, _read_meta_csv(meta_path) if meta_path else {}
+
+
+def _meta_path(path: pathlib.Path) -> pathlib.Path | None:
+    """The side file of a CSV run; temp_and_noise runs share one for their line and load sweep."""
+    if path.suffix != ".csv":
+        return None
+    candidates = [path.with_suffix(META_SUFFIX)]
+    for sweep in ("_line_sweep_", "_load_sweep_"):
+        if sweep in path.name:
+            candidates.append(path.with_name(path.name.replace(sweep, "_")).with_suffix(META_SUFFIX))
+    return next((candidate for candidate in candidates if candidate.exists()), None)
+
+
+def _mtime_ns(path: pathlib.Path | None) -> int | None:
+    return path.stat().st_mtime_ns if path else None
+
+
+def _read_meta_csv(path: pathlib.Path) -> dict[str, str]:
+    with open(path, newline="") as file:
+        return {row[0]: row[1] for row in list(csv.reader(file))[1:] if len(row) >= 2}
+
+
+def _to_number(value: Any) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _number(text: str, number: float) -> int | float:
+    return int(number) if number.is_integer() and "." not in text else number
+
+
+def parse_conditions(conditions: Iterable[str]) -> tuple[dict[str, Any], dict[str, str]]:
+    """``equals`` and ``contains`` for ``Catalog.query`` from "key=value" and "key~text" strings."""
+    equals, contains = {}, {}
+    for condition in conditions:
+        if "~" in condition:
+            key, value = condition.split("~", 1)
+            contains[key] = value
+        else:
+            key, value = condition.split("=", 1)
+            number = _to_number(value)
+            equals[key] = value if number is None else number
+    return equals, contains
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Find runs in the measurement archive.")
+    parser.add_argument("conditions", nargs="*", help='"key=value" for equality, "key~text" for a substring')
+    parser.add_argument("--root", type=pathlib.Path, default=ARCHIVE_PATH)
+    arguments = parser.parse_args()
+
+    equals, contains = parse_conditions(arguments.conditions)
+    with Catalog(arguments.root) as catalog:
+        catalog.refresh()
+        for run in catalog.query(equals, contains):
+            print(f"{run.path.relative_to(catalog.root)}  {run.rows} rows  {run.metadata.get('DUT', '')}")
+
+
+if __name__ == "__main__":
+    main()
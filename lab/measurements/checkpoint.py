@@ -0,0 +1,36 @@
+"""Checkpoints that let an interrupted sweep continue where it stopped.
+
+After every measured point the sweep saves which points are done and the
+setpoints the instruments had. Saving writes a temporary file and renames it
+over the checkpoint, so a crash leaves either the previous or the new
+checkpoint, never a torn one. The measured values themselves live in the
+result files (see ``results``), which are continued with ``append=True``.
+"""
+import json
+import os
+import pathlib
+from typing import Any
+
+
+class SweepCheckpoint:
+    def __init__(self, path: str | pathlib.Path) -> None:
+        self.path = pathlib.Path(path)
+
+    def load(self) -> dict[str, Any] | None:
+        """The last saved state, or None if there is nothing to resume."""
+        try:
+            return json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return None
+
+    def save(self, **state: Any) -> None:
+        temporary_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary_path, "w") as file:
+            json.dump(state, file, default=str)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.path)
+
+    def clear(self) -> None:
+        """Remove the checkpoint once the sweep has completed."""
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,126 @@
+"""Output voltage, efficiency and temperature over the full line x load grid.
+
+The sweep is a ``SweepPlan``: the PSU voltage and the load current are its
+axes and the grid is walked in the order with the least predicted settling.
+``--dry-run`` prints the plan and its predicted duration without connecting
+to the bench::
+
+    python -m lab.measurements.line_load_grid --dry-run
+    python -m lab.measurements.line_load_grid
+"""
+import argparse
+import asyncio
+import datetime
+import logging
+import pathlib
+
+from lab.instruments.async_scpi_instrument import AsyncSCPIInstrument
+from lab.instruments.rigol_dl_3021_a import RigolDL3021A_247 as Load
+from lab.instruments.rohde_und_schwarz_hmc8012 import RohdeUndSchwarzHMC8012_146 as Multimeter
+from lab.instruments.session import SessionManager, default_session
+from lab.instruments.siglent_spd_1305_x import Siglent1305X_249 as PowerSupply
+from lab.measurements.results import RESULT_SUFFIX, ResultWriter
+from lab.measurements.settling import SettlingDetector
+from lab.measurements.sweep_plan import Axis, Readout, Settle, SweepPlan
+
+RESULTS_PATH = pathlib.Path(__file__).parent
+LINE_VOLTAGES = list(range(14, 26, 1))
+LOAD_CURRENTS = [x / 10.0 for x in range(0, 21, 1)]
+INPUT_CURRENT = 5
+PSU_SENSE = "2W"
+# Settling model of the LM2596 boards, for the point order and the dry run
+LINE_SETTLING_S, LINE_SETTLING_S_PER_VOLT = 0.05, 0.02
+LOAD_SETTLING_S, LOAD_SETTLING_S_PER_AMP = 0.02, 0.1
+SETTLING = SettlingDetector(window=4, absolute_tolerance=0.002, timeout_s=2)
+
+
+def build_plan(
+    load: AsyncSCPIInstrument | None = None,
+    psu: AsyncSCPIInstrument | None = None,
+    dmm: AsyncSCPIInstrument | None = None,
+) -> SweepPlan:
+    """The grid sweep, bound to the instruments if given (a dry run needs none)."""
+    return SweepPlan(
+        axes=[
+            Axis("line_voltages", LINE_VOLTAGES, psu and psu.set_voltage, LINE_SETTLING_S, LINE_SETTLING_S_PER_VOLT),
+            Axis("load_currents", LOAD_CURRENTS, load and load.set_current, LOAD_SETTLING_S, LOAD_SETTLING_S_PER_AMP),
+        ],
+        readouts=[
+            Readout("psu_measured_voltages", psu and psu.measure_voltage),
+            Readout("psu_measured_currents", psu and psu.measure_current),
+            Readout("psu_measured_powers", psu and psu.measure_power),
+            Readout("load_measured_voltages", load and load.measure_voltage),
+            Readout("load_measured_currents", load and load.measure_current),
+            Readout("load_measured_powers", load and load.measure_power),
+            Readout("temperatures", dmm and dmm.fetch),
+        ],
+        settle=Settle(SETTLING, load and load.measure_voltage),
+    )
+
+
+def run(
+    results_path: pathlib.Path = RESULTS_PATH,
+    addresses: dict[type, tuple[str, int]] | None = None,
+    session: SessionManager | None = None,
+) -> pathlib.Path:
+    return asyncio.run(run_async(results_path, addresses, session))
+
+
+async def run_async(
+    results_path: pathlib.Path = RESULTS_PATH,
+    addresses: dict[type, tuple[str, int]] | None = None,
+    session: SessionManager | None = None,
+) -> pathlib.Path:
+    """Measure the grid and return the path of the result file.
+
+    Instruments missing from ``addresses`` are found through ``session``, by default ``default_session``.
+    """
+    logger = logging.getLogger(__name__)
+    addresses = addresses or {}
+    session = session or default_session()
+    instruments: list[AsyncSCPIInstrument] = await asyncio.gather(
+        *[session.open_async(driver, addresses.get(driver)) for driver in (Load, PowerSupply, Multimeter)]
+    )
+    load, psu, dmm = instruments
+    plan = build_plan(load, psu, dmm)
+    logger.info("Plan: %s", plan.predict())
+
+    meta = {}
+    meta["Script"] = pathlib.Path(__file__).name
+    meta["Timestamp"] = datetime.datetime.now().strftime("%d_%m_%Y_%H_%M_%S")
+    meta["Instruments"] = " ".join(await asyncio.gather(*[instrument.get_id_string() for instrument in instruments]))
+    meta["Set input current"] = INPUT_CURRENT
+    meta["PSU sense"] = PSU_SENSE
+    meta["Sweep order"] = f"{plan.order} over {' > '.join(plan.nesting)}"
+    meta["Predicted duration"] = round(plan.predict().total_s, 1)
+
+    path = results_path / (meta["Timestamp"] + "_line_load_grid" + RESULT_SUFFIX)
+    try:
+        with ResultWriter(path, plan.columns(), meta) as results:
+            await psu.set_current(INPUT_CURRENT)
+            await psu.set_mode(PSU_SENSE)
+            await psu.set_enable_output(True)
+            await load.set_enable_input(True)
+            await plan.run(results)
+        return path
+    finally:
+        await asyncio.gather(load.set_enable_input(False, force=True), psu.set_enable_output(False, force=True))
+        await asyncio.gather(*[instrument.close() for instrument in instruments])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the full line x load grid.")
+    parser.add_argument("--dry-run", action="store_true", help="only print the plan and its predicted duration")
+    arguments = parser.parse_args()
+    if arguments.dry_run:
+        plan = build_plan()
+        print(plan.predict())
+        naive = SweepPlan(list(plan.axes.values()), plan.readouts, plan.settle, order="naive", nesting=plan.nesting)
+        print(f"instead of {naive.predict()}")
+        return
+    logging.basicConfig(level=logging.INFO)
+    print(run())
+
+
+if __name__ == "__main__":
+    main()
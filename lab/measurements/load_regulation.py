@@ -2,56 +2,104 @@
 import datetime
 import logging
 import pathlib
-import socket
 import time
-
-import pandas
-import pyvisa
+from typing import TYPE_CHECKING
 
 from lab.instruments.rigol_dl_3021_a import RigolDL3021A_247 as Load
 from lab.instruments.scpi_instrument import SCPIInstrument
+from lab.instruments.session import SessionManager, default_session
+from lab.instruments.shadow_state import ShadowState
 from lab.instruments.siglent_spd_1305_x import Siglent1305X_249 as PowerSupply
+from lab.instruments.tracing import SCPITracer, span
+from lab.measurements.adaptive import AdaptiveGrid, UniformGrid, efficiency_percent
+from lab.measurements.results import RESULT_SUFFIX, ResultWriter, load_results
+from lab.measurements.settling import SettlingDetector
+
+if TYPE_CHECKING:
+    import pandas
 
 # pylint: disable=line-too-long
 # pylint: disable=too-many-locals
 # pylint: disable=broad-exception-caught
 # pylint: disable=broad-exception-raised
 
-TIMEOUT = 1000
 RESULTS_PATH = pathlib.Path(__file__).parent
 VERSION = "1.0.0"
 PSU_SETTLING_TIME_S = 1.5
 LOAD_SETTLING_TIME_S = .2
-
-def run() -> pandas.DataFrame:
-    """Run a load regulation measurement."""
+SHADOW_STALENESS_S = 10.0
+LOAD_SETTLING = SettlingDetector(window=4, absolute_tolerance=0.002, timeout_s=5 * LOAD_SETTLING_TIME_S)
+LOAD_CURRENTS = [x / 100.0 for x in range(0, 201, 1)]
+ADAPTIVE_OUTPUT_VOLTAGE_TOLERANCE = 0.005
+ADAPTIVE_EFFICIENCY_TOLERANCE = 0.5
+ADAPTIVE_MAX_POINTS = 60
+LIST_READ_TIME_S = 0.05  # Left in every list step to read the load and the PSU once the DUT settled
+LIST_STEP_WIDTH_S = LOAD_SETTLING_TIME_S + LIST_READ_TIME_S
+
+def run(
+    results_path: pathlib.Path = RESULTS_PATH,
+    addresses: dict[type, tuple[str, int]] | None = None,
+    tracer: SCPITracer | None = None,
+    adaptive: bool = False,
+    session: SessionManager | None = None,
+    list_sweep: bool = False,
+) -> "pandas.DataFrame":
+    """Run a load regulation measurement.
+
+    ``addresses`` overrides the LAN address of instrument classes, e.g. with
+    ``SimulatedBench.addresses`` to run against the simulator. With a
+    ``tracer`` every SCPI exchange and the phases of the sweep are recorded.
+    ``adaptive`` replaces the uniform 10 mA grid by an ``AdaptiveGrid`` that
+    refines where the output voltage or the efficiency changes fastest.
+    The connections come from ``session``, by default the process wide
+    ``default_session``, and stay open for the next run.
+    ``list_sweep`` lets the load step through the uniform grid from its list
+    memory (``RigolDL3021A.sweep_current``), ``LIST_STEP_WIDTH_S`` per point,
+    instead of setting and settling every current. Every point then dwells
+    the same time on the load's own clock, but the sweep is not faster: the
+    load has no measurement memory, so each step is still read on its own
+    and a fixed step is longer than adaptive settling usually takes (see
+    ``benchmarks.simulated_sweeps``).
+    """
+    if list_sweep and adaptive:
+        raise ValueError("A list sweep runs a fixed grid, it cannot be adaptive")
     logger = logging.getLogger(__name__)
+    addresses = addresses or {}
+    session = session or default_session()
 
-    resource_manager = pyvisa.ResourceManager()
-    load_connection = resource_manager.open_resource(Load.TCPIP_INSTRUMENT_STRING)
-    load = Load(load_connection)
-
-    psu_connection = create_socket_and_connect(PowerSupply.IP_ADDRESS, PowerSupply.PORT)
-    psu = PowerSupply(psu_connection)
-
-    connections :list[socket.socket | pyvisa.resources.TCPIPInstrument] = [load_connection, psu_connection]
+    load = session.open(Load, addresses.get(Load))
+    psu = session.open(PowerSupply, addresses.get(PowerSupply))
     instruments : list[SCPIInstrument] = [load, psu]
+    for instrument in instruments:
+        instrument.tracer = tracer
+        # Pooled connections keep their shadow state between runs, sync checks it against the instrument.
+        instrument.shadow = instrument.shadow or ShadowState(SHADOW_STALENESS_S)
+        instrument.sync()
 
     time_stamp = datetime.datetime.now()
-    meta_df = pandas.DataFrame(columns=["meta"])
-    meta_df.loc["Script"] = pathlib.Path(__file__).name
-    meta_df.loc["Timestamp"] = str(time_stamp)
-    meta_df.loc["Instruments"] = " ".join([instrument.get_id_string() for instrument in instruments])
-    meta_df.loc["Version"] = VERSION
-    meta_df.loc["DUT"] = "LM2596_2 with 5817 diode and 470uH none shielded inductor"
-    meta_df.loc["Input voltage"] = 23
-    meta_df.loc["Output votlage"] = 12
-
-    result_header = ["psu_measured_voltages", "psu_measured_currents", "psu_measured_powers", "load_measured_voltages", "load_measured_currents", "load_measured_powers"]
-    results_df = pandas.DataFrame(columns=result_header)
+    meta = {}
+    meta["Script"] = pathlib.Path(__file__).name
+    meta["Timestamp"] = str(time_stamp)
+    meta["Instruments"] = " ".join([instrument.get_id_string() for instrument in instruments])
+    meta["Version"] = VERSION
+    meta["DUT"] = "LM2596_2 with 5817 diode and 470uH none shielded inductor"
+    meta["Input voltage"] = 23
+    meta["Output votlage"] = 12
+    meta["Sweep"] = "adaptive" if adaptive else "list" if list_sweep else "uniform"
+
+    if adaptive:
+        grid = AdaptiveGrid(
+            LOAD_CURRENTS[0], LOAD_CURRENTS[-1], resolution=0.01,
+            tolerances=(ADAPTIVE_OUTPUT_VOLTAGE_TOLERANCE, ADAPTIVE_EFFICIENCY_TOLERANCE), max_points=ADAPTIVE_MAX_POINTS,
+        )
+    else:
+        grid = UniformGrid(LOAD_CURRENTS)
+
+    result_columns = ["load_currents", "psu_measured_voltages", "psu_measured_currents", "psu_measured_powers", "load_measured_voltages", "load_measured_currents", "load_measured_powers", "settling_times"]
+    results = ResultWriter(results_path / ("load_regulation" + RESULT_SUFFIX), result_columns, meta)
 
     try:
-        for value in meta_df["meta"]:
+        for value in meta.values():
             logger.info(value)
 
         psu.set_voltage(23)
@@ -59,7 +107,8 @@ def run() -> pandas.DataFrame:
         psu.set_mode("4W")
         psu.set_enable_output(True)
 
-        time.sleep(PSU_SETTLING_TIME_S)
+        with span(tracer, "PSU settling"):
+            time.sleep(PSU_SETTLING_TIME_S)
 
         log_psu_state(logger, psu)
 
@@ -67,60 +116,72 @@ def run() -> pandas.DataFrame:
         logger.info("Load measured current: %f",load.measure_current())
         logger.info("Load measured power: %f",load.measure_power())
 
-        load_currents = [x / 100.0 for x in range(0, 201, 1)]
-
-        psu_measured_voltages = []
-        psu_measured_currents = []
-        psu_measured_powers = []
-
-        load_measured_voltages = []
-        load_measured_currents = []
-        load_measured_powers = []
-
-        load.set_enable_input(True)
-
-        for load_current in load_currents:
-            load.set_current(load_current)
-            time.sleep(LOAD_SETTLING_TIME_S)
-
-            psu_measured_voltages.append(psu.measure_voltage())
-            psu_measured_currents.append(psu.measure_current())
-            psu_measured_powers.append(psu.measure_power())
-
-            load_measured_voltages.append(load.measure_voltage())
-            load_measured_currents.append(load.measure_current())
-            load_measured_powers.append(load.measure_power())
-
-        results_df['psu_measured_voltages'] = psu_measured_voltages
-        results_df['psu_measured_currents'] = psu_measured_currents
-        results_df['psu_measured_powers'] = psu_measured_powers
-
-        results_df['load_measured_voltages'] = load_measured_voltages
-        results_df['load_measured_currents'] = load_measured_currents
-        results_df['load_measured_powers'] = load_measured_powers
-
-        time_stamp_for_filename = time_stamp.strftime("%Y%m%d_%H%M%S") # pylint: disable=unused-variable
-        file_name = "load_regulation.csv"
-
-        results_df.to_csv(RESULTS_PATH / file_name, header=result_header)
-        meta_df.to_csv((RESULTS_PATH / file_name).with_suffix(".meta.csv"), header=["meta"])
-
-        return results_df
+        if list_sweep:
+            def record_list_step(step: int, load_reading: tuple[float, float, float]) -> None:
+                with psu.batch() as psu_batch:
+                    psu_voltage_reading = psu_batch.measure_voltage()
+                    psu_current_reading = psu_batch.measure_current()
+                    psu_power_reading = psu_batch.measure_power()
+                results.append(
+                    load_currents=LOAD_CURRENTS[step],
+                    psu_measured_voltages=psu_voltage_reading.result(),
+                    psu_measured_currents=psu_current_reading.result(),
+                    psu_measured_powers=psu_power_reading.result(),
+                    load_measured_voltages=load_reading[0],
+                    load_measured_currents=load_reading[1],
+                    load_measured_powers=load_reading[2],
+                    settling_times=LOAD_SETTLING_TIME_S,
+                )
+
+            with span(tracer, "list sweep"):
+                load.sweep_current(
+                    LOAD_CURRENTS, LIST_STEP_WIDTH_S, on_step=record_list_step, read_at_s=LOAD_SETTLING_TIME_S
+                )
+        else:
+            load.set_enable_input(True)
+
+            while (load_current := grid.next_point()) is not None:
+                load.set_current(load_current)
+                with span(tracer, "load settling"):
+                    settling = LOAD_SETTLING.wait(load.measure_voltage)
+                if not settling.settled:
+                    logger.warning("Load current %f did not settle within %f s", load_current, LOAD_SETTLING.timeout_s)
+
+                with psu.batch() as psu_batch:
+                    psu_voltage_reading = psu_batch.measure_voltage()
+                    psu_current_reading = psu_batch.measure_current()
+                    psu_power_reading = psu_batch.measure_power()
+
+                with load.batch() as load_batch:
+                    load_voltage_reading = load_batch.measure_voltage()
+                    load_current_reading = load_batch.measure_current()
+                    load_power_reading = load_batch.measure_power()
+
+                results.append(
+                    load_currents=load_current,
+                    psu_measured_voltages=psu_voltage_reading.result(),
+                    psu_measured_currents=psu_current_reading.result(),
+                    psu_measured_powers=psu_power_reading.result(),
+                    load_measured_voltages=load_voltage_reading.result(),
+                    load_measured_currents=load_current_reading.result(),
+                    load_measured_powers=load_power_reading.result(),
+                    settling_times=settling.settling_time_s,
+                )
+                grid.add(
+                    load_current,
+                    (load_voltage_reading.result(), efficiency_percent(psu_power_reading.result(), load_power_reading.result())),
+                )
+
+        results.close()
+        return load_results(results.path).to_dataframe().sort_values("load_currents", ignore_index=True)
     except Exception as ex:
         logger.exception(ex)
         raise Exception from ex
     finally:
-        load.set_enable_input(False)
-        psu.set_enable_output(False)
-        for connection in connections:
-            connection.close()
-
-def create_socket_and_connect(ip_address: str, port: int):
-    """Create a network socket and connect to it."""
-    new_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    new_socket.settimeout(TIMEOUT)
-    new_socket.connect((ip_address, port))
-    return new_socket
+        results.close()
+        # Forced, the shadow state must not keep the bench powered.
+        load.set_enable_input(False, force=True)
+        psu.set_enable_output(False, force=True)
 
 def log_psu_state(logger, psu):
     logger.info("PSU output is: %s", 'on' if psu.get_output_enabled() else 'off')
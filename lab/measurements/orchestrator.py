@@ -0,0 +1,223 @@
+"""Run one measurement on several benches at once.
+
+The benches are listed in a TOML inventory (see ``benches.toml``): the
+address of each instrument role and metadata such as the DUT. Every bench
+gets its own worker process, which opens its own connections and runs the
+measurement script with the bench's addresses::
+
+    python -m lab.measurements.orchestrator load_regulation
+    python -m lab.measurements.orchestrator temp_and_noise --bench bench_1 --bench bench_2
+
+The results of a batch go into one directory of the archive, one
+subdirectory per bench, and every result file is tagged with ``Bench``,
+``Batch`` and the bench's metadata as soon as its first point is written, so
+the catalog can tell the runs apart even while they are running.
+The log records of all workers are forwarded to the parent process and
+printed with the bench they come from. Every point a script writes to a
+result file is reported to the parent as well (see ``ResultWriter.observer``),
+``run_benches`` passes them to its ``progress`` callback.
+"""
+import argparse
+import concurrent.futures
+import datetime
+import importlib
+import logging
+import logging.handlers
+import multiprocessing
+import pathlib
+import threading
+import time
+import tomllib
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from lab.instruments.rigol_dl_3021_a import RigolDL3021A_247
+from lab.instruments.rohde_und_schwarz_hmc8012 import RohdeUndSchwarzHMC8012_146
+from lab.instruments.session import parse_address
+from lab.instruments.siglent_sds_1104_x import Siglent1104X_107
+from lab.instruments.siglent_spd_1305_x import Siglent1305X_249
+from lab.measurements.results import RESULT_SUFFIX, ResultWriter, tag_results
+
+INVENTORY_PATH = pathlib.Path(__file__).parent / "benches.toml"
+ARCHIVE_PATH = pathlib.Path(__file__).parent
+MEASUREMENTS = ("load_regulation", "temp_and_noise", "line_load_grid")
+# Instrument roles of the inventory and the driver classes the scripts look their address up by
+ROLES = {
+    "load": RigolDL3021A_247,
+    "psu": Siglent1305X_249,
+    "scope": Siglent1104X_107,
+    "dmm": RohdeUndSchwarzHMC8012_146,
+}
+
+
+@dataclass
+class Bench:
+    name: str
+    addresses: dict[str, tuple[str, int]]
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+    def driver_addresses(self) -> dict[type, tuple[str, int]]:
+        return {ROLES[role]: address for role, address in self.addresses.items()}
+
+
+@dataclass
+class BenchResult:
+    bench: str
+    paths: list[pathlib.Path]
+    elapsed_s: float
+    error: str | None = None
+
+
+def load_inventory(path: str | pathlib.Path = INVENTORY_PATH) -> list[Bench]:
+    with open(path, "rb") as file:
+        inventory = tomllib.load(file)
+    benches = []
+    for name, entry in inventory.get("benches", {}).items():
+        unknown = set(entry) - set(ROLES) - {"metadata"}
+        if unknown:
+            raise ValueError(f"Unknown instrument roles {sorted(unknown)} of bench {name} in {path}")
+        addresses = {role: parse_address(entry[role], ROLES[role].PORT) for role in ROLES if role in entry}
+        benches.append(Bench(name, addresses, dict(entry.get("metadata", {}))))
+    return benches
+
+
+def run_benches(
+    measurement: str,
+    benches: list[Bench],
+    archive: str | pathlib.Path = ARCHIVE_PATH,
+    workers: int | None = None,
+    progress: Callable[[str, str, int], None] | None = None,
+) -> list[BenchResult]:
+    """Run ``measurement`` on all ``benches`` in parallel and return what each wrote.
+
+    ``progress(bench, file_name, points)`` is called in this process for every point written on any bench.
+    """
+    if measurement not in MEASUREMENTS:
+        raise ValueError(f"Unknown measurement {measurement!r}, use one of {MEASUREMENTS}")
+    if not benches:
+        raise ValueError("No benches to run the measurement on")
+    logger = logging.getLogger(__name__)
+    batch = datetime.datetime.now().strftime("%d_%m_%Y_%H_%M_%S") + "_" + measurement
+    batch_path = pathlib.Path(archive) / batch
+
+    with multiprocessing.Manager() as manager:
+        records = manager.Queue()
+        points = manager.Queue()
+        listener = logging.handlers.QueueListener(records, *_handlers(), respect_handler_level=True)
+        listener.start()
+        reporter = threading.Thread(target=_report_points, args=(points, progress), daemon=True)
+        reporter.start()
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers or len(benches)) as executor:
+                futures = [
+                    executor.submit(_run_bench, measurement, bench, batch_path / bench.name, batch, records, points)
+                    for bench in benches
+                ]
+                results = []
+                for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    result = future.result()
+                    logger.info(
+                        "%d/%d benches done, %s %s after %.1f s",
+                        done, len(benches), result.bench, "failed" if result.error else "finished", result.elapsed_s,
+                    )
+                    results.append(result)
+        finally:
+            points.put(None)
+            reporter.join()
+            listener.stop()
+    return sorted(results, key=lambda result: result.bench)
+
+
+def _report_points(points, progress: Callable[[str, str, int], None] | None) -> None:
+    while (point := points.get()) is not None:
+        if progress is not None:
+            progress(*point)
+
+
+def _run_bench(
+    measurement: str, bench: Bench, results_path: pathlib.Path, batch: str, records, points
+) -> BenchResult:
+    """Worker process: run the measurement against one bench and tag its result files."""
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(_BenchFilter(bench.name))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+    logger = logging.getLogger(__name__)
+    ResultWriter.observer = _PointReporter(bench.name, {"Bench": bench.name, "Batch": batch, **bench.metadata}, points)
+
+    results_path.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    error = None
+    try:
+        module = importlib.import_module(f"lab.measurements.{measurement}")
+        module.run(results_path=results_path, addresses=bench.driver_addresses())
+    except Exception as ex:
+        logger.exception("%s failed", measurement)
+        error = repr(ex)
+    paths = sorted(results_path.glob("*" + RESULT_SUFFIX))
+    for path in paths:
+        tag_results(path, Bench=bench.name, Batch=batch, **bench.metadata)  # Also files without a point
+    return BenchResult(bench.name, paths, time.perf_counter() - start, error)
+
+
+class _PointReporter:
+    """Tags each result file of a worker at its first point and reports every point to the parent."""
+
+    def __init__(self, bench: str, tags: dict[str, Any], points) -> None:
+        self.bench = bench
+        self.tags = tags
+        self.points = points
+        self._tagged: set[pathlib.Path] = set()
+
+    def point_written(self, writer: ResultWriter) -> None:
+        if writer.path not in self._tagged:
+            writer.update_metadata(**self.tags)
+            self._tagged.add(writer.path)
+        self.points.put((self.bench, writer.path.name, writer.rows))
+
+
+class _BenchFilter(logging.Filter):
+    def __init__(self, bench: str) -> None:
+        super(_BenchFilter, self).__init__()
+        self.bench = bench
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.bench = self.bench
+        return True
+
+
+def _log_progress(bench: str, file_name: str, points: int) -> None:
+    logging.getLogger(__name__).info("%s: %d points in %s", bench, points, file_name)
+
+
+def _handlers() -> list[logging.Handler]:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(bench)s %(levelname)s %(name)s: %(message)s"))
+    handler.setLevel(logging.INFO)
+    return [handler]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a measurement on several benches in parallel.")
+    parser.add_argument("measurement", choices=MEASUREMENTS)
+    parser.add_argument("--inventory", type=pathlib.Path, default=INVENTORY_PATH)
+    parser.add_argument("--bench", action="append", help="only these benches of the inventory, default all")
+    parser.add_argument("--archive", type=pathlib.Path, default=ARCHIVE_PATH)
+    arguments = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    benches = load_inventory(arguments.inventory)
+    if arguments.bench:
+        unknown = sorted(set(arguments.bench) - {bench.name for bench in benches})
+        if unknown:
+            parser.error(f"unknown benches {unknown} in {arguments.inventory}, choose from {[bench.name for bench in benches]}")
+        benches = [bench for bench in benches if bench.name in arguments.bench]
+    if not benches:
+        parser.error(f"no benches in {arguments.inventory}")
+    for result in run_benches(arguments.measurement, benches, arguments.archive, progress=_log_progress):
+        print(f"{result.bench:<16}{result.elapsed_s:>8.1f} s  {result.error or f'{len(result.paths)} result files'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Append-only result files written point by point during a sweep.
+
+A result file starts with a JSON header holding the column names, their
+dtypes and the run metadata (what used to go into the ``.meta.csv`` side
+file). Fixed-width records follow, one per measured point, so every
+``append`` is a single write of a reused buffer and memory stays flat however
+long the run is::
+
+    with ResultWriter(path, ["load_currents", "load_measured_voltages"], metadata) as results:
+        for current in currents:
+            ...
+            results.append(load_currents=current, load_measured_voltages=voltage)
+
+    results = load_results(path)
+    results["load_measured_voltages"]  # memory mapped, no copy
+    results.metadata["DUT"]
+
+The row count is derived from the file size, so after a crash everything up
+to the last complete record is still readable, and ``append=True`` continues
+the file where it stopped.
+"""
+import json
+import os
+import pathlib
+import struct
+from typing import TYPE_CHECKING, Any, BinaryIO, Iterable, Mapping
+
+import numpy
+
+if TYPE_CHECKING:
+    import pandas
+
+RESULT_SUFFIX = ".labres"
+MAGIC = b"LABRES\x01\n"
+ALIGNMENT = 64
+MIN_HEADER_SIZE = 4096
+_LENGTH = struct.Struct("<I")
+
+
+class ResultWriter:
+    """Writes a result file row by row.
+
+    ``columns`` is a list of names (float64 columns) or a mapping of name to
+    dtype. The header is padded so ``update_metadata`` can rewrite it in place
+    later in the run.
+
+    With ``append=True`` an existing file with the same columns is continued
+    after its last complete row and ``metadata`` is merged into its own.
+    """
+
+    observer = None  # Gets point_written(writer) after every written point, e.g. the orchestrator's progress
+
+    def __init__(
+        self,
+        path: str | pathlib.Path,
+        columns: Iterable[str] | Mapping[str, Any],
+        metadata: Mapping[str, Any] | None = None,
+        append: bool = False,
+    ) -> None:
+        self.path = pathlib.Path(path)
+        if not isinstance(columns, Mapping):
+            columns = {name: numpy.float64 for name in columns}
+        self.dtype = numpy.dtype([(name, numpy.dtype(dtype)) for name, dtype in columns.items()])
+        self.metadata = dict(metadata or {})
+        self.rows = 0
+        self._row = numpy.zeros(1, self.dtype)
+
+        if append and self.path.exists():
+            self._file = open(self.path, "r+b")
+            self._header_size, header = _read_header(self._file, self.path)
+            if numpy.dtype([tuple(column) for column in header["columns"]]) != self.dtype:
+                self._file.close()
+                raise ValueError(f"Columns of {self.path} do not match {list(self.dtype.names)}")
+            self.metadata = {**header["metadata"], **self.metadata}
+            self.rows = (self.path.stat().st_size - self._header_size) // self.dtype.itemsize
+            # Drop a record that was only partly written when the previous run stopped.
+            self._file.truncate(self._header_size + self.rows * self.dtype.itemsize)
+            self._file.seek(0, os.SEEK_END)
+            self._write_header(_encode_header(self.dtype, self.metadata))
+            return
+
+        header = _encode_header(self.dtype, self.metadata)
+        self._header_size = _round_up(max(MIN_HEADER_SIZE, 2 * len(header)), ALIGNMENT)
+        self._file = open(self.path, "w+b")
+        self._write_header(header)
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def append(self, **values: float) -> None:
+        """Write one point. Every column needs a value."""
+        if len(values) != len(self.dtype.names):
+            missing = set(self.dtype.names) - set(values)
+            raise KeyError(f"Missing values for {sorted(missing)}" if missing else f"Unknown columns in {sorted(values)}")
+        for name, value in values.items():
+            self._row[name] = value
+        self._file.write(self._row.tobytes())
+        self._file.flush()
+        self.rows += 1
+        if self.observer is not None:
+            self.observer.point_written(self)
+
+    def extend(self, rows: numpy.ndarray) -> None:
+        """Write many points at once from a structured array with the file's dtype."""
+        if rows.dtype != self.dtype:
+            raise ValueError(f"Rows of dtype {rows.dtype} do not match {self.dtype}")
+        self._file.write(numpy.ascontiguousarray(rows).tobytes())
+        self._file.flush()
+        self.rows += len(rows)
+        if self.observer is not None:
+            self.observer.point_written(self)
+
+    def update_metadata(self, **metadata: Any) -> None:
+        self.metadata.update(metadata)
+        self._write_header(_encode_header(self.dtype, self.metadata))
+
+    def sync(self) -> None:
+        """Force the written rows to disk, not just to the OS."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def _write_header(self, header: bytes) -> None:
+        if len(header) > self._header_size - len(MAGIC) - _LENGTH.size:
+            raise ValueError(f"Metadata of {self.path} does not fit into its {self._header_size} byte header")
+        position = self._file.tell()
+        self._file.seek(0)
+        self._file.write(MAGIC + _LENGTH.pack(self._header_size) + header.ljust(self._header_size - len(MAGIC) - _LENGTH.size))
+        self._file.flush()
+        self._file.seek(max(position, self._header_size))
+
+
+class ResultFile:
+    """A result file loaded with its rows memory mapped read-only."""
+
+    def __init__(self, path: pathlib.Path, metadata: dict[str, Any], data: numpy.ndarray) -> None:
+        self.path = path
+        self.metadata = metadata
+        self.data = data
+
+    @property
+    def columns(self) -> tuple[str, ...]:
+        return self.data.dtype.names
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, column: str) -> numpy.ndarray:
+        return self.data[column]
+
+    def to_dataframe(self) -> "pandas.DataFrame":
+        import pandas
+
+        return pandas.DataFrame({name: self.data[name] for name in self.columns})
+
+
+def load_results(path: str | pathlib.Path) -> ResultFile:
+    path = pathlib.Path(path)
+    with open(path, "rb") as file:
+        header_size, header = _read_header(file, path)
+
+    dtype = numpy.dtype([(name, dtype) for name, dtype in header["columns"]])
+    rows = (path.stat().st_size - header_size) // dtype.itemsize
+    if rows > 0:
+        data = numpy.memmap(path, dtype=dtype, mode="r", offset=header_size, shape=(rows,))
+    else:
+        data = numpy.empty(0, dtype)
+    return ResultFile(path, header["metadata"], data)
+
+
+def tag_results(path: str | pathlib.Path, **metadata: Any) -> None:
+    """Add ``metadata`` to the header of an existing result file."""
+    with open(path, "rb") as file:
+        _, header = _read_header(file, pathlib.Path(path))
+    with ResultWriter(path, {name: dtype for name, dtype in header["columns"]}, metadata, append=True):
+        pass
+
+
+def _read_header(file: BinaryIO, path: pathlib.Path) -> tuple[int, dict[str, Any]]:
+    file.seek(0)
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{path} is not a result file")
+    (header_size,) = _LENGTH.unpack(file.read(_LENGTH.size))
+    return header_size, json.loads(file.read(header_size - len(MAGIC) - _LENGTH.size))
+
+
+def _encode_header(dtype: numpy.dtype, metadata: Mapping[str, Any]) -> bytes:
+    columns = [[name, dtype.fields[name][0].str] for name in dtype.names]
+    return json.dumps({"columns": columns, "metadata": metadata}, default=str).encode()
+
+
+def _round_up(value: int, multiple: int) -> int:
+    return -(-value // multiple) * multiple
@@ -0,0 +1,220 @@
+"""Output ripple and noise of the DUT, measured with the scope at every point of a sweep.
+
+A ``RippleMeter`` triggers a single acquisition on one scope channel and
+reduces it to scalar metrics: peak-to-peak and RMS ripple, the switching
+frequency and the noise that is left once the switching harmonics are taken
+out of the spectrum::
+
+    ripple = RippleMeter(scope, channel=1)
+    await ripple.setup()
+    metrics = await ripple.measure()  # after every setpoint change
+    await ripple.restore()
+
+The scope's own parameter measurements (``PAVA?``) are preferred, all of them
+read in one batched round trip. The waveform is only downloaded for the
+spectral noise, or when the scope could not measure a parameter, and is
+analyzed with an FFT in a worker thread, so the event loop keeps serving
+the other instruments meanwhile. The metrics are in the order of
+``COLUMNS``, ready for ``ResultWriter.append``.
+
+``setup`` makes the channel its own trigger source, at the centre of the
+screen unless a ``trigger_level`` is given. Where the ripple does not reach
+the level, e.g. without load or in pulse skipping, the trigger is forced
+after ``trigger_wait_s``. A point whose trace could not be acquired gets NaN
+metrics instead of stopping the sweep.
+"""
+import asyncio
+import logging
+import math
+import time
+from typing import NamedTuple
+
+import numpy
+
+from lab.instruments.async_scpi_instrument import AsyncSCPIInstrument
+from lab.instruments.siglent_sds_1104_x import ChannelCommand, Siglent1104X, WaveformSettings
+
+NOISE_BANDWIDTH_HZ = 20e6  # The usual bandwidth limit of ripple and noise specifications
+WAVEFORM_POINTS = 1 << 16
+HARMONIC_BINS = 3  # Bins on either side of a switching harmonic that belong to it, a Hann window leaks into 2
+LINE_THRESHOLD = 100.0  # Power of a switching line over the median of the spectrum, 20 dB
+COLUMNS = ["ripple_peak_to_peak_voltages", "ripple_rms_voltages", "switching_frequencies", "noise_rms_voltages"]
+NOT_MEASURED = (math.nan, math.nan, math.nan, math.nan)
+
+
+class RippleMetrics(NamedTuple):
+    peak_to_peak: float  # V
+    rms: float  # V, AC part only
+    switching_frequency: float  # Hz
+    noise_rms: float  # V, in band without the switching harmonics
+
+    def columns(self) -> dict[str, float]:
+        return dict(zip(COLUMNS, self))
+
+
+def analyze_waveform(
+    volts: numpy.ndarray,
+    sample_rate: float,
+    bandwidth_hz: float = NOISE_BANDWIDTH_HZ,
+    harmonic_bins: int = HARMONIC_BINS,
+) -> RippleMetrics:
+    """Ripple metrics of a captured trace.
+
+    The switching frequency is the strongest line of the Hann windowed
+    spectrum, refined between bins by fitting a parabola to the log power,
+    and NaN if no line stands out of the noise by ``LINE_THRESHOLD``. The
+    noise is the density of the bins up to ``bandwidth_hz`` that are not next
+    to DC or a harmonic of it, integrated over that bandwidth.
+    """
+    volts = numpy.asarray(volts, dtype=float)
+    if volts.size < 8:
+        return RippleMetrics(*NOT_MEASURED)
+    ac = volts - volts.mean()
+    window = numpy.hanning(ac.size)
+    power = numpy.abs(numpy.fft.rfft(ac * window)) ** 2
+    frequencies = numpy.fft.rfftfreq(ac.size, 1 / sample_rate)
+    bin_width = sample_rate / ac.size
+    density = 2 * power / (sample_rate * numpy.sum(window**2))  # One-sided, V²/Hz
+
+    first = harmonic_bins + 1  # Skip the leakage of DC
+    peak = first + int(numpy.argmax(power[first:]))
+    switching_frequency = math.nan
+    if power[peak] > LINE_THRESHOLD * numpy.median(power[first:]):
+        switching_frequency = frequencies[peak]
+        if peak < power.size - 1 and numpy.all(power[peak - 1 : peak + 2] > 0):
+            before, at, after = numpy.log(power[peak - 1 : peak + 2])
+            switching_frequency += 0.5 * (before - after) / (before - 2 * at + after) * bin_width
+
+    bandwidth_hz = min(bandwidth_hz, sample_rate / 2)
+    if math.isnan(switching_frequency):
+        distance = frequencies
+    else:
+        distance = numpy.abs(frequencies - numpy.round(frequencies / switching_frequency) * switching_frequency)
+    noise_bins = (frequencies <= bandwidth_hz) & (distance > harmonic_bins * bin_width)
+    # The median ignores leftover spurs, the power of a noise bin is exponentially distributed with median ln 2 times its mean.
+    noise_density = numpy.median(density[noise_bins]) / math.log(2) if noise_bins.any() else math.nan
+    noise_rms = math.sqrt(noise_density * bandwidth_hz)
+    return RippleMetrics(float(numpy.ptp(volts)), float(ac.std()), float(switching_frequency), noise_rms)
+
+
+class RippleMeter:
+    """Ripple and noise of one channel of an ``AsyncSCPIInstrument`` wrapping a ``Siglent1104X``.
+
+    With ``spectrum=False`` the waveform is not downloaded as long as the scope
+    measures all parameters, which saves the transfer but leaves the noise NaN.
+    """
+
+    PARAMETERS = ("PKPK", "STDEV", "FREQ")  # The standard deviation is the AC RMS, even on a DC coupled channel
+
+    def __init__(
+        self,
+        scope: AsyncSCPIInstrument,
+        channel: int = 1,
+        spectrum: bool = True,
+        points: int = WAVEFORM_POINTS,
+        bandwidth_hz: float = NOISE_BANDWIDTH_HZ,
+        trigger_level: float | None = None,
+        trigger_wait_s: float = Siglent1104X.TRIGGER_WAIT_S,
+        capture_timeout_s: float = Siglent1104X.CAPTURE_TIMEOUT_S,
+    ) -> None:
+        self.scope = scope
+        self.channel = channel
+        self.spectrum = spectrum
+        self.points = points
+        self.bandwidth_hz = bandwidth_hz
+        self.trigger_level = trigger_level
+        self.trigger_wait_s = trigger_wait_s
+        self.capture_timeout_s = capture_timeout_s
+        self.settings: WaveformSettings | None = None
+        self.waveforms_read = 0
+        self.forced_triggers = 0
+        self.failed_captures = 0
+        self._previous_trigger: tuple[str, str, float] | None = None  # Mode, select and level before setup
+        self._logger = logging.getLogger(__name__)
+
+    async def setup(self) -> WaveformSettings:
+        """Trigger single acquisitions on the channel and read its scaling once for the whole sweep."""
+        async with self.scope.batch() as batch:
+            trigger_mode = batch.get_trigger_mode()
+            trigger_select = batch.get_trigger_select()
+            trigger_level = batch.get_trigger_level(self.channel)
+            vdiv = batch.get_channel_vdiv(self.channel)
+            offset = batch.get_channel_offset(self.channel)
+            tdiv = batch.get_tdiv()
+            sample_rate = batch.get_sample_rate()
+            points = batch.get_acquired_points(self.channel)
+        self._previous_trigger = (trigger_mode.result(), trigger_select.result(), trigger_level.result())
+        self.settings = WaveformSettings(vdiv.result(), offset.result(), tdiv.result(), sample_rate.result(), points.result())
+        async with self.scope.batch() as batch:
+            batch.set_trigger_mode("SINGLE")
+            batch.set_trigger_source(self.channel)
+            # The centre of the screen shows -offset.
+            batch.set_trigger_level(self.channel, -self.settings.offset if self.trigger_level is None else self.trigger_level)
+            batch.set_waveform_setup(self.points)
+        return self.settings
+
+    async def restore(self) -> None:
+        """Put the trigger of the scope back to what it was before ``setup``."""
+        if self._previous_trigger is not None:
+            mode, select, level = self._previous_trigger
+            async with self.scope.batch() as batch:
+                batch.set_trigger_select(select)
+                batch.set_trigger_level(self.channel, level)
+                batch.set_trigger_mode(mode)
+
+    async def measure(self) -> RippleMetrics:
+        """Metrics of a new trace, NaN if the scope did not acquire one."""
+        if self.settings is None:
+            await self.setup()
+        try:
+            if not await self.capture():
+                self.failed_captures += 1
+                self._logger.warning("No trace on channel %d within %.1f s", self.channel, self.capture_timeout_s)
+                return RippleMetrics(*NOT_MEASURED)
+            return await self._measure_trace()
+        except TimeoutError:
+            self.failed_captures += 1
+            self._logger.warning("Scope timed out measuring the ripple of channel %d", self.channel, exc_info=True)
+            return RippleMetrics(*NOT_MEASURED)
+
+    async def capture(self) -> bool:
+        """Arm a single acquisition and wait until the scope has stopped, False if it did not acquire a trace.
+
+        The trigger is forced if the trace does not cross the level within ``trigger_wait_s``.
+        """
+        await self.scope.run()
+        if await self._wait_until_stopped(self.trigger_wait_s):
+            return True
+        self.forced_triggers += 1
+        await self.scope.force_trigger()
+        return await self._wait_until_stopped(self.capture_timeout_s)
+
+    async def _measure_trace(self) -> RippleMetrics:
+        metrics = await self._measure_parameters()
+        if not self.spectrum and not any(math.isnan(value) for value in metrics[:-1]):
+            return metrics
+        data = await self.scope.query_block(ChannelCommand(self.channel, Siglent1104X.ChannelCommands.WAVEFORM), "DAT2")
+        self.waveforms_read += 1
+        analyzed = await asyncio.to_thread(self._analyze, data)
+        # Where the scope measured a parameter its value is kept, it saw the full record.
+        return RippleMetrics(*(value if not math.isnan(value) else fallback for value, fallback in zip(metrics, analyzed)))
+
+    async def _wait_until_stopped(self, timeout_s: float) -> bool:
+        deadline = time.monotonic() + timeout_s
+        sleep_time = Siglent1104X.FIRST_POLLING_SLEEP_TIME
+        while not await self.scope.is_stopped():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(sleep_time, remaining))
+            sleep_time = min(2 * sleep_time, Siglent1104X.POLLING_SLEEP_TIME)
+        return True
+
+    def _analyze(self, data: bytes) -> RippleMetrics:
+        _, volts = Siglent1104X.decode_waveform(data, self.settings)
+        return analyze_waveform(volts, self.settings.sample_rate, self.bandwidth_hz)
+
+    async def _measure_parameters(self) -> RippleMetrics:
+        async with self.scope.batch() as batch:
+            futures = [batch.get_parameter_value(self.channel, parameter) for parameter in self.PARAMETERS]
+        return RippleMetrics(*(future.result() for future in futures), math.nan)
@@ -0,0 +1,110 @@
+"""Adaptive settling detection for sweeps.
+
+Instead of sleeping a fixed time after every setpoint change, a reading (e.g.
+``load.measure_voltage``) is polled until the last ``window`` values lie within
+the tolerance band. If that never happens the wait ends after ``timeout_s``.
+
+Instruments repeat their last reading until they update it. With
+``require_change`` the window only starts with the first reading that
+differs from the one before the setpoint took effect, so stale values are
+never declared settled. A reading that is flat within the resolution of the
+meter, e.g. a well regulated output, then runs into the timeout, which is
+why it is opt-in for readings known to lag behind the setpoint.
+"""
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+
+@dataclass
+class SettlingResult:
+    settled: bool
+    settling_time_s: float
+    value: float
+    samples: int
+
+
+class SettlingDetector:
+    """Declares a reading settled when its rolling window spans less than the tolerance.
+
+    The tolerance is ``max(absolute_tolerance, relative_tolerance * |mean|)``.
+    """
+
+    def __init__(
+        self,
+        window: int = 4,
+        absolute_tolerance: float = 0.002,
+        relative_tolerance: float = 0.0,
+        poll_interval_s: float = 0.02,
+        timeout_s: float = 2.0,
+        min_time_s: float = 0.0,
+        require_change: bool = False,
+    ) -> None:
+        assert window >= 2, "A window needs at least two readings"
+        self.window = window
+        self.absolute_tolerance = absolute_tolerance
+        self.relative_tolerance = relative_tolerance
+        self.poll_interval_s = poll_interval_s
+        self.timeout_s = timeout_s
+        self.min_time_s = min_time_s
+        self.require_change = require_change
+
+    def is_settled(self, values: deque[float]) -> bool:
+        if len(values) < self.window:
+            return False
+        mean = sum(values) / len(values)
+        tolerance = max(self.absolute_tolerance, self.relative_tolerance * abs(mean))
+        return max(values) - min(values) <= tolerance
+
+    def wait(self, read: Callable[[], float]) -> SettlingResult:
+        """Poll ``read`` until it settles or the timeout expires."""
+        values: deque[float] = deque(maxlen=self.window)
+        samples = 0
+        changed = False
+        start = time.perf_counter()
+        while True:
+            samples += 1
+            changed = self._append(values, read(), changed)
+            elapsed = time.perf_counter() - start
+            result = self._result(values, elapsed, samples)
+            if result is not None:
+                return result
+            time.sleep(self.poll_interval_s)
+
+    async def wait_async(self, read: Callable[[], Awaitable[float]]) -> SettlingResult:
+        """``wait`` for coroutine readings, e.g. of an ``AsyncSCPIInstrument``."""
+        values: deque[float] = deque(maxlen=self.window)
+        samples = 0
+        changed = False
+        start = time.perf_counter()
+        while True:
+            samples += 1
+            changed = self._append(values, await read(), changed)
+            elapsed = time.perf_counter() - start
+            result = self._result(values, elapsed, samples)
+            if result is not None:
+                return result
+            await asyncio.sleep(self.poll_interval_s)
+
+    def _append(self, values: deque[float], value: float, changed: bool) -> bool:
+        """Add ``value`` to the window, returns whether a reading has changed since the first one."""
+        if changed or not self.require_change:
+            values.append(value)
+            return True
+        if not values:
+            values.append(value)
+            return False
+        if value == values[0]:
+            return False  # Still the reading from before the setpoint change
+        values.clear()
+        values.append(value)
+        return True
+
+    def _result(self, values: deque[float], elapsed: float, samples: int) -> SettlingResult | None:
+        if elapsed >= self.min_time_s and self.is_settled(values):
+            return SettlingResult(True, elapsed, values[-1], samples)
+        if elapsed >= self.timeout_s:
+            return SettlingResult(False, elapsed, values[-1], samples)
+        return None
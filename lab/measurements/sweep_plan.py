@@ -0,0 +1,212 @@
+"""Declarative multi-axis sweeps with settle-aware point ordering.
+
+A sweep is described by its axes, each bound to a setter, its readouts, bound
+to measure methods, and how to wait for the DUT to settle after a setpoint
+change. The planner then walks the full grid in an order that keeps setpoint
+jumps small::
+
+    plan = SweepPlan(
+        axes=[
+            Axis("line_voltages", range(10, 26), psu.set_voltage, settle_s=0.05, settle_s_per_unit=0.02),
+            Axis("load_currents", numpy.linspace(0, 2, 41), load.set_current, settle_s=0.01, settle_s_per_unit=0.1),
+        ],
+        readouts=[Readout("load_measured_voltages", load.measure_voltage), Readout("temperatures", dmm.fetch)],
+        settle=Settle(SettlingDetector(), load.measure_voltage),
+    )
+    print(plan.predict())  # dry run, no instrument is touched
+    await plan.run(ResultWriter(path, plan.columns(), meta))
+
+In ``serpentine`` order every other pass of an inner axis runs backwards,
+the reflected mixed-radix Gray code of the grid: consecutive points differ
+in one axis by one step, so no point pays for a jump back to the start of an
+axis. The nesting of the axes is chosen so the one that is slowest to
+settle changes least often. The settling model of each axis, a fixed time
+per change plus a time per unit of the jump, is only used for that choice
+and for ``predict``; during the run the ``Settle`` policy decides.
+"""
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable, Sequence
+
+from lab.measurements.results import ResultWriter
+from lab.measurements.settling import SettlingDetector
+
+ORDERS = ("naive", "serpentine")
+SETTLING_TIME_COLUMN = "settling_times"
+
+
+@dataclass
+class Axis:
+    name: str
+    values: Sequence[float]
+    setter: Callable[[float], Awaitable[None]] | None = None
+    settle_s: float = 0.0  # Predicted settling time after any change of this axis
+    settle_s_per_unit: float = 0.0  # Predicted additional settling time per unit of the jump
+
+    def __post_init__(self) -> None:
+        self.values = [float(value) for value in self.values]
+
+    def predicted_settling_s(self, jump: float) -> float:
+        return self.settle_s + self.settle_s_per_unit * abs(jump)
+
+
+@dataclass
+class Readout:
+    name: str
+    read: Callable[[], Awaitable[float]] | None = None
+    predicted_s: float = 0.005  # One round trip, for ``predict``
+
+
+@dataclass
+class Settle:
+    """Wait for ``reading`` to settle with ``detector``; without a detector wait the predicted time."""
+
+    detector: SettlingDetector | None = None
+    reading: Callable[[], Awaitable[float]] | None = None
+
+    @property
+    def minimum_s(self) -> float:
+        """A detector needs a full window of readings however fast the DUT settles."""
+        if self.detector is None:
+            return 0.0
+        readings = self.detector.window + self.detector.require_change  # Plus the stale first reading with require_change
+        return max(self.detector.min_time_s, (readings - 1) * self.detector.poll_interval_s)
+
+
+@dataclass
+class SweepEstimate:
+    points: int
+    setpoint_changes: int
+    settling_s: float
+    measuring_s: float
+    order: str
+    nesting: list[str] = field(default_factory=list)
+
+    @property
+    def total_s(self) -> float:
+        return self.settling_s + self.measuring_s
+
+    def __str__(self) -> str:
+        return (
+            f"{self.points} points, {self.setpoint_changes} setpoint changes in {self.order} order over "
+            f"{' > '.join(self.nesting)}: {self.total_s:.1f} s ({self.settling_s:.1f} s settling)"
+        )
+
+
+class SweepPlan:
+    """Full grid over ``axes``; ``order`` is "serpentine", "naive" or None for the faster of both."""
+
+    def __init__(
+        self,
+        axes: Sequence[Axis],
+        readouts: Sequence[Readout],
+        settle: Settle | None = None,
+        order: str | None = None,
+        nesting: Sequence[str] | None = None,
+    ) -> None:
+        if order is not None and order not in ORDERS:
+            raise ValueError(f"Unknown order {order!r}, use one of {ORDERS}")
+        self.axes = {axis.name: axis for axis in axes}
+        self.readouts = list(readouts)
+        self.settle = settle or Settle()
+        self.order, self.nesting = self._choose(order, list(nesting) if nesting else None)
+
+    def columns(self) -> list[str]:
+        """Result columns in the order of the axes given, then the readouts."""
+        return [*self.axes, *(readout.name for readout in self.readouts), SETTLING_TIME_COLUMN]
+
+    def points(self) -> list[dict[str, float]]:
+        return list(_ordered_points([self.axes[name] for name in self.nesting], self.order))
+
+    def predict(self) -> SweepEstimate:
+        """Dry run: the predicted run time from the settling model, without touching the bench."""
+        return self._estimate(self.order, self.nesting)
+
+    async def run(self, writer: ResultWriter | None = None, skip: int = 0) -> list[dict[str, float]]:
+        """Measure every point, appending rows to ``writer``; ``skip`` continues after that many points.
+
+        The first point measured sets every axis, a resumed run cannot rely on
+        the instruments still holding the setpoints of the skipped points.
+        """
+        rows = []
+        previous: dict[str, float] = {}
+        for index, point in enumerate(self.points()):
+            if index < skip:
+                previous = point
+                continue
+            if index == skip:
+                changed = list(self.nesting)
+            else:
+                changed = [name for name in self.nesting if previous.get(name) != point[name]]
+            for name in changed:
+                if self.axes[name].setter is not None:
+                    await self.axes[name].setter(point[name])
+            settling_time = await self._settle(changed, previous, point)
+            values = await asyncio.gather(*[readout.read() for readout in self.readouts])
+            row = {name: point[name] for name in self.axes}
+            row.update(zip((readout.name for readout in self.readouts), values))
+            row[SETTLING_TIME_COLUMN] = settling_time
+            if writer is not None:
+                writer.append(**row)
+            rows.append(row)
+            previous = point
+        return rows
+
+    async def _settle(self, changed: list[str], previous: dict[str, float], point: dict[str, float]) -> float:
+        if not changed:
+            return 0.0
+        if self.settle.detector is not None and self.settle.reading is not None:
+            return (await self.settle.detector.wait_async(self.settle.reading)).settling_time_s
+        start = time.perf_counter()
+        await asyncio.sleep(self._predicted_settling_s(previous, point))
+        return time.perf_counter() - start
+
+    def _predicted_settling_s(self, previous: dict[str, float], point: dict[str, float]) -> float:
+        """The DUT settles from all changes at once, so the slowest axis counts."""
+        return max(
+            (
+                self.axes[name].predicted_settling_s(point[name] - previous.get(name, point[name]))
+                for name in point
+                if previous.get(name) != point[name]
+            ),
+            default=0.0,
+        )
+
+    def _estimate(self, order: str, nesting: list[str]) -> SweepEstimate:
+        previous: dict[str, float] = {}
+        points = changes = 0
+        settling_s = 0.0
+        for point in _ordered_points([self.axes[name] for name in nesting], order):
+            settling_s += max(self._predicted_settling_s(previous, point), self.settle.minimum_s)
+            changes += sum(previous.get(name) != value for name, value in point.items())
+            points += 1
+            previous = point
+        # Readouts of one instrument take turns, so count them one after the other.
+        measuring_s = points * sum(readout.predicted_s for readout in self.readouts)
+        return SweepEstimate(points, changes, settling_s, measuring_s, order, nesting)
+
+    def _choose(self, order: str | None, nesting: list[str] | None) -> tuple[str, list[str]]:
+        """The fastest predicted combination of order and axis nesting, outermost axis first."""
+        candidates = [
+            self._estimate(candidate_order, list(candidate_nesting))
+            for candidate_order in ([order] if order else ORDERS)
+            for candidate_nesting in ([nesting] if nesting else itertools.permutations(self.axes))
+        ]
+        best = min(candidates, key=lambda estimate: estimate.total_s)
+        return best.order, best.nesting
+
+
+def _ordered_points(axes: list[Axis], order: str) -> Iterable[dict[str, float]]:
+    """Grid points with the first axis outermost."""
+    if not axes:
+        yield {}
+        return
+    outer, inner = axes[0], axes[1:]
+    reverse = False
+    for value in outer.values:
+        inner_points = list(_ordered_points(inner, order))
+        for point in reversed(inner_points) if reverse else inner_points:
+            yield {outer.name: value, **point}
+        reverse = order == "serpentine" and not reverse
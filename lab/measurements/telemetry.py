@@ -0,0 +1,143 @@
+"""Continuous telemetry sampled in the background while a sweep runs.
+
+A ``TelemetrySampler`` reads a set of channels (e.g. ``psu.measure_current``,
+``dmm.fetch``) at a fixed interval in its own asyncio task. The channels are
+driver methods of ``AsyncSCPIInstrument``, whose per-connection lock keeps
+the sampler's queries and the sweep's in order on a shared connection, so
+neither needs to know about the other::
+
+    telemetry = ResultWriter(path, TelemetrySampler.columns(channels), meta)
+    async with TelemetrySampler(telemetry, {"psu_currents": psu.measure_current, "temperatures": dmm.fetch}, 0.05):
+        ...  # the sweep
+
+Samples go into a ring buffer that is written to the result file every
+``flush_every`` samples and when the sampler stops. If writing falls behind
+by more than the buffer capacity the oldest samples are dropped and counted.
+
+A channel whose read fails is logged and recorded as NaN for that sample,
+the other channels and the sampling go on. Should the sampler itself fail,
+e.g. writing the result file, ``stop`` logs the error and keeps it in
+``error`` instead of raising, so it is safe to call while cleaning up.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Mapping
+
+import numpy
+
+from lab.measurements.results import ResultWriter
+
+TIMESTAMP_COLUMN = "timestamps"
+EXPECTED_ERRORS = (ConnectionError, TimeoutError, ValueError)  # Logged without a traceback
+
+
+class TelemetrySampler:
+    CAPACITY = 4096
+
+    def __init__(
+        self,
+        writer: ResultWriter,
+        channels: Mapping[str, Callable[[], Awaitable[float]]],
+        interval_s: float = 0.1,
+        capacity: int = CAPACITY,
+        flush_every: int | None = None,
+    ) -> None:
+        if list(writer.dtype.names) != self.columns(channels):
+            raise ValueError(f"{writer.path} needs the columns {self.columns(channels)}")
+        self.writer = writer
+        self.channels = dict(channels)
+        self.interval_s = interval_s
+        self.flush_every = flush_every or max(1, capacity // 4)
+        self.dropped = 0
+        self.failed_reads = 0
+        self.error: Exception | None = None  # What stopped the sampler, if anything
+        self._buffer = numpy.zeros(capacity, writer.dtype)
+        self._written = 0  # Samples taken so far, the buffer index is this modulo the capacity
+        self._flushed = 0
+        self._task: asyncio.Task | None = None
+        self._logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def columns(channels: Mapping[str, object]) -> list[str]:
+        return [TIMESTAMP_COLUMN, *channels]
+
+    async def __aenter__(self) -> "TelemetrySampler":
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.stop()
+
+    @property
+    def samples(self) -> int:
+        return self._written
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop sampling and write the remaining samples, errors end up in ``error``."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            except Exception as error:
+                self._fail(error)
+            self._task = None
+        try:
+            self.flush()
+        except Exception as error:
+            self._fail(error)
+
+    def latest(self, count: int) -> numpy.ndarray:
+        """The last ``count`` samples still in the buffer, oldest first."""
+        count = min(count, self._written, len(self._buffer))
+        return self._buffer[numpy.arange(self._written - count, self._written) % len(self._buffer)]
+
+    def flush(self) -> None:
+        capacity = len(self._buffer)
+        if self._written - self._flushed > capacity:
+            self.dropped += self._written - self._flushed - capacity
+            self._flushed = self._written - capacity
+        start, stop = self._flushed % capacity, self._written % capacity
+        if self._written == self._flushed:
+            return
+        if start < stop:
+            self.writer.extend(self._buffer[start:stop])
+        else:
+            self.writer.extend(self._buffer[start:])
+            self.writer.extend(self._buffer[:stop])
+        self._flushed = self._written
+
+    async def _run(self) -> None:
+        names = list(self.channels)
+        next_sample = time.monotonic()
+        while True:
+            timestamp = time.time()
+            values = await asyncio.gather(*[read() for read in self.channels.values()], return_exceptions=True)
+            row = self._buffer[self._written % len(self._buffer)]
+            row[TIMESTAMP_COLUMN] = timestamp
+            for name, value in zip(names, values):
+                if isinstance(value, BaseException):
+                    self.failed_reads += 1
+                    exc_info = None if isinstance(value, EXPECTED_ERRORS) else value
+                    self._logger.warning("Telemetry read of %s failed: %r", name, value, exc_info=exc_info)
+                    value = numpy.nan
+                row[name] = value
+            self._written += 1
+            if self._written - self._flushed >= self.flush_every:
+                self.flush()
+
+            # Fixed rate; ticks missed because a sample took too long are skipped.
+            next_sample += self.interval_s
+            now = time.monotonic()
+            if next_sample < now:
+                next_sample += (now - next_sample) // self.interval_s * self.interval_s + self.interval_s
+            await asyncio.sleep(next_sample - now)
+
+    def _fail(self, error: Exception) -> None:
+        self.error = self.error or error
+        self._logger.error("Telemetry sampler failed", exc_info=error)
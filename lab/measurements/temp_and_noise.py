@@ -6,136 +6,292 @@
 # pylint: disable=broad-exception-raised
 # pylint: disable=unused-variable
 
+import asyncio
 import datetime
 import logging
 import pathlib
-import socket
-import time
+from typing import TYPE_CHECKING
 
-import pandas
-
-from lab.instruments.scpi_instrument import SCPIInstrument
+from lab.instruments.async_scpi_instrument import AsyncSCPIInstrument
 from lab.instruments.rigol_dl_3021_a import RigolDL3021A_247 as Load
 from lab.instruments.rohde_und_schwarz_hmc8012 import RohdeUndSchwarzHMC8012_146 as Multimeter
+from lab.instruments.session import SessionManager, default_session
 from lab.instruments.siglent_sds_1104_x import Siglent1104X_107 as Oscilloscope
 from lab.instruments.siglent_spd_1305_x import Siglent1305X_249 as PowerSupply
+from lab.instruments.tracing import SCPITracer, span
+from lab.measurements.adaptive import AdaptiveGrid, UniformGrid, efficiency_percent
+from lab.measurements.checkpoint import SweepCheckpoint
+from lab.measurements.results import RESULT_SUFFIX, ResultWriter, load_results
+from lab.measurements.ripple import COLUMNS as RIPPLE_COLUMNS
+from lab.measurements.ripple import NOISE_BANDWIDTH_HZ, RippleMeter
+from lab.measurements.settling import SettlingDetector
+from lab.measurements.telemetry import TelemetrySampler
+
+if TYPE_CHECKING:
+    import pandas
+
+RESULTS_PATH = pathlib.Path(__file__).parent
+CHECKPOINT_FILE_NAME = "temp_and_noise.checkpoint.json"
+ADAPTIVE_OUTPUT_VOLTAGE_TOLERANCE = 0.005
+ADAPTIVE_EFFICIENCY_TOLERANCE = 0.5
+RIPPLE_CHANNEL = 1  # Scope channel probing the DUT output
 
 
-def run() -> pandas.DataFrame:
+def run(
+    results_path: pathlib.Path = RESULTS_PATH,
+    addresses: dict[type, tuple[str, int]] | None = None,
+    tracer: SCPITracer | None = None,
+    resume: bool = False,
+    adaptive: bool = False,
+    telemetry_interval_s: float | None = None,
+    session: SessionManager | None = None,
+) -> "pandas.DataFrame":
     """Run a load regulation measurement."""
+    return asyncio.run(run_async(results_path, addresses, tracer, resume, adaptive, telemetry_interval_s, session))
+
+
+async def run_async(
+    results_path: pathlib.Path = RESULTS_PATH,
+    addresses: dict[type, tuple[str, int]] | None = None,
+    tracer: SCPITracer | None = None,
+    resume: bool = False,
+    adaptive: bool = False,
+    telemetry_interval_s: float | None = None,
+    session: SessionManager | None = None,
+) -> "pandas.DataFrame":
+    """Run a load regulation measurement with all instruments queried concurrently.
+
+    ``addresses`` overrides the LAN address of instrument classes, e.g. with
+    ``SimulatedBench.addresses`` to run against the simulator. Otherwise the
+    addresses and timeouts come from ``session`` (configured or discovered),
+    by default the process wide ``default_session``. With a
+    ``tracer`` every SCPI exchange and the phases of the sweep are recorded.
 
-    load_connection = create_socket_and_connect(Load.IP_ADDRESS, Load.PORT)
-    psu_connection = create_socket_and_connect(PowerSupply.IP_ADDRESS, PowerSupply.PORT)
-    scope_connection = create_socket_and_connect(Oscilloscope.IP_ADDRESS, Oscilloscope.PORT)
-    dmm_connection = create_socket_and_connect(Multimeter.IP_ADDRESS, Multimeter.PORT)
-    connections: list[socket.socket] = [
-        load_connection,
-        psu_connection,
-        scope_connection,
-        dmm_connection,
-    ]
-
-    load = Load(load_connection)
-    psu = PowerSupply(psu_connection)
-    scope = Oscilloscope(scope_connection)
-    dmm = Multimeter(dmm_connection)
-    instruments: list[SCPIInstrument] = [load, psu, scope, dmm]
+    Progress is checkpointed after every point. With ``resume`` an interrupted
+    run in ``results_path`` is continued: the PSU and load get their last
+    setpoints back and the sweep goes on with the next unmeasured point,
+    appending to the same result files.
 
+    With ``telemetry_interval_s`` the PSU current, the load voltage and the
+    temperature are also sampled continuously at that interval, in between
+    the sweep's own queries, into a ``telemetry`` result file.
+
+    At every load point the scope takes a single acquisition of the output,
+    and its ripple and noise metrics (see ``ripple``) are stored with the
+    PSU and load readings.
+    """
     logger = logging.getLogger(__name__)
+    checkpoint = SweepCheckpoint(results_path / CHECKPOINT_FILE_NAME)
+    state = checkpoint.load() if resume else None
+    if resume and state is None:
+        logger.info("Nothing to resume in %s, starting a new run", results_path)
+
+    addresses = addresses or {}
+    session = session or default_session()
+    instruments: list[AsyncSCPIInstrument] = await asyncio.gather(
+        *[session.open_async(driver, addresses.get(driver)) for driver in (Load, PowerSupply, Oscilloscope, Multimeter)]
+    )
+    load, psu, scope, dmm = instruments
+    for instrument in instruments:
+        instrument.tracer = tracer
 
-    load_sweep_df = pandas.DataFrame(columns=["results"])
-    line_sweep_df = pandas.DataFrame(columns=["results"])
-    meta_df = pandas.DataFrame(columns=["meta"])
+    meta = {}
 
     load_currents = [x / 100.0 for x in range(0, 201, 1)]
     line_voltages = list(range(10,26,1))
-    results_path = pathlib.Path(__file__).parent
-
-    meta_df.loc["Script"] = pathlib.Path(__file__).name
-    meta_df.loc["Timestamp"] = datetime.datetime.now().strftime("%d_%m_%Y_%H_%M_%S")
-    meta_df.loc["Instruments"] = " ".join([instrument.get_id_string() for instrument in instruments])
-    meta_df.loc["Version"] = "1.0.0"
-    meta_df.loc["DUT"] = "LM2596_2 protoboard with 1N5817 diode and 330uH not shielded inductor plus 33uF output cap"
-    meta_df.loc["Set input voltage"] = 23
-    meta_df.loc["Set output voltage"] = 12
-    meta_df.loc["Set input current"] = 5
-    meta_df.loc["PSU sense"] = "2W"
-    meta_df.loc["File name prefix"] = "lr.csv"
-    meta_df.loc["Load settling time"] = 2
-    meta_df.loc["load currents"] = " ".join([str(current) for current in load_currents])
-
-    psu_measured_voltages = []
-    psu_measured_currents = []
-    psu_measured_powers = []
-    load_measured_voltages = []
-    load_measured_currents = []
-    load_measured_powers = []
-    temperatures = []
-    load_measured_line_voltages = []
-    psu_measured_line_voltages = []
+
+    meta["Script"] = pathlib.Path(__file__).name
+    meta["Timestamp"] = state["timestamp"] if state else datetime.datetime.now().strftime("%d_%m_%Y_%H_%M_%S")
+    meta["Instruments"] = " ".join(await asyncio.gather(*[instrument.get_id_string() for instrument in instruments]))
+    meta["Version"] = "1.0.0"
+    meta["DUT"] = "LM2596_2 protoboard with 1N5817 diode and 330uH not shielded inductor plus 33uF output cap"
+    meta["Set input voltage"] = 23
+    meta["Set output voltage"] = 12
+    meta["Set input current"] = 5
+    meta["PSU sense"] = "2W"
+    meta["File name prefix"] = "lr"
+    meta["Settling timeout"] = 2
+    meta["Settling tolerance"] = 0.002
+    meta["load currents"] = " ".join([str(current) for current in load_currents])
+    meta["Sweep"] = "adaptive" if adaptive else "uniform"
+    meta["Ripple channel"] = RIPPLE_CHANNEL
+    meta["Noise bandwidth"] = NOISE_BANDWIDTH_HZ
+    if telemetry_interval_s is not None:
+        meta["Telemetry interval"] = telemetry_interval_s
+
+    settling_detector = SettlingDetector(
+        absolute_tolerance=meta["Settling tolerance"], timeout_s=meta["Settling timeout"]
+    )
+
+    file_name = meta["Timestamp"] + "_{}_" + meta["File name prefix"] + RESULT_SUFFIX
+    line_sweep = ResultWriter(
+        results_path / file_name.format("line_sweep"),
+        ["line_voltages", "psu_measured_line_voltages", "load_measured_line_voltages", "settling_times"],
+        meta,
+        append=state is not None,
+    )
+    load_sweep = ResultWriter(
+        results_path / file_name.format("load_sweep"),
+        ["load_currents", "psu_measured_voltages", "psu_measured_currents", "psu_measured_powers", "load_measured_voltages", "load_measured_currents", "load_measured_powers", "temperatures", *RIPPLE_COLUMNS, "settling_times"],
+        meta,
+        append=state is not None,
+    )
+    setpoints = state["setpoints"] if state else {}
+    ripple = RippleMeter(scope, RIPPLE_CHANNEL)
+    telemetry_channels = {
+        "psu_currents": psu.measure_current, "load_voltages": load.measure_voltage, "temperatures": dmm.fetch
+    }
+    telemetry = None
+    if telemetry_interval_s is not None:
+        telemetry = TelemetrySampler(
+            ResultWriter(
+                results_path / file_name.format("telemetry"),
+                TelemetrySampler.columns(telemetry_channels),
+                meta,
+                append=state is not None,
+            ),
+            telemetry_channels,
+            telemetry_interval_s,
+        )
+
+    if adaptive:
+        line_grid = AdaptiveGrid(
+            line_voltages[0], line_voltages[-1], resolution=0.1, tolerances=(ADAPTIVE_OUTPUT_VOLTAGE_TOLERANCE,),
+            initial_points=6, max_points=len(line_voltages),
+        )
+        load_grid = AdaptiveGrid(
+            load_currents[0], load_currents[-1], resolution=0.01,
+            tolerances=(ADAPTIVE_OUTPUT_VOLTAGE_TOLERANCE, ADAPTIVE_EFFICIENCY_TOLERANCE), max_points=60,
+        )
+    else:
+        line_grid, load_grid = UniformGrid(line_voltages), UniformGrid(load_currents)
+    # Points measured before an interruption are replayed, so both grids continue where they stopped.
+    for row in load_results(line_sweep.path).data if state else []:
+        line_grid.add(row["line_voltages"], (row["load_measured_line_voltages"],))
+    for row in load_results(load_sweep.path).data if state else []:
+        load_grid.add(row["load_currents"], load_metrics(row["load_measured_voltages"], row["psu_measured_powers"], row["load_measured_powers"]))
+
+    def save_checkpoint(**changed_setpoints) -> None:
+        setpoints.update(changed_setpoints)
+        checkpoint.save(
+            timestamp=meta["Timestamp"], line_points=line_sweep.rows, load_points=load_sweep.rows, setpoints=setpoints
+        )
 
     try:
-        for value in meta_df["meta"]:
+        for value in meta.values():
             logger.info(value)
 
-        psu.set_voltage(10)
-        psu.set_current(5)
-        psu.set_mode(meta_df["meta"]["PSU sense"])
-        psu.set_enable_output(True)
+        if state is None:
+            await psu.set_voltage(10)
+            await psu.set_current(5)
+            await psu.set_mode(meta["PSU sense"])
+            await psu.set_enable_output(True)
+            save_checkpoint(psu_voltage=10, psu_current=5, psu_mode=meta["PSU sense"], psu_output=True)
+        else:
+            logger.info("Resuming after %d line and %d load points", line_sweep.rows, load_sweep.rows)
+            await restore_setpoints(setpoints, psu, load)
+        if telemetry is not None:
+            telemetry.start()
 
         # Line sweep
-        for line_voltage in line_voltages:
-            psu.set_voltage(line_voltage)
-            time.sleep(2)
-            load_measured_line_voltages.append(load.measure_voltage())
-            psu_measured_line_voltages.append(psu.measure_voltage())
+        while (line_voltage := line_grid.next_point()) is not None:
+            await psu.set_voltage(line_voltage)
+            with span(tracer, "line settling"):
+                settling_time = await settle(settling_detector, load, logger)
+            load_measured_line_voltage, psu_measured_line_voltage = await asyncio.gather(
+                load.measure_voltage(), psu.measure_voltage()
+            )
+            line_sweep.append(
+                line_voltages=line_voltage,
+                psu_measured_line_voltages=psu_measured_line_voltage,
+                load_measured_line_voltages=load_measured_line_voltage,
+                settling_times=settling_time,
+            )
+            line_grid.add(line_voltage, (load_measured_line_voltage,))
+            save_checkpoint(psu_voltage=line_voltage)
 
-        psu.set_voltage(meta_df["meta"]["Set input voltage"])
-        psu.set_current(meta_df["meta"]["Set input current"])
-        psu.set_mode(meta_df["meta"]["PSU sense"])
-        load.set_enable_input(True)
+        await psu.set_voltage(meta["Set input voltage"])
+        await psu.set_current(meta["Set input current"])
+        await psu.set_mode(meta["PSU sense"])
+        await load.set_enable_input(True)
+        await ripple.setup()
+        save_checkpoint(
+            psu_voltage=meta["Set input voltage"], psu_current=meta["Set input current"], load_input=True
+        )
 
         # Load sweep
-        for load_current in load_currents:
-            load.set_current(load_current)
-            time.sleep(meta_df["meta"]["Load settling time"])
-            psu_measured_voltages.append(psu.measure_voltage())
-            psu_measured_currents.append(psu.measure_current())
-            psu_measured_powers.append(psu.measure_power())
-            load_measured_voltages.append(load.measure_voltage())
-            load_measured_currents.append(load.measure_current())
-            load_measured_powers.append(load.measure_power())
-            temperatures.append(dmm.fetch())
-
-        line_sweep_df["psu_measured_line_voltages"] = psu_measured_line_voltages
-        line_sweep_df["load_measured_line_voltages"] = load_measured_line_voltages
-        
-        load_sweep_df["psu_measured_voltages"] = psu_measured_voltages
-        load_sweep_df["psu_measured_currents"] = psu_measured_currents
-        load_sweep_df["psu_measured_powers"] = psu_measured_powers
-        load_sweep_df["load_measured_voltages"] = load_measured_voltages
-        load_sweep_df["load_measured_currents"] = load_measured_currents
-        load_sweep_df["load_measured_powers"] = load_measured_powers
-        load_sweep_df["temperatures"] = temperatures
-
-        load_sweep_df.to_csv(results_path / (meta_df["meta"]["Timestamp"] + "_load_sweep_" +  meta_df["meta"]["File name prefix"]), header=load_sweep_df.columns)
-        line_sweep_df.to_csv(results_path / (meta_df["meta"]["Timestamp"] + "_line_sweep_" +  meta_df["meta"]["File name prefix"]), header=line_sweep_df.columns)
-        meta_df.to_csv((results_path / (meta_df["meta"]["Timestamp"] + "_" + meta_df["meta"]["File name prefix"])).with_suffix(".meta.csv"), header=meta_df.columns)
+        while (load_current := load_grid.next_point()) is not None:
+            await load.set_current(load_current)
+            with span(tracer, "load settling"):
+                settling_time = await settle(settling_detector, load, logger)
+            (psu_voltage, psu_current, psu_power), (load_voltage, measured_load_current, load_power), temperature, ripple_metrics = await asyncio.gather(
+                measure_voltage_current_power(psu), measure_voltage_current_power(load), dmm.fetch(), ripple.measure()
+            )
+            load_sweep.append(
+                load_currents=load_current,
+                psu_measured_voltages=psu_voltage,
+                psu_measured_currents=psu_current,
+                psu_measured_powers=psu_power,
+                load_measured_voltages=load_voltage,
+                load_measured_currents=measured_load_current,
+                load_measured_powers=load_power,
+                temperatures=temperature,
+                **ripple_metrics.columns(),
+                settling_times=settling_time,
+            )
+            load_grid.add(load_current, load_metrics(load_voltage, psu_power, load_power))
+            save_checkpoint(load_current=load_current)
 
+        load_sweep.close()
+        checkpoint.clear()
+        return load_results(load_sweep.path).to_dataframe().sort_values("load_currents", ignore_index=True)
     except Exception as ex:
         logger.exception(ex)
         raise Exception from ex
     finally:
-        load.set_enable_input(False)
-        psu.set_enable_output(False)
-        for connection in connections:
-            connection.close()
-
-def create_socket_and_connect(ip_address: str, port: int):
-    """Create a network socket and connect to it."""
-    new_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    new_socket.connect((ip_address, port))
-    return new_socket
+        if telemetry is not None:
+            await telemetry.stop()
+            telemetry.writer.close()
+        line_sweep.close()
+        load_sweep.close()
+        await asyncio.gather(
+            load.set_enable_input(False, force=True), psu.set_enable_output(False, force=True), ripple.restore()
+        )
+        await asyncio.gather(*[instrument.close() for instrument in instruments])
+
+
+def load_metrics(output_voltage: float, input_power: float, output_power: float) -> tuple[float, float]:
+    """Metrics the adaptive load sweep refines on."""
+    return output_voltage, efficiency_percent(input_power, output_power)
+
+
+async def restore_setpoints(setpoints: dict, psu: AsyncSCPIInstrument, load: AsyncSCPIInstrument) -> None:
+    """Bring the PSU and load back to the state saved in a checkpoint."""
+    await psu.set_voltage(setpoints["psu_voltage"])
+    await psu.set_current(setpoints["psu_current"])
+    await psu.set_mode(setpoints["psu_mode"])
+    await psu.set_enable_output(setpoints["psu_output"])
+    if "load_current" in setpoints:
+        await load.set_current(setpoints["load_current"])
+    await load.set_enable_input(setpoints.get("load_input", False))
+
+
+async def settle(settling_detector: SettlingDetector, load: AsyncSCPIInstrument, logger: logging.Logger) -> float:
+    """Wait until the DUT output seen by the load has settled and return the time it took."""
+    settling = await settling_detector.wait_async(load.measure_voltage)
+    if not settling.settled:
+        logger.warning("Output did not settle within %f s", settling_detector.timeout_s)
+    return settling.settling_time_s
+
+
+async def measure_voltage_current_power(instrument: AsyncSCPIInstrument) -> tuple[float, float, float]:
+    """Read voltage, current and power of the PSU or the load in one round trip."""
+    async with instrument.batch() as batch:
+        voltage = batch.measure_voltage()
+        current = batch.measure_current()
+        power = batch.measure_power()
+    return voltage.result(), current.result(), power.result()
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
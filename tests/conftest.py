@@ -0,0 +1,16 @@
+import pytest
+
+from lab.instruments.session import SessionManager
+from lab.instruments.simulation import SimulatedBench
+
+
+@pytest.fixture
+def bench():
+    with SimulatedBench() as simulated_bench:
+        yield simulated_bench
+
+
+@pytest.fixture
+def session():
+    with SessionManager() as session_manager:
+        yield session_manager
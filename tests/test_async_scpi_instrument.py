@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from lab.instruments.async_scpi_instrument import AsyncSCPIInstrument
+from lab.instruments.siglent_sds_1104_x import ChannelCommand, Siglent1104X
+from lab.instruments.siglent_spd_1305_x import Siglent1305X
+from lab.instruments.simulation import SimulatedInstrumentServer, SimulatedSiglent1104X, SimulatedSiglent1305X
+
+LATENCY_S = 0.05
+
+
+def serve(simulated):
+    return SimulatedInstrumentServer(simulated).start()
+
+
+async def cancel_in_flight(coroutine) -> None:
+    task = asyncio.create_task(coroutine)
+    await asyncio.sleep(LATENCY_S / 2)  # Sent, the reply is still on its way
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+def test_the_reply_of_a_cancelled_query_is_skipped():
+    simulated = SimulatedSiglent1305X(latency_s=LATENCY_S)
+    simulated.voltage_setpoint = 5.0
+    server = serve(simulated)
+
+    async def run() -> float:
+        psu = await AsyncSCPIInstrument.open(Siglent1305X, *server.address)
+        try:
+            await cancel_in_flight(psu.get_id_string())
+            return await psu.get_voltage()
+        finally:
+            await psu.close()
+
+    try:
+        assert asyncio.run(run()) == 5.0
+    finally:
+        server.stop()
+
+
+def test_a_cancelled_block_query_makes_the_connection_unusable():
+    server = serve(SimulatedSiglent1104X(lambda: 0.1, 100e3, latency_s=LATENCY_S))
+
+    async def run() -> None:
+        scope = await AsyncSCPIInstrument.open(Siglent1104X, *server.address)
+        try:
+            waveform = ChannelCommand(1, Siglent1104X.ChannelCommands.WAVEFORM)
+            await cancel_in_flight(scope.query_block(waveform, "DAT2"))
+            with pytest.raises(ConnectionError, match="reopen"):
+                await scope.get_id_string()
+        finally:
+            await scope.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.stop()
@@ -0,0 +1,36 @@
+import pytest
+
+from lab.instruments.rigol_dm_858_e import RigolDM858E
+from lab.instruments.rohde_und_schwarz_hmc8012 import RohdeUndSchwarzHMC8012
+from lab.instruments.simulation import SimulatedMultimeter, SimulatedRigolDM858E
+
+DRIVERS = [(RigolDM858E, SimulatedRigolDM858E), (RohdeUndSchwarzHMC8012, SimulatedMultimeter)]
+
+
+@pytest.mark.parametrize("driver, simulated", DRIVERS)
+def test_acquire_buffered(driver, simulated):
+    dmm = driver(simulated(temperature=lambda: 30.0).connect())
+
+    readings = dmm.acquire_buffered(samples=10, rate_hz=200)
+
+    assert readings.values.tolist() == pytest.approx([30.0] * 10, abs=0.5)
+    assert readings.timestamps[1] - readings.timestamps[0] == pytest.approx(0.005, rel=1e-3)
+
+
+@pytest.mark.parametrize("driver, simulated", DRIVERS)
+def test_buffered_acquisition_must_be_configured_and_started(driver, simulated):
+    dmm = driver(simulated().connect())
+
+    with pytest.raises(RuntimeError, match="configure_buffered_acquisition"):
+        dmm.start_buffered_acquisition()
+    with pytest.raises(RuntimeError, match="configure_buffered_acquisition"):
+        dmm.fetch_buffered_readings()
+    dmm.configure_buffered_acquisition(samples=10, rate_hz=200)
+    with pytest.raises(RuntimeError, match="start_buffered_acquisition"):
+        dmm.fetch_buffered_readings()
+
+
+def test_dm858e_fetch_returns_the_latest_reading():
+    dmm = RigolDM858E(SimulatedRigolDM858E(temperature=lambda: 30.0).connect())
+
+    assert dmm.fetch() == pytest.approx(30.0, abs=0.5)
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from lab.measurements.catalog import Catalog
+from lab.measurements.results import ResultWriter
+
+
+def write_run(path, dut: str, input_voltage: float, rows: int = 3) -> None:
+    with ResultWriter(path, ["load_currents"], {"DUT": dut, "Input voltage": input_voltage}) as writer:
+        for row in range(rows):
+            writer.append(load_currents=row / 10)
+
+
+def touch_later(path) -> None:
+    """A new modification time even where the file system clock is coarse."""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    with Catalog(tmp_path, tmp_path / "catalog.sqlite3") as opened:
+        yield opened
+
+
+def test_refresh_indexes_new_changed_and_deleted_runs(tmp_path, catalog):
+    write_run(tmp_path / "a.labres", "LM2596 1N5817", 23)
+    (tmp_path / "b.csv").write_text(",load_currents\n0,0.0\n1,0.1\n")
+    (tmp_path / "b.meta.csv").write_text("key,value\nDUT,LM2596 SS34\nInput voltage,12\n")
+
+    assert catalog.refresh() == (2, 0)
+    assert catalog.refresh() == (0, 0)
+
+    write_run(tmp_path / "a.labres", "LM2596 1N5817", 23, rows=5)
+    touch_later(tmp_path / "a.labres")
+    assert catalog.refresh() == (1, 0)
+    assert [run.rows for run in catalog.query()] == [5, 2]
+
+    (tmp_path / "b.csv").unlink()
+    assert catalog.refresh() == (0, 1)
+    assert [run.path.name for run in catalog.query()] == ["a.labres"]
+
+
+def test_an_unreadable_run_is_skipped_and_keeps_its_last_entry(tmp_path, catalog):
+    write_run(tmp_path / "a.labres", "LM2596 1N5817", 23)
+    catalog.refresh()
+
+    (tmp_path / "a.labres").write_bytes(b"LABRES\x01\n\x00")  # Truncated while being written
+    touch_later(tmp_path / "a.labres")
+    (tmp_path / "new.labres").write_bytes(b"not a result file")
+    write_run(tmp_path / "c.labres", "LM2596 SS34", 12)
+
+    assert catalog.refresh() == (1, 0)
+    runs = catalog.query()
+    assert [(run.path.name, run.rows) for run in runs] == [("a.labres", 3), ("c.labres", 3)]
+
+
+def test_query_matches_numbers_exactly_and_text_by_substring(tmp_path, catalog):
+    write_run(tmp_path / "a.labres", "LM2596 1N5817", 23)
+    write_run(tmp_path / "b.labres", "LM2596 SS34", 23.0)
+    write_run(tmp_path / "c.labres", "LM2596 1N5817", 12)
+    catalog.refresh()
+
+    def names(**conditions) -> list[str]:
+        return [run.path.name for run in catalog.query(**conditions)]
+
+    assert names(equals={"Input voltage": 23}) == ["a.labres", "b.labres"]
+    assert names(equals={"DUT": "LM2596 SS34"}) == ["b.labres"]
+    assert names(contains={"DUT": "1n58"}) == ["a.labres", "c.labres"]
+    assert names(equals={"Input voltage": 23}, contains={"DUT": "5817"}) == ["a.labres"]
+    assert names(contains={"DUT": "%"}) == []
+    assert catalog.query(equals={"DUT": "LM2596 SS34"})[0].metadata == {"DUT": "LM2596 SS34", "Input voltage": 23.0}
@@ -0,0 +1,30 @@
+import pytest
+
+from lab.measurements import line_load_grid
+from lab.measurements.results import load_results
+
+OUTPUT_VOLTAGE = 12.0
+
+
+def test_dry_run_needs_no_bench():
+    estimate = line_load_grid.build_plan().predict()
+
+    assert estimate.points == len(line_load_grid.LINE_VOLTAGES) * len(line_load_grid.LOAD_CURRENTS)
+    assert estimate.nesting[0] == "line_voltages"
+
+
+def test_run_on_the_simulated_bench(tmp_path, bench, session, monkeypatch):
+    monkeypatch.setattr(line_load_grid, "LINE_VOLTAGES", [15, 20])
+    monkeypatch.setattr(line_load_grid, "LOAD_CURRENTS", [0.0, 1.0, 2.0])
+
+    path = line_load_grid.run(tmp_path, bench.addresses, session=session)
+
+    results = load_results(path)
+    frame = results.to_dataframe()
+    assert len(frame) == 6
+    assert sorted(zip(frame["line_voltages"], frame["load_currents"])) == [
+        (line, load) for line in (15, 20) for load in (0.0, 1.0, 2.0)
+    ]
+    assert frame["load_measured_currents"].to_numpy() == pytest.approx(frame["load_currents"].to_numpy(), abs=1e-3)
+    assert frame["load_measured_voltages"].to_numpy() == pytest.approx(OUTPUT_VOLTAGE, abs=0.1)
+    assert results.metadata["Sweep order"].startswith("serpentine")
@@ -0,0 +1,40 @@
+import pytest
+
+from lab.analysis.metrics import efficiency
+from lab.measurements import load_regulation
+
+OUTPUT_VOLTAGE = 12.0
+
+
+@pytest.mark.parametrize("options", [{}, {"adaptive": True}, {"list_sweep": True}], ids=["uniform", "adaptive", "list"])
+def test_run_on_the_simulated_bench(tmp_path, bench, session, monkeypatch, options):
+    monkeypatch.setattr(load_regulation, "LOAD_CURRENTS", [x / 10.0 for x in range(0, 21)])
+    monkeypatch.setattr(load_regulation, "LOAD_SETTLING_TIME_S", 0.05)
+    monkeypatch.setattr(load_regulation, "LIST_STEP_WIDTH_S", 0.1)
+
+    frame = load_regulation.run(tmp_path, bench.addresses, session=session, **options)
+
+    assert (tmp_path / "load_regulation.labres").exists()
+    assert frame["load_currents"].iloc[[0, -1]].tolist() == [0.0, 2.0]
+    assert frame["load_currents"].is_monotonic_increasing
+    assert frame["load_measured_currents"].to_numpy() == pytest.approx(frame["load_currents"].to_numpy(), abs=1e-3)
+    assert frame["load_measured_voltages"].to_numpy() == pytest.approx(OUTPUT_VOLTAGE, abs=0.1)
+    loaded = frame[frame["load_currents"] >= 0.5]
+    assert efficiency(loaded["psu_measured_powers"], loaded["load_measured_powers"]) == pytest.approx(75, abs=25)
+
+
+def test_run_switches_the_bench_off(tmp_path, bench, session, monkeypatch):
+    monkeypatch.setattr(load_regulation, "LOAD_CURRENTS", [0.0, 1.0])
+
+    load_regulation.run(tmp_path, bench.addresses, session=session)
+
+    # A query behind the shutdown writes makes sure the simulator has handled them.
+    for driver in (load_regulation.Load, load_regulation.PowerSupply):
+        session.open(driver, bench.addresses[driver]).get_id_string()
+    assert not bench.load.input_enabled
+    assert not bench.psu.output_enabled
+
+
+def test_list_sweep_cannot_be_adaptive(tmp_path, bench, session):
+    with pytest.raises(ValueError):
+        load_regulation.run(tmp_path, bench.addresses, session=session, adaptive=True, list_sweep=True)
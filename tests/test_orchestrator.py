@@ -0,0 +1,40 @@
+import multiprocessing
+
+import pytest
+
+from lab.measurements import load_regulation, orchestrator
+from lab.measurements.results import load_results
+
+
+def test_run_benches_needs_benches(tmp_path):
+    with pytest.raises(ValueError, match="No benches"):
+        orchestrator.run_benches("load_regulation", [], tmp_path)
+
+
+def test_main_reports_unknown_benches(monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["orchestrator", "load_regulation", "--bench", "bench_1", "--bench", "no_such_bench"])
+
+    with pytest.raises(SystemExit):
+        orchestrator.main()
+
+    assert "unknown benches ['no_such_bench']" in capsys.readouterr().err
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="the workers need the patched sweep")
+def test_every_point_is_reported_and_tagged_while_running(tmp_path, bench, monkeypatch):
+    monkeypatch.setattr(load_regulation, "LOAD_CURRENTS", [0.0, 0.5, 1.0])
+    roles = {role: bench.addresses[driver] for role, driver in orchestrator.ROLES.items()}
+    points = []
+
+    result, = orchestrator.run_benches(
+        "load_regulation",
+        [orchestrator.Bench("bench_1", roles, {"DUT": "LM2596"})],
+        tmp_path,
+        progress=lambda *point: points.append(point),
+    )
+
+    assert result.error is None
+    assert points == [("bench_1", "load_regulation.labres", rows) for rows in (1, 2, 3)]
+    path, = result.paths
+    assert load_results(path).metadata["Bench"] == "bench_1"
+    assert load_results(path).metadata["DUT"] == "LM2596"
@@ -0,0 +1,23 @@
+import numpy
+
+from lab.analysis.report import decimate
+
+
+def test_decimate_keeps_short_series():
+    x = numpy.arange(10.0)
+
+    assert decimate(x, x, max_points=10)[0] is x
+
+
+def test_decimate_keeps_the_extremes_of_every_bucket_including_the_last_points():
+    x = numpy.arange(1001.0)
+    y = numpy.zeros_like(x)
+    y[[3, 500]] = 1.0
+    y[-1] = 5.0  # Beyond the last full bucket
+
+    decimated_x, decimated_y = decimate(x, y, max_points=100)
+
+    assert len(decimated_x) <= 100
+    assert numpy.all(numpy.diff(decimated_x) >= 0)
+    assert {3.0, 500.0, 1000.0} <= set(decimated_x)
+    assert decimated_y.max() == 5.0
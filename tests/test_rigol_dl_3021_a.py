@@ -0,0 +1,76 @@
+import pytest
+
+from lab.instruments.rigol_dl_3021_a import RigolDL3021A
+from lab.instruments.shadow_state import ShadowState
+from lab.instruments.simulation import SimulatedRigolDL3021A
+
+STEP_WIDTH_S = 0.05
+
+
+def open_load(**timing) -> RigolDL3021A:
+    return RigolDL3021A(SimulatedRigolDL3021A(lambda amps: 12.0 - 0.05 * amps, **timing).connect())
+
+
+def test_sweep_current_reads_every_step():
+    load = open_load()
+    currents = [0.0, 0.5, 1.0, 1.5]
+    steps = []
+
+    readings = load.sweep_current(currents, STEP_WIDTH_S, on_step=lambda step, reading: steps.append(step))
+
+    assert steps == [0, 1, 2, 3]
+    assert [current for _, current, _ in readings] == pytest.approx(currents)
+    assert [voltage for voltage, _, _ in readings] == pytest.approx([12.0 - 0.05 * amps for amps in currents])
+    assert load.get_function_mode() == "FIX"
+
+
+def test_sweep_current_reads_every_step_once_it_settled():
+    load = open_load()
+    currents = [0.5, 1.0, 1.5]
+
+    readings = load.sweep_current(currents, STEP_WIDTH_S, read_at_s=0.6 * STEP_WIDTH_S)
+
+    assert [current for _, current, _ in readings] == pytest.approx(currents)
+
+
+def test_sweep_current_splits_profiles_longer_than_the_list_memory(monkeypatch):
+    monkeypatch.setattr(RigolDL3021A, "LIST_MAX_STEPS", 3)
+    load = open_load()
+    currents = [0.1, 0.2, 0.3, 0.4, 0.5]
+
+    readings = load.sweep_current(currents, STEP_WIDTH_S)
+
+    assert [current for _, current, _ in readings] == pytest.approx(currents)
+
+
+def test_sweep_current_raises_when_a_reading_overruns_its_step():
+    load = open_load(latency_s=STEP_WIDTH_S)
+
+    with pytest.raises(TimeoutError, match="step 0"):
+        load.sweep_current([0.5, 1.0], STEP_WIDTH_S)
+    assert load.get_function_mode() == "FIX"
+
+
+@pytest.mark.parametrize("steps", [1, RigolDL3021A.LIST_MAX_STEPS + 1])
+def test_upload_current_list_rejects_invalid_lengths(steps):
+    load = open_load()
+
+    with pytest.raises(ValueError, match="2 to"):
+        load.upload_current_list([0.5] * steps, STEP_WIDTH_S)
+
+
+def test_set_enable_input_can_be_forced_past_the_shadow_state():
+    simulated = SimulatedRigolDL3021A()
+    load = RigolDL3021A(simulated.connect())
+    load.shadow = ShadowState(staleness_s=60)
+    load.set_enable_input(False)
+    load.get_id_string()  # A round trip behind the write
+    simulated.input_enabled = True  # Switched on at the front panel
+
+    load.set_enable_input(False)
+    load.get_id_string()
+    assert simulated.input_enabled
+
+    load.set_enable_input(False, force=True)
+    load.get_id_string()
+    assert not simulated.input_enabled
@@ -0,0 +1,24 @@
+import numpy
+import pytest
+
+from lab.analysis.runs import interpolate
+
+NAN = numpy.nan
+
+
+def test_interpolate_runs_of_different_length():
+    x = [[2.0, 0.0, 1.0], [0.0, 1.0, NAN]]
+    y = [[20.0, 0.0, 10.0], [0.0, 5.0, NAN]]
+
+    result = interpolate(x, y, [0.0, 0.5, 1.5, 3.0])
+
+    assert result == pytest.approx(numpy.array([[0.0, 5.0, 15.0, NAN], [0.0, 2.5, NAN, NAN]]), nan_ok=True)
+
+
+@pytest.mark.parametrize("x, y", [([[1.0]], [[2.0]]), ([[1.0, NAN]], [[2.0, NAN]]), ([[NAN, 1.0]], [[5.0, 2.0]])])
+def test_interpolate_a_single_point_only_at_its_x(x, y):
+    assert interpolate(x, y, [0.0, 1.0, 2.0]) == pytest.approx(numpy.array([[NAN, 2.0, NAN]]), nan_ok=True)
+
+
+def test_interpolate_a_run_without_points():
+    assert numpy.isnan(interpolate([[NAN]], [[NAN]], [1.0, 2.0])).all()
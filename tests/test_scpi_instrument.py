@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from lab.instruments.rigol_dm_858_e import RigolDM858E
+from lab.instruments.siglent_spd_1305_x import Siglent1305X
+from lab.instruments.simulation import SimulatedRigolDM858E, SimulatedServiceRequestTransport, SimulatedSiglent1305X
+from lab.instruments.transport import Transport
+
+OPERATION_S = 0.1
+
+
+def open_dmm(simulated: SimulatedRigolDM858E) -> RigolDM858E:
+    return RigolDM858E(SimulatedServiceRequestTransport(simulated, RigolDM858E.COMMAND_SUFFIX))
+
+
+def test_transport_is_abstract():
+    with pytest.raises(TypeError):
+        Transport(None)
+
+
+def test_wait_for_the_service_request_of_a_completed_operation():
+    simulated = SimulatedRigolDM858E(operation_s=OPERATION_S)
+    dmm = open_dmm(simulated)
+
+    dmm.reset()
+    start = time.monotonic()
+    dmm.wait_until_operation_is_completed()
+
+    assert time.monotonic() - start == pytest.approx(OPERATION_S, abs=0.05)
+    assert simulated._service_request_enable == RigolDM858E.EVENT_STATUS_BIT
+    assert not simulated.service_request.is_set()
+    assert dmm.get_id_string() == simulated.IDENTITY
+
+
+def test_wait_for_a_service_request_times_out():
+    dmm = open_dmm(SimulatedRigolDM858E(operation_s=1.0))
+
+    dmm.reset()
+    with pytest.raises(TimeoutError, match="did not complete"):
+        dmm.wait_until_operation_is_completed(timeout_s=0.05)
+
+
+def test_siglent1305x_system_status_is_the_raw_reply():
+    simulated = SimulatedSiglent1305X()
+    psu = Siglent1305X(simulated.connect())
+
+    status = psu.get_sytem_status()
+
+    assert isinstance(status, bytes) and status.endswith(b"\n")
+    assert int(status, 16) == simulated.status()
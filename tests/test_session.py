@@ -0,0 +1,94 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+from lab.instruments.rigol_dl_3021_a import RigolDL3021A
+from lab.instruments.session import ReconnectingSocketTransport, SessionManager
+from lab.instruments.simulation import SimulatedInstrumentServer, SimulatedRigolDL3021A
+
+
+@pytest.fixture
+def simulated_load():
+    simulated = SimulatedRigolDL3021A(latency_s=0.05)  # Time to drop the connection before the reply
+    server = SimulatedInstrumentServer(simulated).start()
+    yield simulated, server.address
+    server.stop()
+
+
+def count_calls(simulated: SimulatedRigolDL3021A, header: str) -> list:
+    calls = []
+    handler = simulated.commands[header]
+    simulated.commands[header] = lambda params: calls.append(params) or handler(params)
+    return calls
+
+
+def drop_after(transport: ReconnectingSocketTransport, calls: list) -> None:
+    """Lose the connection once the instrument has handled the message."""
+    deadline = time.monotonic() + 1.0
+    while not calls and time.monotonic() < deadline:
+        time.sleep(0.001)
+    transport.connection.shutdown(socket.SHUT_RD)
+
+
+def test_a_reconnect_repeats_only_the_queries_of_the_interrupted_message(simulated_load):
+    simulated, address = simulated_load
+    triggers = count_calls(simulated, "TRIG")
+    transport = ReconnectingSocketTransport(address, 1.0, RigolDL3021A.COMMAND_SUFFIX)
+
+    transport.write("CURR:LEV:IMM 1.5;:TRIG;:CURR:LEV:IMM?")
+    drop_after(transport, triggers)
+
+    assert transport.read_line() == b"1.500000\n"
+    assert transport.reconnects == 1
+    assert len(triggers) == 1
+    transport.close()
+
+
+def test_a_reconnect_without_a_query_to_repeat_fails(simulated_load):
+    simulated, address = simulated_load
+    triggers = count_calls(simulated, "TRIG")
+    transport = ReconnectingSocketTransport(address, 1.0, RigolDL3021A.COMMAND_SUFFIX)
+
+    transport.write("TRIG")
+    drop_after(transport, triggers)
+
+    with pytest.raises(ConnectionError, match="waiting for a reply"):
+        transport.read_line()
+    assert len(triggers) == 1
+    transport.close()
+
+
+def test_a_reconnect_restores_every_list_step_but_no_trigger(simulated_load):
+    simulated, address = simulated_load
+    triggers = count_calls(simulated, "TRIG")
+    currents = [0.5, 1.0, 1.5, 2.0]
+    with SessionManager({RigolDL3021A: address}) as session:
+        load = session.open(RigolDL3021A)
+        load.upload_current_list(currents, 0.1)
+        load.trigger()
+        load.get_id_string()
+
+        load._transport.connection.shutdown(socket.SHUT_RD)
+        simulated.reset()  # Restarted, the list memory is empty
+        load.get_id_string()
+
+        assert load._transport.reconnects == 1
+    assert simulated.list_steps == len(currents)
+    assert simulated.list_levels == dict(enumerate(currents))
+    assert simulated.list_widths == dict.fromkeys(range(len(currents)), 0.1)
+    assert len(triggers) == 1
+
+
+def test_open_async_uses_the_session_address_and_timeout(simulated_load):
+    simulated, address = simulated_load
+
+    async def identify() -> tuple[str, float]:
+        load = await SessionManager({RigolDL3021A: address}, {RigolDL3021A: 3.0}).open_async(RigolDL3021A)
+        try:
+            return await load.get_id_string(), load.timeout
+        finally:
+            await load.close()
+
+    assert asyncio.run(identify()) == (simulated.IDENTITY, 3.0)
@@ -0,0 +1,33 @@
+import itertools
+
+from lab.measurements.settling import SettlingDetector
+
+
+def readings(*values: float):
+    values = itertools.chain(values, itertools.repeat(values[-1]))
+    return lambda: next(values)
+
+
+def test_a_flat_reading_settles_after_one_window():
+    detector = SettlingDetector(window=4, poll_interval_s=0.001, timeout_s=1.0)
+
+    result = detector.wait(readings(12.0))
+
+    assert result.settled
+    assert result.samples == 4
+    assert result.settling_time_s < 0.5
+
+
+def test_require_change_waits_for_the_reading_to_update():
+    detector = SettlingDetector(window=3, poll_interval_s=0.001, timeout_s=1.0, require_change=True)
+
+    result = detector.wait(readings(12.0, 12.0, 11.5, 11.5, 11.5))
+
+    assert result.settled
+    assert (result.samples, result.value) == (5, 11.5)
+
+
+def test_require_change_times_out_on_a_reading_that_never_changes():
+    detector = SettlingDetector(window=3, poll_interval_s=0.001, timeout_s=0.05, require_change=True)
+
+    assert not detector.wait(readings(12.0)).settled
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from lab.measurements.results import ResultWriter, load_results
+from lab.measurements.sweep_plan import SETTLING_TIME_COLUMN, Axis, Readout, SweepPlan
+
+
+def grid(setters: dict | None = None, **options) -> SweepPlan:
+    setters = setters or {}
+    return SweepPlan(
+        axes=[
+            Axis("line_voltages", [10, 11, 12], setters.get("line_voltages"), settle_s=0.08, settle_s_per_unit=0.001),
+            # A jump back over the whole load range settles slower than a line step
+            Axis("load_currents", [0.0, 1.0, 2.0], setters.get("load_currents"), settle_s_per_unit=0.05),
+        ],
+        readouts=[Readout("voltages", reading)],
+        **options,
+    )
+
+
+async def reading() -> float:
+    return 5.0
+
+
+def recording_setters() -> tuple[dict, list]:
+    calls = []
+
+    def setter(name: str):
+        async def set_value(value: float) -> None:
+            calls.append((name, value))
+
+        return set_value
+
+    return {name: setter(name) for name in ("line_voltages", "load_currents")}, calls
+
+
+def test_serpentine_points_change_one_axis_by_one_step():
+    plan = grid(order="serpentine", nesting=["line_voltages", "load_currents"])
+
+    assert [(point["line_voltages"], point["load_currents"]) for point in plan.points()] == [
+        (10, 0.0),
+        (10, 1.0),
+        (10, 2.0),
+        (11, 2.0),
+        (11, 1.0),
+        (11, 0.0),
+        (12, 0.0),
+        (12, 1.0),
+        (12, 2.0),
+    ]
+
+
+def test_the_axis_slowest_to_settle_changes_least_often():
+    plan = grid()
+    estimate = plan.predict()
+    naive = grid(order="naive", nesting=plan.nesting).predict()
+
+    assert (plan.order, plan.nesting) == ("serpentine", ["line_voltages", "load_currents"])
+    assert (estimate.points, estimate.setpoint_changes) == (9, 10)
+    assert naive.setpoint_changes == 12
+    assert estimate.total_s < naive.total_s
+
+
+def test_run_sets_only_changed_axes_and_writes_every_row(tmp_path):
+    setters, calls = recording_setters()
+    plan = grid(setters, order="serpentine", nesting=["line_voltages", "load_currents"])
+
+    with ResultWriter(tmp_path / "grid.labres", plan.columns()) as writer:
+        rows = asyncio.run(plan.run(writer))
+
+    assert len(calls) == 10
+    written = load_results(writer.path)
+    assert written.columns == ("line_voltages", "load_currents", "voltages", SETTLING_TIME_COLUMN)
+    assert written["line_voltages"].tolist() == [row["line_voltages"] for row in rows]
+    assert [row["line_voltages"] for row in rows] == [10, 10, 10, 11, 11, 11, 12, 12, 12]
+    assert written["voltages"].tolist() == pytest.approx([5.0] * 9)
+
+
+def test_a_resumed_run_sets_every_axis_at_its_first_point():
+    setters, calls = recording_setters()
+    plan = grid(setters, order="serpentine", nesting=["line_voltages", "load_currents"])
+
+    rows = asyncio.run(plan.run(skip=3))
+
+    assert len(rows) == 6
+    assert calls[:2] == [("line_voltages", 11), ("load_currents", 2.0)]
@@ -0,0 +1,49 @@
+import asyncio
+import math
+
+from lab.measurements.results import ResultWriter, load_results
+from lab.measurements.telemetry import TelemetrySampler
+
+INTERVAL_S = 0.01
+
+
+async def constant() -> float:
+    return 1.0
+
+
+async def broken() -> float:
+    raise RuntimeError("not a connection problem")
+
+
+def sample(writer: ResultWriter, channels: dict, duration_s: float = 0.1) -> TelemetrySampler:
+    async def run() -> TelemetrySampler:
+        sampler = TelemetrySampler(writer, channels, INTERVAL_S, flush_every=2)
+        sampler.start()
+        await asyncio.sleep(duration_s)
+        await sampler.stop()
+        return sampler
+
+    return asyncio.run(run())
+
+
+def test_a_failing_channel_is_nan_and_sampling_goes_on(tmp_path):
+    channels = {"good": constant, "bad": broken}
+    with ResultWriter(tmp_path / "telemetry.labres", TelemetrySampler.columns(channels)) as writer:
+        sampler = sample(writer, channels)
+
+    rows = load_results(writer.path).data
+    assert sampler.samples > 2
+    assert sampler.failed_reads == sampler.samples
+    assert sampler.error is None
+    assert len(rows) == sampler.samples
+    assert all(row["good"] == 1.0 and math.isnan(row["bad"]) for row in rows)
+
+
+def test_stop_keeps_the_error_that_ended_the_sampler(tmp_path):
+    channels = {"good": constant}
+    writer = ResultWriter(tmp_path / "telemetry.labres", TelemetrySampler.columns(channels))
+    writer.close()  # Every flush fails
+
+    sampler = sample(writer, channels)
+
+    assert isinstance(sampler.error, ValueError)
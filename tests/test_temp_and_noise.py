@@ -0,0 +1,55 @@
+import pytest
+
+from lab.measurements import temp_and_noise
+from lab.measurements.adaptive import UniformGrid
+from lab.measurements.results import load_results
+
+OUTPUT_VOLTAGE = 12.0
+
+
+def test_adaptive_run_on_the_simulated_bench(tmp_path, bench):
+    frame = temp_and_noise.run(tmp_path, bench.addresses, adaptive=True, telemetry_interval_s=0.05)
+
+    assert frame["load_currents"].iloc[[0, -1]].tolist() == [0.0, 2.0]
+    assert frame["load_measured_voltages"].to_numpy() == pytest.approx(OUTPUT_VOLTAGE, abs=0.1)
+    assert frame["temperatures"].iloc[-1] > frame["temperatures"].iloc[0]
+    loaded = frame[frame["load_currents"] >= 0.5]
+    assert not loaded["ripple_peak_to_peak_voltages"].isna().any()
+    assert loaded["switching_frequencies"].to_numpy() == pytest.approx(bench.dut.switching_frequency, rel=0.05)
+
+    line_sweep, = tmp_path.glob("*_line_sweep_*")
+    telemetry, = tmp_path.glob("*_telemetry_*")
+    line_voltages = load_results(line_sweep).to_dataframe()["line_voltages"]
+    assert (line_voltages.min(), line_voltages.max()) == (10, 25)
+    assert len(load_results(telemetry).data) > 0
+    assert not (tmp_path / temp_and_noise.CHECKPOINT_FILE_NAME).exists()
+
+
+
+def test_an_interrupted_run_resumes_without_duplicate_or_missing_points(tmp_path, bench, monkeypatch):
+    monkeypatch.setattr(temp_and_noise, "UniformGrid", lambda points: UniformGrid(points[:: len(points) // 4]))
+    metrics = temp_and_noise.load_metrics
+    calls = []
+
+    def interrupt_after_three_load_points(*values):
+        calls.append(values)
+        if len(calls) > 3:
+            raise ConnectionError("Lost the load")
+        return metrics(*values)
+
+    monkeypatch.setattr(temp_and_noise, "load_metrics", interrupt_after_three_load_points)
+    with pytest.raises(Exception):
+        temp_and_noise.run(tmp_path, bench.addresses, telemetry_interval_s=0.05)
+    assert (tmp_path / temp_and_noise.CHECKPOINT_FILE_NAME).exists()
+
+    monkeypatch.setattr(temp_and_noise, "load_metrics", metrics)
+    frame = temp_and_noise.run(tmp_path, bench.addresses, resume=True, telemetry_interval_s=0.05)
+
+    line_sweep, = tmp_path.glob("*_line_sweep_*")
+    load_sweep, = tmp_path.glob("*_load_sweep_*")
+    assert load_results(line_sweep)["line_voltages"].tolist() == [10, 14, 18, 22]
+    assert load_results(load_sweep)["load_currents"].tolist() == pytest.approx([x / 100 for x in range(0, 201, 50)])
+    assert frame["load_currents"].tolist() == pytest.approx([x / 100 for x in range(0, 201, 50)])
+    assert load_results(line_sweep).metadata["Telemetry interval"] == 0.05
+    assert load_results(load_sweep).metadata["Telemetry interval"] == 0.05
+    assert not (tmp_path / temp_and_noise.CHECKPOINT_FILE_NAME).exists()
@@ -0,0 +1,49 @@
+import asyncio
+
+from lab.instruments.async_scpi_instrument import AsyncSCPIInstrument
+from lab.instruments.rigol_dl_3021_a import RigolDL3021A
+from lab.instruments.simulation import SimulatedRigolDL3021A
+from lab.instruments.tracing import SCPITracer, split_message
+
+SUFFIX = len(RigolDL3021A.COMMAND_SUFFIX)
+
+
+def test_split_message_keeps_headers_and_parameters_apart():
+    assert split_message("MEAS:VOLT?") == ("MEAS:VOLT?", "")
+    assert split_message("CURR:LEV:IMM 0.37") == ("CURR:LEV:IMM", "0.37")
+    assert split_message("CURR:LEV:IMM 0.37;:MEAS:VOLT?") == ("CURR:LEV:IMM;:MEAS:VOLT?", "0.37;")
+
+
+def test_synchronous_events_are_keyed_on_the_header():
+    tracer = SCPITracer()
+    load = RigolDL3021A(SimulatedRigolDL3021A().connect())
+    load.tracer = tracer
+
+    load.set_current(0.37)
+    load.measure_voltage()
+    with load.batch() as batch:
+        batch.set_current(0.5)
+        batch.measure_current()
+
+    write, query, compound = tracer.events()
+    assert (write.command, write.params, write.bytes_sent) == ("CURR:LEV:IMM", "0.37", len("CURR:LEV:IMM 0.37") + SUFFIX)
+    assert (query.command, query.kind, query.bytes_received) == ("MEAS:VOLT?", "query", len("12.000000\n"))
+    assert (compound.command, compound.params, compound.bytes_received) == ("CURR:LEV:IMM;:MEAS:CURR?", "0.5;", len("0.500000\n"))
+    assert compound.bytes_sent == len("CURR:LEV:IMM 0.5;:MEAS:CURR?") + SUFFIX
+
+
+def test_asynchronous_events_match_the_synchronous_ones():
+    async def trace() -> list:
+        tracer = SCPITracer()
+        simulated = SimulatedRigolDL3021A()
+        reader, writer = await asyncio.open_connection(sock=simulated.connect())
+        load = AsyncSCPIInstrument(RigolDL3021A, reader, writer)
+        load.tracer = tracer
+        await load.set_current(0.37)
+        await load.measure_voltage()
+        await load.close()
+        return tracer.events()
+
+    write, query = asyncio.run(trace())
+    assert (write.command, write.kind, write.params, write.bytes_sent) == ("CURR:LEV:IMM", "write", "0.37", len("CURR:LEV:IMM 0.37") + SUFFIX)
+    assert (query.command, query.bytes_sent, query.bytes_received) == ("MEAS:VOLT?", len("MEAS:VOLT?") + SUFFIX, len("12.000000\n"))